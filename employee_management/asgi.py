@@ -14,3 +14,14 @@ from django.core.asgi import get_asgi_application
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'employee_management.settings')
 
 application = get_asgi_application()
+
+# Lets deliveries and pooled clients tell the server's event loop from the
+# throwaway ones async views get under WSGI, and closes them at shutdown
+from employees.runtime import serve_asgi  # noqa: E402
+
+application = serve_asgi(application)
+
+# Compile the templates now, before the first request (TEMPLATE_WARMUP)
+from employees.warmup import warm_up  # noqa: E402
+
+warm_up()
@@ -0,0 +1,24 @@
+"""
+Celery app for the outbound message queue (MESSAGE_QUEUE_BACKEND = 'celery')
+and the daily headcount snapshot.
+
+Start a worker with:  celery -A employee_management worker
+and the daily headcount snapshot with:  celery -A employee_management beat
+"""
+import os
+
+from celery import Celery
+from celery.schedules import crontab
+
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'employee_management.settings')
+
+app = Celery('employee_management')
+app.config_from_object('django.conf:settings', namespace='CELERY')
+app.autodiscover_tasks(related_name='task')
+
+app.conf.beat_schedule = {
+    'snapshot-headcount': {
+        'task': 'employees.task.snapshot_headcount_task',
+        'schedule': crontab(hour=23, minute=55),
+    },
+}
@@ -51,7 +51,9 @@ INSTALLED_APPS = [
 
 MIDDLEWARE = [
     'django.middleware.security.SecurityMiddleware',
-    'whitenoise.middleware.WhiteNoiseMiddleware',
+    'employees.middleware.MetricsMiddleware',
+    'employees.middleware.SessionHeartbeatMiddleware',
+    'employees.middleware.WhiteNoiseMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
@@ -59,6 +61,7 @@ MIDDLEWARE = [
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
     'employees.middleware.NoCacheMiddleware', 
+    'employees.middleware.QueryInstrumentationMiddleware',
 ]
 
 ROOT_URLCONF = 'employee_management.urls'
@@ -67,17 +70,28 @@ TEMPLATES = [
     {
         'BACKEND': 'django.template.backends.django.DjangoTemplates',
         'DIRS': [BASE_DIR / 'templates'],
-        'APP_DIRS': True,
         'OPTIONS': {
             'context_processors': [
                 'django.template.context_processors.request',
                 'django.contrib.auth.context_processors.auth',
                 'django.contrib.messages.context_processors.messages',
             ],
+            # Compiled templates are kept per process in DEBUG too (runserver's
+            # autoreloader clears them when a template changes)
+            'loaders': [
+                ('django.template.loaders.cached.Loader', [
+                    'django.template.loaders.filesystem.Loader',
+                    'django.template.loaders.app_directories.Loader',
+                ]),
+            ],
         },
     },
 ]
 
+# Compile every template when a worker starts (employees.warmup, called from
+# wsgi.py / asgi.py) instead of on the first request that needs each one
+TEMPLATE_WARMUP = env.bool('TEMPLATE_WARMUP', default=True)
+
 WSGI_APPLICATION = 'employee_management.wsgi.application'
 
 
@@ -90,6 +104,31 @@ DATABASES = {
 }
 
 
+# Caches
+# https://docs.djangoproject.com/en/5.2/topics/cache/
+# e.g. CACHE_URL=rediscache://127.0.0.1:6379/1 in production; the default is
+# per-process memory, use filecache:///tmp/ems-cache to share it locally.
+
+CACHES = {
+    'default': env.cache('CACHE_URL', default='locmemcache://'),
+}
+
+
+# Sessions
+# 'db' (Django's default), 'cached_db' (cache in front of the table),
+# 'cache' (no table at all; needs a shared CACHE_URL) or 'signed_cookies'.
+# Compare them with: python manage.py benchmark_sessions
+
+SESSION_ENGINES = {
+    'db': 'django.contrib.sessions.backends.db',
+    'cached_db': 'django.contrib.sessions.backends.cached_db',
+    'cache': 'django.contrib.sessions.backends.cache',
+    'signed_cookies': 'django.contrib.sessions.backends.signed_cookies',
+}
+SESSION_ENGINE = SESSION_ENGINES[env('SESSION_BACKEND', default='cached_db')]
+SESSION_CACHE_ALIAS = 'default'
+
+
 # Password validation
 # https://docs.djangoproject.com/en/5.2/ref/settings/#auth-password-validators
 
@@ -134,6 +173,58 @@ STATICFILES_STORAGE = 'whitenoise.storage.CompressedManifestStaticFilesStorage'
 
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
+# Dashboard counters are cached and updated incrementally from model signals;
+# this TTL bounds how long they can drift before a full recompute.
+DASHBOARD_STATS_TTL = env.int('DASHBOARD_STATS_TTL', default=300)
+
+# Analytics API: results are cached per filter combination until the next
+# employee / department change, or for this many seconds at most
+ANALYTICS_TTL = env.int('ANALYTICS_TTL', default=3600)
+ANALYTICS_SALARY_BINS = 20  # Buckets in the salary histogram
+
+# Server-side template fragments ({% versioned_cache %}): dropped as soon as
+# a model they show changes, and after this many seconds at most
+FRAGMENT_CACHE_TTL = env.int('FRAGMENT_CACHE_TTL', default=600)
+
+# Employee search: 'auto', 'sqlite' (FTS5), 'postgres' (tsvector) or 'memory'
+EMPLOYEE_SEARCH_BACKEND = env('EMPLOYEE_SEARCH_BACKEND', default='auto')
+
+# Keyset pagination: page sizes and how totals are shown
+# (None for no count, 'approximate' or 'exact')
+EMPLOYEE_LIST_PAGE_SIZE = env.int('EMPLOYEE_LIST_PAGE_SIZE', default=5)
+MESSAGE_HISTORY_PAGE_SIZE = env.int('MESSAGE_HISTORY_PAGE_SIZE', default=20)
+PAGINATION_COUNT_MODE = env('PAGINATION_COUNT_MODE', default='approximate')
+
+# Streaming exports: rows fetched and sent per chunk
+EXPORT_CHUNK_SIZE = env.int('EXPORT_CHUNK_SIZE', default=2000)
+
+# Bulk import: rows validated and written per transaction
+EMPLOYEE_IMPORT_BATCH_SIZE = env.int('EMPLOYEE_IMPORT_BATCH_SIZE', default=500)
+EMPLOYEE_IMPORT_ERRORS_SHOWN = 100  # Row errors listed on the upload page
+# Rows per upload on the import page, so the request stays well inside the
+# worker timeout (gunicorn.conf.py); manage.py import_employees has no cap
+EMPLOYEE_IMPORT_MAX_ROWS = env.int('EMPLOYEE_IMPORT_MAX_ROWS', default=10000)
+
+# Per-request query instrumentation (Server-Timing header + 'employees.queries'
+# log records); off unless QUERY_INSTRUMENTATION=True
+QUERY_INSTRUMENTATION = env.bool('QUERY_INSTRUMENTATION', default=False)
+QUERY_REPEAT_THRESHOLD = 3  # Same statement this often in one request looks like an N+1
+QUERY_BUDGET = env.int('QUERY_BUDGET', default=None)  # Default per-request cap; @query_budget(n) overrides
+QUERY_BUDGET_RAISE = env.bool('QUERY_BUDGET_RAISE', default=False)  # Raise instead of logging (tests)
+
+# /metrics (Prometheus text format). Scrapers send "Authorization: Bearer
+# <METRICS_TOKEN>"; without a token only staff users can read it. Several
+# worker processes need METRICS_MULTIPROCESS_DIR (gunicorn.conf.py sets one).
+METRICS_ENABLED = env.bool('METRICS_ENABLED', default=True)
+METRICS_TOKEN = env('METRICS_TOKEN', default=None)
+METRICS_MULTIPROCESS_DIR = env('METRICS_MULTIPROCESS_DIR', default=None)
+METRICS_FLUSH_INTERVAL = 5  # Seconds between a worker's snapshots in multiprocess mode
+
+# check_session heartbeat: polling interval (seconds) the client may negotiate
+HEARTBEAT_MIN_INTERVAL = 15
+HEARTBEAT_DEFAULT_INTERVAL = 60
+HEARTBEAT_MAX_INTERVAL = 300
+
 LOGIN_URL = 'login'
 LOGIN_REDIRECT_URL = 'dashboard'
 LOGOUT_REDIRECT_URL = 'login'
@@ -146,8 +237,8 @@ MESSAGE_TAGS = {
     messages.WARNING: 'warning',
     messages.ERROR: 'danger',
 }
-
-from decouple import config
+# Flash messages ride in a cookie so posting a form never rewrites the session
+MESSAGE_STORAGE = 'django.contrib.messages.storage.cookie.CookieStorage'
 
 # Add these lines to your settings.py after the environment setup
 
@@ -159,18 +250,62 @@ EMAIL_USE_TLS = env('EMAIL_USE_TLS', default=True)
 EMAIL_HOST_USER = env('EMAIL_HOST_USER', default='')
 EMAIL_HOST_PASSWORD = env('EMAIL_HOST_PASSWORD', default='')
 DEFAULT_FROM_EMAIL = env('DEFAULT_FROM_EMAIL', default=EMAIL_HOST_USER)
+EMAIL_TIMEOUT = env.int('EMAIL_TIMEOUT', default=10)  # Seconds; also bounds the async (aiosmtplib) sends
+
 
+TWILIO_ACCOUNT_SID = env('TWILIO_ACCOUNT_SID', default='')
+TWILIO_AUTH_TOKEN = env('TWILIO_AUTH_TOKEN', default='')
+TWILIO_WHATSAPP_NUMBER = env('TWILIO_WHATSAPP_NUMBER', default='')
 
-TWILIO_ACCOUNT_SID = config('TWILIO_ACCOUNT_SID', default='')
-TWILIO_AUTH_TOKEN = config('TWILIO_AUTH_TOKEN',default='')
-TWILIO_WHATSAPP_NUMBER = config('TWILIO_WHATSAPP_NUMBER', default='') 
+# WhatsApp transport: one pooled Twilio client per process. Use
+# 'employees.transports.FakeWhatsAppTransport' to keep messages in memory.
+# The Twilio library is only imported when the first message is sent.
+WHATSAPP_TRANSPORT = env('WHATSAPP_TRANSPORT', default='employees.transports.TwilioWhatsAppTransport')
+WHATSAPP_TIMEOUT = env.float('WHATSAPP_TIMEOUT', default=10)
+WHATSAPP_MAX_RETRIES = env.int('WHATSAPP_MAX_RETRIES', default=3)
+WHATSAPP_RETRY_BACKOFF = env.float('WHATSAPP_RETRY_BACKOFF', default=0.5)
+WHATSAPP_POOL_SIZE = env.int('WHATSAPP_POOL_SIZE', default=16)
 
 # For development/testing - use console backend
-if config('DEBUG', default=False, cast=bool):
+if DEBUG:
     EMAIL_BACKEND = 'django.core.mail.backends.console.EmailBackend'
 
+# Outbound message queue: 'thread' (in-process pool), 'celery', 'asyncio'
+# (tasks on the ASGI server's event loop) or 'sync'
+MESSAGE_QUEUE_BACKEND = env('MESSAGE_QUEUE_BACKEND', default='thread')
+MESSAGE_QUEUE_WORKERS = env.int('MESSAGE_QUEUE_WORKERS', default=4)
+# Broadcasts are delivered in chunks: one SMTP connection per chunk, and at
+# most BROADCAST_WHATSAPP_CONCURRENCY Twilio calls in flight
+BROADCAST_BATCH_SIZE = env.int('BROADCAST_BATCH_SIZE', default=100)
+BROADCAST_WHATSAPP_CONCURRENCY = env.int('BROADCAST_WHATSAPP_CONCURRENCY', default=8)
+CELERY_BROKER_URL = env('CELERY_BROKER_URL', default='redis://localhost:6379/0')
+CELERY_TASK_ACKS_LATE = True
+
+# Server worker processes; gunicorn.conf.py starts this many
+WEB_CONCURRENCY = env.int('WEB_CONCURRENCY', default=1)
+
+# Live delivery status (messaging/events/, Server-Sent Events). The local
+# broker only reaches pages served by the process that delivered the
+# message, so it is refused with several workers or Celery; the cache
+# broker needs a shared CACHE_URL then.
+MESSAGE_EVENTS_BROKER = env('MESSAGE_EVENTS_BROKER', default=(
+    'employees.events.CacheEventBroker' if WEB_CONCURRENCY > 1 or MESSAGE_QUEUE_BACKEND == 'celery'
+    else 'employees.events.LocalEventBroker'
+))
+MESSAGE_EVENTS_BACKLOG = 60  # Seconds events are kept for reconnecting pages
+MESSAGE_EVENTS_KEEPALIVE = 15  # Seconds between keepalive comments
+MESSAGE_EVENTS_MAX_AGE = 300  # Seconds before a stream closes and the browser reconnects
+MESSAGE_EVENTS_POLL_INTERVAL = 1.0  # CacheEventBroker only
+
+# Cached list of active employees offered as message recipients
+ACTIVE_RECIPIENTS_TTL = env.int('ACTIVE_RECIPIENTS_TTL', default=600)
+RECIPIENT_AUTOCOMPLETE_TTL = env.int('RECIPIENT_AUTOCOMPLETE_TTL', default=30)
+MESSAGING_DASHBOARD_RECIPIENTS = 20
+
 # Additional messaging settings
 MESSAGE_RATE_LIMIT = 100  # Max messages per hour per user
+MESSAGE_RATE_LIMIT_WINDOW = 3600  # Sliding window, in seconds
+MESSAGE_RATE_LIMIT_CACHE = 'default'  # Cache alias holding the counters
 WHATSAPP_MESSAGE_MAX_LENGTH = 1600
 EMAIL_SUBJECT_MAX_LENGTH = 255
 
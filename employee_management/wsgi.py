@@ -14,3 +14,8 @@ from django.core.wsgi import get_wsgi_application
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'employee_management.settings')
 
 application = get_wsgi_application()
+
+# Compile the templates now, before the first request (TEMPLATE_WARMUP)
+from employees.warmup import warm_up  # noqa: E402
+
+warm_up()
@@ -16,6 +16,7 @@ class EmployeeAdmin(admin.ModelAdmin):
     list_filter = ['department', 'status', 'gender', 'hire_date']
     search_fields = ['first_name', 'last_name', 'employee_id', 'email', 'address']
     ordering = ['first_name', 'last_name']
+    list_select_related = ['department']
     date_hierarchy = 'hire_date'
 
     fieldsets = (
@@ -29,5 +30,6 @@ class EmployeeAdmin(admin.ModelAdmin):
 @admin.register(Message)
 class MessageAdmin(admin.ModelAdmin):
     list_display = ('sender', 'recipient', 'message_type', 'is_sent', 'sent_at')
+    list_select_related = ('sender', 'recipient')
     list_filter = ('message_type', 'is_sent', 'sent_at')
     search_fields = ('recipient__full_name', 'subject', 'content')
\ No newline at end of file
@@ -0,0 +1,197 @@
+"""
+Salary, tenure and age statistics for the analytics API.
+
+``employee_analytics()`` fetches the columns it needs for the filtered
+employees with one ``values_list`` query (plus the department names) and computes everything on NumPy
+arrays: percentiles, histograms, and per-department / per-position
+summaries from a single sort. Results are cached per filter combination
+under a version number that the Employee / Department signals bump, so
+any write makes every cached combination stale at once.
+
+NumPy is imported when the first result is computed, so processes that
+never serve analytics do not pay for the import.
+"""
+import datetime
+import hashlib
+import time
+from operator import itemgetter
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.exceptions import EmptyResultSet, ImproperlyConfigured
+from django.db import connections
+from django.db.models import CharField, FloatField
+from django.db.models.functions import Cast
+
+from .filters import filter_employees
+from .metrics import cache_lookup
+from .models import Department, Employee
+
+ANALYTICS_VERSION_KEY = 'employees:analytics:version'
+
+FILTER_PARAMS = ('search', 'department', 'status')
+
+PERCENTILES = (10, 25, 50, 75, 90, 95, 99)
+
+# Lower bounds in completed years; the last band is open-ended
+TENURE_BANDS = (0, 1, 2, 5, 10, 20)
+AGE_BANDS = (0, 25, 35, 45, 55, 65)
+
+
+def _numpy():
+    try:
+        import numpy
+    except ImportError as e:
+        raise ImproperlyConfigured('The analytics API requires NumPy (pip install numpy)') from e
+    return numpy
+
+
+def _version():
+    version = cache.get(ANALYTICS_VERSION_KEY)
+    if version is None:
+        version = time.time_ns()
+        cache.add(ANALYTICS_VERSION_KEY, version, None)
+        version = cache.get(ANALYTICS_VERSION_KEY, version)
+    return version
+
+
+def invalidate_analytics():
+    cache.set(ANALYTICS_VERSION_KEY, time.time_ns(), None)
+
+
+def _cache_key(params):
+    filters = '&'.join(f'{name}={params.get(name) or ""}' for name in FILTER_PARAMS)
+    digest = hashlib.md5(filters.encode(), usedforsecurity=False).hexdigest()
+    return f'employees:analytics:{_version()}:{digest}'
+
+
+def _band_labels(bounds):
+    labels = [f'{low}-{high - 1}' if high - 1 > low else str(low) for low, high in zip(bounds, bounds[1:])]
+    return labels + [f'{bounds[-1]}+']
+
+
+def _completed_years(np, dates, today):
+    """Whole years from each date to ``today`` (age, tenure)"""
+    years = dates.astype('datetime64[Y]')
+    months = dates.astype('datetime64[M]')
+    # YYYYMMDD integers: the difference // 10000 is the number of birthdays passed
+    stamps = (
+        (years.astype(np.int64) + 1970) * 10000
+        + (months - years).astype(np.int64) * 100 + 100
+        + (dates - months).astype(np.int64) + 1
+    )
+    return (today.year * 10000 + today.month * 100 + today.day - stamps) // 10000
+
+
+def _bands(np, values, bounds):
+    # (dates in the future count in the first band)
+    bands = np.searchsorted(bounds, np.maximum(values, bounds[0]), side='right') - 1
+    counts = np.bincount(bands, minlength=len(bounds))
+    return [{'band': label, 'count': int(count)} for label, count in zip(_band_labels(bounds), counts)]
+
+
+def _factorize(values):
+    """(codes, labels): an integer code per value, in order of first appearance"""
+    index = {}
+    codes = [index.setdefault(value, len(index)) for value in values]
+    return codes, list(index)
+
+
+def _summary(np, salaries):
+    low, q1, median, q3, high = np.percentile(salaries, [0, 25, 50, 75, 100])
+    return {
+        'count': int(salaries.size),
+        'mean': round(float(salaries.mean()), 2),
+        'min': round(float(low), 2),
+        'p25': round(float(q1), 2),
+        'median': round(float(median), 2),
+        'p75': round(float(q3), 2),
+        'max': round(float(high), 2),
+    }
+
+
+def _grouped(np, codes, labels, salaries):
+    """Salary summary per group, from one sort of (group, salary)"""
+    order = np.lexsort((salaries, codes))
+    codes, salaries = codes[order], salaries[order]
+    starts = np.flatnonzero(np.r_[True, codes[1:] != codes[:-1]])
+    ends = np.r_[starts[1:], codes.size]
+    groups = [
+        {'name': labels[codes[start]], **_summary(np, salaries[start:end])}
+        for start, end in zip(starts, ends)
+    ]
+    return sorted(groups, key=lambda group: (-group['count'], group['name']))
+
+
+def compute_analytics(employees, today=None):
+    """Statistics for ``employees`` (a queryset), as JSON-ready dicts"""
+    np = _numpy()
+    today = today or datetime.date.today()
+    # Floats and ISO date strings rather than a Decimal / date per value
+    # (NumPy parses the strings far faster than it converts date objects),
+    # and the compiled SQL run directly, skipping the per-row converters
+    columns = employees.order_by().values_list(
+        Cast('salary', FloatField()), Cast('hire_date', CharField()), Cast('date_of_birth', CharField()),
+        'department_id', 'position',
+    )
+    try:
+        sql, params = columns.query.get_compiler(using=columns.db).as_sql()
+    except EmptyResultSet:
+        # e.g. a search with no hits: nothing to run
+        return {'count': 0}
+    with connections[columns.db].cursor() as cursor:
+        cursor.execute(sql, params)
+        rows = cursor.fetchall()
+    if not rows:
+        return {'count': 0}
+
+    salaries = np.fromiter(map(itemgetter(0), rows), dtype=np.float64, count=len(rows))
+    tenure = _completed_years(np, np.array(list(map(itemgetter(1), rows)), dtype='datetime64[D]'), today)
+    ages = _completed_years(np, np.array(list(map(itemgetter(2), rows)), dtype='datetime64[D]'), today)
+    department_codes, department_ids = _factorize(map(itemgetter(3), rows))
+    names = dict(Department.objects.filter(pk__in=department_ids).values_list('pk', 'name'))
+    department_labels = [names.get(pk, str(pk)) for pk in department_ids]
+    position_codes, position_labels = _factorize(map(itemgetter(4), rows))
+
+    bins = getattr(settings, 'ANALYTICS_SALARY_BINS', 20)
+    counts, edges = np.histogram(salaries, bins=bins)
+    return {
+        'count': len(rows),
+        'salary': {
+            **_summary(np, salaries),
+            'std': round(float(salaries.std()), 2),
+            'total': round(float(salaries.sum()), 2),
+            'percentiles': {
+                f'p{p}': round(float(value), 2)
+                for p, value in zip(PERCENTILES, np.percentile(salaries, PERCENTILES))
+            },
+            'histogram': {
+                'edges': [round(float(edge), 2) for edge in edges],
+                'counts': counts.tolist(),
+            },
+        },
+        'departments': _grouped(np, np.array(department_codes), department_labels, salaries),
+        'positions': _grouped(np, np.array(position_codes), position_labels, salaries),
+        'tenure': {
+            'mean_years': round(float(tenure.mean()), 2),
+            'bands': _bands(np, tenure, TENURE_BANDS),
+        },
+        'age': {
+            'mean_years': round(float(ages.mean()), 2),
+            'bands': _bands(np, ages, AGE_BANDS),
+        },
+    }
+
+
+def employee_analytics(params):
+    """
+    Cached statistics for the employees matching the employee_list filters
+    in ``params`` (search / department / status).
+    """
+    key = _cache_key(params)
+    result = cache.get(key)
+    cache_lookup('analytics', result is not None)
+    if result is None:
+        result = compute_analytics(filter_employees(Employee.objects.all(), params))
+        cache.set(key, result, getattr(settings, 'ANALYTICS_TTL', 3600))
+    return result
@@ -0,0 +1,225 @@
+"""
+Load-testing helpers for ``manage.py benchmark_views`` and ``benchmark_cold_start``.
+
+``test_database()`` swaps in a throwaway test database, ``seed()`` fills it
+with deterministic Department / Employee / Message rows using bulk_create,
+and ``run_route()`` drives one URL through the Django test client from
+several threads at once, recording latency, queries and response size for
+every request.
+"""
+import contextlib
+import datetime
+import math
+import os
+import random
+import statistics
+import tempfile
+import threading
+import time
+from decimal import Decimal
+
+from django.contrib.auth.models import User
+from django.core.cache import caches
+from django.db import connection
+from django.test import Client
+from django.test.utils import CaptureQueriesContext
+from django.urls import URLPattern, reverse
+
+from .analytics import invalidate_analytics
+from .fragments import FRAGMENT_MODELS, bump_fragment_version
+from .models import Department, Employee, Message
+from .recipients import invalidate_active_recipients
+from .search import get_search_backend
+from .stats import invalidate_dashboard_stats, rebuild_department_stats
+
+FIRST_NAMES = ['Aarav', 'Ananya', 'Ben', 'Chloe', 'Diego', 'Fatima', 'Hana', 'Ivan', 'Kofi', 'Lena',
+               'Mateo', 'Nisha', 'Omar', 'Priya', 'Rohan', 'Sara', 'Tariq', 'Yuki', 'Zoe', 'Wei']
+LAST_NAMES = ['Sharma', 'Smith', 'Garcia', 'Khan', 'Chen', 'Okafor', 'Müller', 'Rossi', 'Tanaka',
+              'Silva', 'Patel', 'Novak', 'Kim', 'Cohen', 'Singh', 'Brown']
+POSITIONS = ['Engineer', 'Senior Engineer', 'Manager', 'Analyst', 'Designer', 'Recruiter', 'Accountant']
+STATUSES = ['active'] * 8 + ['inactive', 'terminated']
+
+
+@contextlib.contextmanager
+def test_database(keepdb=False):
+    """
+    Run the block against a new test database (never the real one) with
+    every cache cleared; yields the test database's name.
+    """
+    # The default in-memory SQLite test database locks whole tables between
+    # threads and can't be shared with other processes, so use a file instead
+    test_settings = connection.settings_dict['TEST']
+    if connection.vendor == 'sqlite' and not test_settings.get('NAME'):
+        test_settings['NAME'] = os.path.join(tempfile.gettempdir(), 'ems-benchmark.sqlite3')
+    old_name = connection.creation.create_test_db(verbosity=0, autoclobber=True, keepdb=keepdb)
+    try:
+        for cache in caches.all():
+            cache.clear()
+        yield connection.settings_dict['NAME']
+    finally:
+        connection.creation.destroy_test_db(old_name, verbosity=0, keepdb=keepdb)
+
+
+def make_departments(count):
+    return [
+        Department(name=f'Department {i:03d}', description=f'Benchmark department {i}')
+        for i in range(count)
+    ]
+
+
+def make_employees(count, departments, rng):
+    for i in range(count):
+        first_name, last_name = rng.choice(FIRST_NAMES), rng.choice(LAST_NAMES)
+        yield Employee(
+            employee_id=f'BENCH{i:07d}',
+            first_name=first_name,
+            last_name=last_name,
+            email=f'{first_name}.{last_name}.{i}@example.com'.lower(),
+            phone_number=f'+91{rng.randrange(10 ** 9, 10 ** 10)}',
+            date_of_birth=datetime.date(1960, 1, 1) + datetime.timedelta(days=rng.randrange(15000)),
+            gender=rng.choice('MFO'),
+            address=f'{rng.randrange(1, 999)} Benchmark Road',
+            department=departments[i % len(departments)],
+            position=rng.choice(POSITIONS),
+            salary=Decimal(rng.randrange(300000, 2500000)) / 100,
+            hire_date=datetime.date(2005, 1, 1) + datetime.timedelta(days=rng.randrange(7000)),
+            status=rng.choice(STATUSES),
+        )
+
+
+def make_messages(count, sender, employee_ids, rng):
+    for i in range(count):
+        message_type = rng.choice(['email', 'whatsapp'])
+        yield Message(
+            sender=sender,
+            recipient_id=rng.choice(employee_ids),
+            message_type=message_type,
+            subject=f'Benchmark message {i}' if message_type == 'email' else None,
+            content='Benchmark message body. ' * rng.randrange(1, 8),
+            is_sent=rng.random() > 0.05,
+        )
+
+
+def seed(departments=20, employees=10000, messages=50000, random_seed=0, batch_size=2000):
+    """Bulk-insert benchmark rows; returns the user the messages were sent by"""
+    rng = random.Random(random_seed)
+    user, _ = User.objects.get_or_create(username='benchmark', defaults={'is_staff': True})
+    department_rows = Department.objects.bulk_create(make_departments(max(departments, 1)))
+    Employee.objects.bulk_create(make_employees(employees, department_rows, rng), batch_size=batch_size)
+    employee_ids = list(Employee.objects.values_list('pk', flat=True))
+    if employee_ids and messages:
+        Message.objects.bulk_create(make_messages(messages, user, employee_ids, rng), batch_size=batch_size)
+
+    if connection.vendor in ('postgresql', 'sqlite'):
+        with connection.cursor() as cursor:
+            cursor.execute('ANALYZE')
+    # bulk_create skips the model signals
+    rebuild_department_stats()
+    invalidate_dashboard_stats()
+    invalidate_active_recipients()
+    invalidate_analytics()
+    bump_fragment_version(*FRAGMENT_MODELS)
+    get_search_backend().rebuild()
+    return user
+
+
+def discover_routes(urlpatterns, skip=()):
+    """
+    (name, path) for every named GET route, with URL arguments filled in
+    from rows that exist (the first employee / department).
+    """
+    employee = Employee.objects.order_by('pk').first()
+    department = Department.objects.order_by('pk').first()
+    routes = []
+    for pattern in urlpatterns:
+        if not isinstance(pattern, URLPattern) or not pattern.name or pattern.name in skip:
+            continue
+        kwargs = {}
+        for argument in pattern.pattern.converters:
+            if argument == 'pk' and pattern.name.startswith('department'):
+                kwargs[argument] = department.pk
+            else:
+                kwargs[argument] = employee.pk
+        routes.append((pattern.name, reverse(pattern.name, kwargs=kwargs)))
+    return routes
+
+
+def percentile(sorted_values, fraction):
+    """Nearest-rank percentile of an already sorted list"""
+    if not sorted_values:
+        return 0.0
+    index = max(math.ceil(fraction * len(sorted_values)) - 1, 0)
+    return sorted_values[index]
+
+
+def response_size(response):
+    if response.streaming:
+        return sum(len(chunk) for chunk in response.streaming_content)
+    return len(response.content)
+
+
+def run_route(path, user, requests=100, concurrency=4, warmup=3, host='localhost'):
+    """Request ``path`` ``requests`` times from ``concurrency`` logged-in threads"""
+    samples = []
+    statuses = set()
+    lock = threading.Lock()
+    errors = []
+    counter = iter(range(requests))
+
+    def worker():
+        try:
+            measure()
+        except Exception as e:
+            errors.append(e)
+        finally:
+            if threading.current_thread() is not threading.main_thread():
+                connection.close()
+
+    def measure():
+        client = Client(HTTP_HOST=host)
+        if user is not None:
+            client.force_login(user)
+        for _ in range(warmup):
+            response_size(client.get(path))
+        while True:
+            with lock:
+                if next(counter, None) is None:
+                    break
+            with CaptureQueriesContext(connection) as queries:
+                start = time.perf_counter()
+                response = client.get(path)
+                size = response_size(response)
+                elapsed = time.perf_counter() - start
+            with lock:
+                samples.append((elapsed * 1000, len(queries), size))
+                statuses.add(response.status_code)
+
+    started = time.perf_counter()
+    if concurrency <= 1:
+        worker()
+    else:
+        threads = [threading.Thread(target=worker) for _ in range(concurrency)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+    wall = time.perf_counter() - started
+    if errors:
+        raise errors[0]
+
+    latencies = sorted(sample[0] for sample in samples)
+    total = len(samples)
+    return {
+        'path': path,
+        'statuses': sorted(statuses),
+        'requests': total,
+        'concurrency': concurrency,
+        'throughput_rps': round(total / wall, 2) if wall else None,
+        'mean_ms': round(statistics.fmean(latencies), 3) if latencies else None,
+        'p50_ms': round(percentile(latencies, 0.50), 3),
+        'p95_ms': round(percentile(latencies, 0.95), 3),
+        'p99_ms': round(percentile(latencies, 0.99), 3),
+        'max_ms': round(latencies[-1], 3) if latencies else None,
+        'queries_per_request': round(sum(sample[1] for sample in samples) / total, 2) if total else None,
+        'bytes_per_request': round(sum(sample[2] for sample in samples) / total) if total else None,
+    }
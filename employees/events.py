@@ -0,0 +1,309 @@
+"""
+Live delivery status for the messages a user has sent.
+
+The delivery code (``employees.messaging``) calls ``publish_delivery()``
+once a message is marked sent or failed. The event goes to the sender's
+subscribers through the broker named by ``settings.MESSAGE_EVENTS_BROKER``
+(a dotted path, like WHATSAPP_TRANSPORT):
+
+* ``LocalEventBroker`` - in this process only. Enough for a single worker
+  with the ``thread``, ``asyncio`` or ``sync`` message queue, and refused
+  otherwise (WEB_CONCURRENCY above 1, or the ``celery`` queue).
+* ``CacheEventBroker`` - through the shared cache, so events published by
+  another worker or a Celery process reach every subscriber. The default
+  when there is more than one process.
+
+``event_stream()`` turns a subscription into a Server-Sent Events body.
+Events carry ids and are kept for MESSAGE_EVENTS_BACKLOG seconds, so a
+reconnecting EventSource resumes from ``Last-Event-ID``, and a new
+connection first replays anything that finished in that window.
+"""
+import asyncio
+import json
+import logging
+import threading
+import time
+from collections import defaultdict, deque
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.cache import cache, caches
+from django.core.cache.backends.locmem import LocMemCache
+from django.core.exceptions import ImproperlyConfigured
+from django.core.signals import setting_changed
+from django.db import connections
+from django.dispatch import receiver
+from django.utils.module_loading import import_string
+
+from . import metrics
+
+logger = logging.getLogger(__name__)
+
+
+def _backlog_seconds():
+    return getattr(settings, 'MESSAGE_EVENTS_BACKLOG', 60)
+
+
+def _multiprocess():
+    """Whether deliveries may be published by another process than the one streaming them"""
+    return (
+        getattr(settings, 'WEB_CONCURRENCY', 1) > 1
+        or getattr(settings, 'MESSAGE_QUEUE_BACKEND', 'thread') == 'celery'
+    )
+
+
+class LocalSubscription:
+    def __init__(self, broker, user_id, backlog):
+        self.broker = broker
+        self.user_id = user_id
+        self.loop = asyncio.get_running_loop()
+        self.items = deque(backlog)
+        self.ready = asyncio.Event()
+
+    def deliver(self, item):
+        """Called from any thread"""
+        try:
+            self.loop.call_soon_threadsafe(self._append, item)
+        except RuntimeError:
+            # the loop has closed; the stream is gone
+            self.close()
+
+    def _append(self, item):
+        self.items.append(item)
+        self.ready.set()
+
+    async def get(self, timeout):
+        """The next events as [(id, event)], or [] after ``timeout`` seconds"""
+        if not self.items:
+            # Not wait_for(): it can swallow the cancellation that ends the
+            # stream when the client disconnects just as an event arrives
+            waiter = asyncio.ensure_future(self.ready.wait())
+            try:
+                await asyncio.wait([waiter], timeout=timeout)
+            finally:
+                waiter.cancel()
+        self.ready.clear()
+        items = list(self.items)
+        self.items.clear()
+        return items
+
+    def close(self):
+        self.broker._unsubscribe(self)
+
+
+class LocalEventBroker:
+    """Fans events out to the subscribers in this process"""
+
+    def __init__(self):
+        if _multiprocess():
+            raise ImproperlyConfigured(
+                "LocalEventBroker only reaches pages served by the process that delivered the message; "
+                "with WEB_CONCURRENCY above 1 or the celery message queue use "
+                "employees.events.CacheEventBroker on a shared CACHE_URL"
+            )
+        self._lock = threading.Lock()
+        self._next_id = 1
+        self._subscribers = defaultdict(set)
+        # user id -> deque of (id, published at, event)
+        self._backlog = defaultdict(deque)
+
+    def _prune(self, backlog, now):
+        while backlog and backlog[0][1] < now - _backlog_seconds():
+            backlog.popleft()
+
+    def publish(self, user_id, event):
+        now = time.time()
+        with self._lock:
+            event_id = self._next_id
+            self._next_id += 1
+            backlog = self._backlog[user_id]
+            backlog.append((event_id, now, event))
+            self._prune(backlog, now)
+            subscribers = list(self._subscribers.get(user_id, ()))
+        for subscription in subscribers:
+            subscription.deliver((event_id, event))
+
+    def subscribe(self, user_id, last_event_id=None):
+        """A subscription to ``user_id``'s events, starting after ``last_event_id`` (or the backlog)"""
+        with self._lock:
+            backlog = self._backlog.get(user_id, ())
+            self._prune(backlog, time.time())
+            replay = [
+                (event_id, event) for event_id, _, event in backlog
+                if last_event_id is None or event_id > last_event_id
+            ]
+            subscription = LocalSubscription(self, user_id, replay)
+            self._subscribers[user_id].add(subscription)
+        return subscription
+
+    def _unsubscribe(self, subscription):
+        with self._lock:
+            subscribers = self._subscribers.get(subscription.user_id)
+            if subscribers is not None:
+                subscribers.discard(subscription)
+                if not subscribers:
+                    del self._subscribers[subscription.user_id]
+
+
+class CacheSubscription:
+    # newest events fetched per poll; older ones are skipped after a long gap
+    BATCH = 100
+
+    def __init__(self, broker, user_id, last_event_id):
+        self.broker = broker
+        self.user_id = user_id
+        self.last_event_id = last_event_id or 0
+
+    async def get(self, timeout):
+        """The next events as [(id, event)], or [] after ``timeout`` seconds"""
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + timeout
+        interval = getattr(settings, 'MESSAGE_EVENTS_POLL_INTERVAL', 1.0)
+        while True:
+            items = await self.poll()
+            remaining = deadline - loop.time()
+            if items or remaining <= 0:
+                return items
+            await asyncio.sleep(min(interval, remaining))
+
+    async def poll(self):
+        latest = await cache.aget(self.broker.sequence_key(self.user_id), 0)
+        if latest <= self.last_event_id:
+            return []
+        ids = range(max(self.last_event_id + 1, latest - self.BATCH + 1), latest + 1)
+        found = await cache.aget_many([self.broker.event_key(self.user_id, event_id) for event_id in ids])
+        items = []
+        for event_id in ids:
+            event = found.get(self.broker.event_key(self.user_id, event_id))
+            if event is not None:
+                items.append((event_id, event))
+        if items:
+            # An id with no event yet is being published right now (or has
+            # expired); the next poll looks again unless a newer one arrived
+            self.last_event_id = items[-1][0]
+        return items
+
+    def close(self):
+        pass
+
+
+class CacheEventBroker:
+    """
+    Cross-worker broker on the shared cache: events are numbered per user
+    with ``cache.incr`` and stored for MESSAGE_EVENTS_BACKLOG seconds, and
+    each stream polls its user's counter every MESSAGE_EVENTS_POLL_INTERVAL
+    seconds. Needs a cache every process shares (CACHE_URL on Redis or
+    Memcached); with the default per-process memory cache it behaves like
+    LocalEventBroker, only slower.
+    """
+
+    def __init__(self):
+        if _multiprocess() and isinstance(caches['default'], LocMemCache):
+            logger.warning(
+                "CacheEventBroker is on a per-process memory cache: set CACHE_URL to a shared cache, "
+                "or delivery status only reaches pages served by the process that delivered the message"
+            )
+
+    def sequence_key(self, user_id):
+        return f'employees:events:{user_id}'
+
+    def event_key(self, user_id, event_id):
+        return f'employees:events:{user_id}:{event_id}'
+
+    def publish(self, user_id, event):
+        key = self.sequence_key(user_id)
+        cache.add(key, 0, None)
+        event_id = cache.incr(key)
+        cache.set(self.event_key(user_id, event_id), event, _backlog_seconds())
+
+    def subscribe(self, user_id, last_event_id=None):
+        return CacheSubscription(self, user_id, last_event_id)
+
+
+_broker = None
+_broker_lock = threading.Lock()
+
+
+def get_event_broker():
+    global _broker
+    if _broker is None:
+        with _broker_lock:
+            if _broker is None:
+                path = getattr(settings, 'MESSAGE_EVENTS_BROKER', 'employees.events.LocalEventBroker')
+                _broker = import_string(path)()
+    return _broker
+
+
+def reset_event_broker():
+    global _broker
+    with _broker_lock:
+        _broker = None
+
+
+@receiver(setting_changed)
+def _reset_on_setting_change(sender, setting, **kwargs):
+    if setting == 'MESSAGE_EVENTS_BROKER':
+        reset_event_broker()
+
+
+def delivery_event(msg_record):
+    if msg_record.is_sent:
+        status = 'sent'
+    elif msg_record.error_message:
+        status = 'failed'
+    else:
+        status = 'pending'
+    return {
+        'id': msg_record.pk,
+        'recipient': msg_record.recipient_id,
+        'message_type': msg_record.message_type,
+        'status': status,
+        'error': msg_record.error_message,
+    }
+
+
+def publish_delivery(*msg_records):
+    """Tell each message's sender how its delivery went; never raises"""
+    try:
+        broker = get_event_broker()
+    except Exception:
+        logger.warning("Could not publish delivery status", exc_info=True)
+        return
+    for msg_record in msg_records:
+        try:
+            broker.publish(msg_record.sender_id, delivery_event(msg_record))
+        except Exception:
+            logger.warning("Could not publish the delivery status of message %s", msg_record.pk, exc_info=True)
+
+
+async def event_stream(user_id, last_event_id=None, once=False):
+    """
+    Server-Sent Events for ``user_id``: one ``status`` event per delivery,
+    and a comment every MESSAGE_EVENTS_KEEPALIVE seconds so proxies keep
+    the connection open. Ends after MESSAGE_EVENTS_MAX_AGE seconds (the
+    browser reconnects and the user is authenticated again), or after
+    whatever is already there if ``once`` (polling, without waiting).
+    """
+    if not once:
+        # Don't hold database connections open for the life of the stream
+        await sync_to_async(connections.close_all)()
+    subscription = get_event_broker().subscribe(user_id, last_event_id)
+    keepalive = getattr(settings, 'MESSAGE_EVENTS_KEEPALIVE', 15)
+    loop = asyncio.get_running_loop()
+    deadline = loop.time() + getattr(settings, 'MESSAGE_EVENTS_MAX_AGE', 300)
+    metrics.EVENT_STREAMS.inc()
+    try:
+        yield f"retry: {getattr(settings, 'MESSAGE_EVENTS_RETRY', 3) * 1000}\n\n"
+        while loop.time() < deadline:
+            items = await subscription.get(0 if once else min(keepalive, max(deadline - loop.time(), 0)))
+            if items:
+                yield ''.join(
+                    f'id: {event_id}\nevent: status\ndata: {json.dumps(event)}\n\n' for event_id, event in items
+                )
+            else:
+                yield ': keepalive\n\n'
+            if once:
+                return
+    finally:
+        subscription.close()
+        metrics.EVENT_STREAMS.dec()
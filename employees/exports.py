@@ -0,0 +1,279 @@
+"""
+Streaming exports of the employee directory and the message log.
+
+Rows are read with ``values_list().iterator(chunk_size=EXPORT_CHUNK_SIZE)``
+and written out one chunk at a time, so memory use does not grow with the
+export size. Each chunk is yielded as soon as it is encoded (the header row
+goes out before the query even runs), and CSV / JSON are gzip-compressed
+with a sync flush per chunk so the client starts receiving data straight
+away. XLSX is a zip archive already, so it is sent as is. Under ASGI the
+stream is handed over as an async iterator, one chunk at a time; Django
+would otherwise read a sync one to the end before sending anything.
+
+CSV text cells that a spreadsheet would run as a formula get a leading
+``'`` (the importer drops it again). XLSX cells are inline strings, which
+are never evaluated, so they hold the raw value.
+"""
+import csv
+import datetime
+import decimal
+import json
+import zipfile
+import zlib
+from xml.sax.saxutils import escape
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.handlers.asgi import ASGIRequest
+from django.http import StreamingHttpResponse
+from django.utils import timezone
+from django.utils.cache import patch_vary_headers
+
+EMPLOYEE_COLUMNS = [
+    ('Employee ID', 'employee_id'),
+    ('First Name', 'first_name'),
+    ('Last Name', 'last_name'),
+    ('Email', 'email'),
+    ('Phone Number', 'phone_number'),
+    ('Department', 'department__name'),
+    ('Position', 'position'),
+    ('Salary', 'salary'),
+    ('Hire Date', 'hire_date'),
+    ('Status', 'status'),
+]
+
+MESSAGE_COLUMNS = [
+    ('Sent At', 'sent_at'),
+    ('Type', 'message_type'),
+    ('Recipient ID', 'recipient__employee_id'),
+    ('Recipient Email', 'recipient__email'),
+    ('Recipient Phone', 'recipient__phone_number'),
+    ('Subject', 'subject'),
+    ('Content', 'content'),
+    ('Sent', 'is_sent'),
+    ('Error', 'error_message'),
+]
+
+
+def _chunks(queryset, fields, chunk_size):
+    """Yield lists of value tuples, ``chunk_size`` rows at a time"""
+    chunk = []
+    for row in queryset.values_list(*fields).iterator(chunk_size=chunk_size):
+        chunk.append(row)
+        if len(chunk) >= chunk_size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def _text(value):
+    if value is None:
+        return ''
+    if isinstance(value, datetime.datetime):
+        return timezone.localtime(value).isoformat() if timezone.is_aware(value) else value.isoformat()
+    if isinstance(value, datetime.date):
+        return value.isoformat()
+    return str(value)
+
+
+# Spreadsheets treat text starting with these as a formula
+FORMULA_PREFIXES = ('=', '+', '-', '@', '\t', '\r')
+
+
+def _cell(value):
+    """``_text()`` for a CSV cell: text that would run as a formula is quoted"""
+    if isinstance(value, str) and value.startswith(FORMULA_PREFIXES):
+        return "'" + value
+    return _text(value)
+
+
+class _Echo:
+    """File-like object whose write() just returns the value (for csv.writer)"""
+
+    def write(self, value):
+        return value
+
+
+def csv_stream(headers, chunks):
+    writer = csv.writer(_Echo())
+    yield writer.writerow(headers).encode()
+    for chunk in chunks:
+        yield ''.join(writer.writerow([_cell(value) for value in row]) for row in chunk).encode()
+
+
+def json_stream(headers, chunks):
+    """A JSON array of objects keyed by column header"""
+    def default(value):
+        if isinstance(value, decimal.Decimal):
+            return str(value)
+        return _text(value)
+
+    yield b'['
+    separator = ''
+    for chunk in chunks:
+        parts = []
+        for row in chunk:
+            parts.append(separator + json.dumps(dict(zip(headers, row)), default=default))
+            separator = ','
+        yield ''.join(parts).encode()
+    yield b']'
+
+
+class _ZipBuffer:
+    """Unseekable sink for zipfile; drain() hands back what was written so far"""
+
+    def __init__(self):
+        self.parts = []
+
+    def write(self, data):
+        self.parts.append(bytes(data))
+        return len(data)
+
+    def flush(self):
+        pass
+
+    def drain(self):
+        data = b''.join(self.parts)
+        self.parts = []
+        return data
+
+
+XLSX_PARTS = {
+    '[Content_Types].xml': (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        '<Types xmlns="http://schemas.openxmlformats.org/package/2006/content-types">'
+        '<Default Extension="rels" ContentType="application/vnd.openxmlformats-package.relationships+xml"/>'
+        '<Default Extension="xml" ContentType="application/xml"/>'
+        '<Override PartName="/xl/workbook.xml" '
+        'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet.main+xml"/>'
+        '<Override PartName="/xl/worksheets/sheet1.xml" '
+        'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.worksheet+xml"/>'
+        '</Types>'
+    ),
+    '_rels/.rels': (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+        '<Relationship Id="rId1" Target="xl/workbook.xml" '
+        'Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/officeDocument"/>'
+        '</Relationships>'
+    ),
+    'xl/workbook.xml': (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        '<workbook xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main" '
+        'xmlns:r="http://schemas.openxmlformats.org/officeDocument/2006/relationships">'
+        '<sheets><sheet name="Export" sheetId="1" r:id="rId1"/></sheets></workbook>'
+    ),
+    'xl/_rels/workbook.xml.rels': (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+        '<Relationship Id="rId1" Target="worksheets/sheet1.xml" '
+        'Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/worksheet"/>'
+        '</Relationships>'
+    ),
+}
+
+
+def _xlsx_row(values):
+    cells = []
+    for value in values:
+        if isinstance(value, (int, float, decimal.Decimal)) and not isinstance(value, bool):
+            cells.append(f'<c><v>{value}</v></c>')
+        else:
+            cells.append(f'<c t="inlineStr"><is><t xml:space="preserve">{escape(_text(value))}</t></is></c>')
+    return '<row>' + ''.join(cells) + '</row>'
+
+
+def xlsx_stream(headers, chunks):
+    """
+    A single-sheet workbook written straight into a streamed zip.
+
+    Cells use inline strings, so no shared-strings table has to be built
+    (and held in memory) before the sheet can be written.
+    """
+    buffer = _ZipBuffer()
+    with zipfile.ZipFile(buffer, 'w', compression=zipfile.ZIP_DEFLATED) as archive:
+        for name, content in XLSX_PARTS.items():
+            archive.writestr(name, content)
+        with archive.open('xl/worksheets/sheet1.xml', 'w', force_zip64=True) as sheet:
+            sheet.write((
+                '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+                '<worksheet xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main"><sheetData>'
+                + _xlsx_row(headers)
+            ).encode())
+            yield buffer.drain()
+            for chunk in chunks:
+                sheet.write(''.join(_xlsx_row(row) for row in chunk).encode())
+                yield buffer.drain()
+            sheet.write(b'</sheetData></worksheet>')
+    yield buffer.drain()
+
+
+EXPORT_FORMATS = {
+    'csv': (csv_stream, 'text/csv; charset=utf-8'),
+    'json': (json_stream, 'application/json'),
+    'xlsx': (xlsx_stream, 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'),
+}
+
+
+def gzip_stream(stream):
+    """Gzip each piece and flush it, so compression never holds data back"""
+    compressor = zlib.compressobj(6, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+    for data in stream:
+        yield compressor.compress(data) + compressor.flush(zlib.Z_SYNC_FLUSH)
+    yield compressor.flush()
+
+
+async def async_stream(stream):
+    """
+    ``stream`` as an async iterator, each chunk produced on the request's
+    sync thread (where its database cursor lives)
+    """
+    def step():
+        return next(stream, None)
+
+    try:
+        while (data := await sync_to_async(step)()) is not None:
+            yield data
+    finally:
+        await sync_to_async(stream.close)()
+
+
+def accepts_gzip(request):
+    """Whether Accept-Encoding allows gzip; ``gzip;q=0`` (or ``*;q=0``) refuses it"""
+    qualities = {}
+    for item in request.headers.get('Accept-Encoding', '').split(','):
+        coding, *params = item.split(';')
+        quality = 1.0
+        for param in params:
+            name, _, value = param.partition('=')
+            if name.strip().lower() == 'q':
+                try:
+                    quality = float(value)
+                except ValueError:
+                    quality = 0.0
+        qualities[coding.strip().lower()] = quality
+    return qualities.get('gzip', qualities.get('*', 0)) > 0
+
+
+def export_response(request, queryset, columns, basename, export_format):
+    """A StreamingHttpResponse of ``queryset`` in ``export_format``"""
+    writer, content_type = EXPORT_FORMATS[export_format]
+    headers = [header for header, _ in columns]
+    fields = [field for _, field in columns]
+    chunks = _chunks(queryset, fields, getattr(settings, 'EXPORT_CHUNK_SIZE', 2000))
+    stream = writer(headers, chunks)
+
+    response = StreamingHttpResponse(content_type=content_type)
+    if export_format != 'xlsx':
+        patch_vary_headers(response, ('Accept-Encoding',))
+        if accepts_gzip(request):
+            stream = gzip_stream(stream)
+            response.headers['Content-Encoding'] = 'gzip'
+    response.streaming_content = async_stream(stream) if isinstance(request, ASGIRequest) else stream
+
+    filename = f'{basename}-{timezone.localdate():%Y%m%d}.{export_format}'
+    response.headers['Content-Disposition'] = f'attachment; filename="{filename}"'
+    response.headers['X-Accel-Buffering'] = 'no'  # let nginx pass chunks straight through
+    return response
+
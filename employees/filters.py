@@ -0,0 +1,23 @@
+from .search import get_search_backend
+
+
+def filter_employees(employees, params):
+    """
+    Apply the employee_list search / department / status filters.
+
+    ``params`` is anything with ``.get()`` - request.GET or a form's
+    cleaned_data - so other views can target the same set of employees.
+    """
+    search_query = params.get('search')
+    if search_query:
+        employees = get_search_backend().filter(employees, search_query)
+
+    dept_filter = params.get('department')
+    if dept_filter:
+        employees = employees.filter(department_id=getattr(dept_filter, 'pk', dept_filter))
+
+    status_filter = params.get('status')
+    if status_filter:
+        employees = employees.filter(status=status_filter)
+
+    return employees
@@ -2,7 +2,10 @@ from django import forms
 from django.contrib.auth.forms import UserCreationForm, AuthenticationForm
 from django.contrib.auth.models import User
 from django.forms.widgets import TextInput, PasswordInput
-from .models import Employee, Department
+from django.conf import settings
+from django.urls import reverse
+from .models import Employee, Department, Message
+from .recipients import get_active_recipient
 
 """class CreateUserForm(UserCreationForm):
     email = forms.EmailField(required=True)
@@ -68,6 +71,52 @@ class EmployeeForm(forms.ModelForm):
         }
 
 
+class EmployeeImportRowForm(EmployeeForm):
+    """
+    EmployeeForm's field rules for one imported row. The department comes in
+    by name, and employee_id / email uniqueness is checked per batch by the
+    importer, so neither costs a query here.
+    """
+    department = forms.CharField(max_length=100)
+
+    class Meta(EmployeeForm.Meta):
+        fields = None
+        exclude = ['department']
+
+    def validate_unique(self):
+        pass
+
+    def rebind(self, data):
+        """
+        Point the form at another row. Building a form deep-copies every
+        field, which costs more than validating the row, so the importer
+        reuses one instance.
+        """
+        self.data = data
+        self.instance = self._meta.model()
+        self._errors = None
+        return self
+
+
+class EmployeeImportForm(forms.Form):
+    file = forms.FileField(
+        help_text='CSV with a header row, a JSON array of objects, or JSON Lines.',
+        widget=forms.ClearableFileInput(attrs={'class': 'form-control', 'accept': '.csv,.json,.jsonl'})
+    )
+    update_existing = forms.BooleanField(
+        required=False, widget=forms.CheckboxInput(attrs={'class': 'form-check-input'}),
+        help_text='Update employees whose Employee ID already exists instead of rejecting the row.'
+    )
+    create_departments = forms.BooleanField(
+        required=False, widget=forms.CheckboxInput(attrs={'class': 'form-check-input'}),
+        help_text='Create departments that do not exist yet.'
+    )
+    dry_run = forms.BooleanField(
+        required=False, widget=forms.CheckboxInput(attrs={'class': 'form-check-input'}),
+        help_text='Validate only; nothing is saved.'
+    )
+
+
 class DepartmentForm(forms.ModelForm):
     class Meta:
         model = Department
@@ -77,8 +126,62 @@ class DepartmentForm(forms.ModelForm):
             'description': forms.Textarea(attrs={'class': 'form-control', 'rows': 3}),
         }
 
+class RecipientAutocompleteWidget(forms.Widget):
+    """
+    Type-ahead recipient picker: a search box backed by the recipient
+    autocomplete API, submitting only the chosen employee id.
+    """
+    template_name = 'employees/widgets/recipient_autocomplete.html'
+
+    class Media:
+        js = ['js/recipient-autocomplete.js']
+
+    def __init__(self, attrs=None, whatsapp=False):
+        super().__init__(attrs)
+        self.whatsapp = whatsapp
+
+    def get_context(self, name, value, attrs):
+        context = super().get_context(name, value, attrs)
+        employee = None
+        if value not in (None, ''):
+            try:
+                employee = get_active_recipient(int(value), whatsapp=self.whatsapp)
+            except (TypeError, ValueError):
+                pass
+        context['widget'].update({
+            'selected_label': employee.full_name if employee else '',
+            'url': reverse('recipient_autocomplete'),
+            'channel': 'whatsapp' if self.whatsapp else 'email',
+        })
+        return context
+
+
+class RecipientField(forms.IntegerField):
+    """
+    Active employee, submitted as an id and checked with a single lookup;
+    cleans to the Employee itself.
+    """
+    default_error_messages = {
+        'invalid_choice': 'Select a valid recipient.',
+    }
+
+    def __init__(self, *, whatsapp=False, **kwargs):
+        kwargs.setdefault('widget', RecipientAutocompleteWidget(whatsapp=whatsapp))
+        super().__init__(**kwargs)
+        self.whatsapp = whatsapp
+
+    def clean(self, value):
+        pk = super().clean(value)
+        if pk is None:
+            return None
+        employee = get_active_recipient(pk, whatsapp=self.whatsapp)
+        if employee is None:
+            raise forms.ValidationError(self.error_messages['invalid_choice'], code='invalid_choice')
+        return employee
+
+
 class EmailMessageForm(forms.Form):
-    recipient = forms.ChoiceField(choices=[])
+    recipient = RecipientField()
     subject = forms.CharField(max_length=255, widget=forms.TextInput(attrs={
         'class' : 'form-control',
         'placeholder' : 'Enter subject'
@@ -91,14 +194,10 @@ class EmailMessageForm(forms.Form):
 
     def __init__(self, *args, **kwargs):
         super().__init__(*args, **kwargs)
-        self.fields['recipient'].choices = [
-            (emp.id, f"{emp.first_name} {emp.last_name} - {emp.department}")
-            for emp in Employee.objects.filter(status='active')
-        ]
         self.fields['recipient'].widget.attrs.update({'class': 'form-control'})
 
 class WhatsAppMessageForm(forms.Form):
-    recipient = forms.ChoiceField(choices=[])
+    recipient = RecipientField(whatsapp=True)
     content = forms.CharField(widget=forms.Textarea(attrs={
         'class' : 'form-control',
         'rows' : 4,
@@ -108,8 +207,42 @@ class WhatsAppMessageForm(forms.Form):
 
     def __init__(self, *args, **kwargs):
         super().__init__(*args, **kwargs)
-        self.fields['recipient'].choices = [
-            (emp.id, f"{emp.first_name} {emp.last_name} - {emp.phone_number}")
-            for emp in Employee.objects.filter(status='active', phone_number__isnull=False)
-        ]
-        self.fields['recipient'].widget.attrs.update({'class' : 'form-control'})
\ No newline at end of file
+        self.fields['recipient'].widget.attrs.update({'class' : 'form-control'})
+
+
+class BroadcastMessageForm(forms.Form):
+    """Message every employee matching a department / status / search filter"""
+    message_type = forms.ChoiceField(choices=Message.MESSAGE_TYPES, widget=forms.Select(attrs={
+        'class' : 'form-control'
+    }))
+    department = forms.ModelChoiceField(
+        queryset=Department.objects.all(), required=False, empty_label='All Departments',
+        widget=forms.Select(attrs={'class' : 'form-control'})
+    )
+    status = forms.ChoiceField(
+        choices=[('', 'All Status')] + Employee.STATUS_CHOICES, required=False, initial='active',
+        widget=forms.Select(attrs={'class' : 'form-control'})
+    )
+    search = forms.CharField(required=False, widget=forms.TextInput(attrs={
+        'class' : 'form-control',
+        'placeholder' : 'Name or Employee ID'
+    }))
+    subject = forms.CharField(max_length=255, required=False, widget=forms.TextInput(attrs={
+        'class' : 'form-control',
+        'placeholder' : 'Enter subject (email only)'
+    }))
+    content = forms.CharField(widget=forms.Textarea(attrs={
+        'class' : 'form-control',
+        'rows' : 6,
+        'placeholder' : 'Enter your message..'
+    }))
+
+    def clean(self):
+        cleaned_data = super().clean()
+        if cleaned_data.get('message_type') == 'email' and not cleaned_data.get('subject'):
+            self.add_error('subject', 'A subject is required for email broadcasts.')
+        if cleaned_data.get('message_type') == 'whatsapp':
+            max_length = getattr(settings, 'WHATSAPP_MESSAGE_MAX_LENGTH', 1600)
+            if len(cleaned_data.get('content') or '') > max_length:
+                self.add_error('content', f'WhatsApp messages are limited to {max_length} characters.')
+        return cleaned_data
@@ -0,0 +1,39 @@
+"""
+Version counters for the server-side template fragment cache.
+
+Templates wrap expensive blocks in ``{% versioned_cache %}`` (see
+``employees.templatetags.fragment_cache``), naming the models the block
+shows. A fragment's cache key includes the current version of each of
+those models, and the model signals replace the version after every
+committed write, so stale fragments are never read again and simply
+expire. Browser caching is unaffected: pages stay ``no-store``.
+"""
+import time
+
+from django.core.cache import cache
+
+FRAGMENT_MODELS = ('employee', 'department', 'message')
+
+
+def _version_key(model):
+    return f'employees:fragment_version:{model}'
+
+
+def fragment_versions(models):
+    """The current version of each model name, in order"""
+    keys = [_version_key(model) for model in models]
+    versions = cache.get_many(keys)
+    missing = [key for key in keys if key not in versions]
+    if missing:
+        initial = time.time_ns()
+        for key in missing:
+            cache.add(key, initial, None)
+        # another process may have added its own first
+        versions.update(cache.get_many(missing))
+    return [versions.get(key, 0) for key in keys]
+
+
+def bump_fragment_version(*models):
+    """Make every cached fragment that shows one of these models stale"""
+    version = time.time_ns()
+    cache.set_many({_version_key(model): version for model in models}, None)
@@ -0,0 +1,90 @@
+"""
+Headcount and payroll over time.
+
+Employee only holds the current state, so two tables keep the history:
+EmployeeStatusChange logs every hire, status change and removal as it
+happens (from the model signals and the importer), and HeadcountSnapshot
+holds one row per day, department and status, written once a day by
+``manage.py snapshot_headcount``. ``headcount_series()`` answers a date
+range from the snapshots with one index range scan.
+"""
+import datetime
+
+from django.db.models import Count, Sum
+
+from .models import Department, Employee, EmployeeStatusChange, HeadcountSnapshot
+
+STATUSES = [status for status, _ in Employee.STATUS_CHOICES]
+
+MAX_SERIES_DAYS = 3660
+
+
+def status_change(employee_id, department_id, old_status, new_status):
+    """An unsaved log entry, or None when the status did not change"""
+    if old_status == new_status:
+        return None
+    return EmployeeStatusChange(
+        employee_id=employee_id, department_id=department_id,
+        old_status=old_status or '', new_status=new_status or '',
+    )
+
+
+def log_status_changes(changes):
+    """Save the entries from status_change(), skipping the Nones"""
+    EmployeeStatusChange.objects.bulk_create([change for change in changes if change is not None])
+
+
+def take_headcount_snapshot(date=None):
+    """
+    Store the current headcount and payroll per department and status
+    under ``date`` (today by default). Re-running for the same date
+    overwrites that day's rows. Returns the number of rows written.
+    """
+    date = date or datetime.date.today()
+    totals = {
+        (row['department_id'], row['status']): row
+        for row in Employee.objects.values('department_id', 'status').annotate(
+            headcount=Count('id'), total_salary=Sum('salary'),
+        ).order_by()
+    }
+    rows = []
+    for department_id in Department.objects.values_list('pk', flat=True):
+        for status in STATUSES:
+            total = totals.get((department_id, status), {})
+            rows.append(HeadcountSnapshot(
+                date=date, department_id=department_id, status=status,
+                headcount=total.get('headcount', 0), total_salary=total.get('total_salary') or 0,
+            ))
+    HeadcountSnapshot.objects.bulk_create(
+        rows, update_conflicts=True, unique_fields=['department', 'status', 'date'],
+        update_fields=['headcount', 'total_salary'],
+    )
+    return len(rows)
+
+
+def headcount_series(start, end, department=None, status='active'):
+    """
+    [{'date', 'headcount', 'payroll'}] for every day from ``start`` to
+    ``end`` inclusive, summed over departments unless ``department`` is
+    given. Days without a snapshot have None for both values.
+    """
+    snapshots = HeadcountSnapshot.objects.filter(status=status, date__range=(start, end))
+    if department:
+        snapshots = snapshots.filter(department_id=getattr(department, 'pk', department))
+    by_date = {
+        row['date']: row
+        for row in snapshots.values('date').annotate(
+            headcount=Sum('headcount'), payroll=Sum('total_salary'),
+        ).order_by('date')
+    }
+    series = []
+    day = start
+    while day <= end:
+        row = by_date.get(day)
+        series.append({
+            'date': day.isoformat(),
+            'headcount': row['headcount'] if row else None,
+            'payroll': float(row['payroll']) if row else None,
+        })
+        day += datetime.timedelta(days=1)
+    return series
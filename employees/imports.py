@@ -0,0 +1,328 @@
+"""
+Bulk employee import from CSV, JSON arrays or JSON Lines.
+
+Rows are parsed lazily and handled ``EMPLOYEE_IMPORT_BATCH_SIZE`` at a time:
+each row is validated with ``EmployeeImportRowForm`` (the EmployeeForm field
+rules), departments are resolved by name from a map loaded once, and
+employee_id / email uniqueness is checked with one query per batch. Each
+batch is then written with bulk_create / bulk_update in its own
+transaction, so a bad row is reported without losing the rest of the file.
+
+Uploads through the import page are capped at EMPLOYEE_IMPORT_MAX_ROWS rows,
+so the request finishes inside the worker timeout; ``manage.py
+import_employees`` takes files of any size.
+"""
+import codecs
+import csv
+import io
+import itertools
+import json
+import time
+from dataclasses import dataclass, field
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from .analytics import invalidate_analytics
+from .exports import FORMULA_PREFIXES
+from .forms import EmployeeImportRowForm
+from .fragments import bump_fragment_version
+from .history import log_status_changes, status_change
+from .models import Department, Employee
+from .recipients import invalidate_active_recipients
+from .search import get_search_backend
+from .stats import invalidate_dashboard_stats, rebuild_department_stats
+
+# Header aliases, so files written by the employee export can be read back
+COLUMN_ALIASES = {
+    'employee_id': 'employee_id', 'employee id': 'employee_id', 'id': 'employee_id',
+    'first_name': 'first_name', 'first name': 'first_name',
+    'last_name': 'last_name', 'last name': 'last_name',
+    'email': 'email',
+    'phone_number': 'phone_number', 'phone number': 'phone_number', 'phone': 'phone_number',
+    'date_of_birth': 'date_of_birth', 'date of birth': 'date_of_birth',
+    'gender': 'gender',
+    'address': 'address',
+    'department': 'department',
+    'position': 'position',
+    'salary': 'salary',
+    'hire_date': 'hire_date', 'hire date': 'hire_date',
+    'status': 'status',
+}
+
+IMPORT_FIELDS = [
+    'employee_id', 'first_name', 'last_name', 'email', 'phone_number', 'date_of_birth',
+    'gender', 'address', 'position', 'salary', 'hire_date', 'status',
+]
+
+
+class ImportFormatError(ValueError):
+    """The file itself can't be read (as opposed to a bad row)"""
+
+
+class _Utf8Reader(codecs.getreader('utf-8-sig')):
+    def read(self, *args, **kwargs):
+        data = super().read(*args, **kwargs)
+        if not data and self.bytebuffer:
+            # StreamReader quietly drops bytes left over at the end of the file
+            raise UnicodeDecodeError('utf-8', self.bytebuffer, 0, len(self.bytebuffer), 'unexpected end of data')
+        return data
+
+
+def _text_stream(fileobj):
+    """Decode a binary file lazily (a BOM is dropped); text files pass through"""
+    if isinstance(fileobj, io.TextIOBase):
+        return fileobj
+    return _Utf8Reader(fileobj)
+
+
+def read_csv(fileobj):
+    try:
+        yield from csv.DictReader(_text_stream(fileobj))
+    except csv.Error as e:
+        # e.g. a field over csv.field_size_limit()
+        raise ImportFormatError(f'Invalid CSV: {e}.') from e
+    except UnicodeDecodeError as e:
+        raise ImportFormatError('The file is not UTF-8 text.') from e
+
+
+def read_json(fileobj, read_size=64 * 1024):
+    """
+    Yield the objects of a JSON array, or of JSON Lines, without loading the
+    whole document.
+    """
+    try:
+        yield from _read_json(_text_stream(fileobj), read_size)
+    except UnicodeDecodeError as e:
+        raise ImportFormatError('The file is not UTF-8 text.') from e
+
+
+def _read_json(stream, read_size):
+    decoder = json.JSONDecoder()
+    buffer, position, eof = '', 0, False
+    in_array = None
+    while True:
+        # skip whitespace and the commas between records
+        while position < len(buffer) and buffer[position] in ' \t\r\n,':
+            position += 1
+        if position == len(buffer) or in_array is not None and buffer[position] != ']':
+            try:
+                if position == len(buffer):
+                    raise ValueError
+                value, position = decoder.raw_decode(buffer, position)
+            except ValueError:
+                if eof:
+                    if position < len(buffer):
+                        raise ImportFormatError(f'Invalid JSON near {buffer[position:position + 40]!r}.')
+                    if in_array:
+                        raise ImportFormatError('Unterminated JSON array.')
+                    return
+                # the record continues in the next chunk
+                chunk = stream.read(read_size)
+                eof = not chunk
+                buffer, position = buffer[position:] + chunk, 0
+                continue
+            if not isinstance(value, dict):
+                raise ImportFormatError('Each JSON record must be an object.')
+            yield value
+        elif in_array is None:
+            in_array = buffer[position] == '['
+            position += in_array
+        else:
+            return  # closing bracket
+
+
+READERS = {
+    'csv': read_csv,
+    'json': read_json,
+    'jsonl': read_json,
+}
+
+
+def detect_format(filename):
+    extension = filename.rsplit('.', 1)[-1].lower() if '.' in filename else ''
+    if extension not in READERS:
+        raise ImportFormatError('Unsupported file type; use .csv, .json or .jsonl.')
+    return extension
+
+
+def normalize_row(raw):
+    """Map header aliases onto field names, strip whitespace and the export's formula quoting"""
+    row = {}
+    for key, value in raw.items():
+        name = COLUMN_ALIASES.get(str(key).strip().lower())
+        if name is None:
+            continue
+        if value is None:
+            value = ''
+        if isinstance(value, str):
+            value = value.strip()
+            if value.startswith("'") and value[1:].startswith(FORMULA_PREFIXES):
+                value = value[1:]
+        row[name] = value
+    if not row.get('status'):
+        row['status'] = 'active'
+    return row
+
+
+@dataclass
+class ImportResult:
+    rows: int = 0
+    created: int = 0
+    updated: int = 0
+    errors: list = field(default_factory=list)  # (row number, {field: [messages]})
+    elapsed: float = 0.0
+    dry_run: bool = False
+
+    @property
+    def rows_per_second(self):
+        return self.rows / self.elapsed if self.elapsed else 0.0
+
+    @property
+    def error_count(self):
+        return len(self.errors)
+
+
+class EmployeeImporter:
+    def __init__(self, update_existing=False, create_departments=False, dry_run=False, batch_size=None):
+        self.update_existing = update_existing
+        self.create_departments = create_departments
+        self.dry_run = dry_run
+        self.batch_size = batch_size or getattr(settings, 'EMPLOYEE_IMPORT_BATCH_SIZE', 500)
+        self.departments = {d.name.lower(): d for d in Department.objects.all()}
+        self.form = EmployeeImportRowForm({})
+        # employee_ids / emails already seen earlier in this file
+        self.seen_ids = set()
+        self.seen_emails = set()
+
+    def run(self, rows):
+        """Import an iterable of raw row dicts; returns an ImportResult"""
+        result = ImportResult(dry_run=self.dry_run)
+        start = time.perf_counter()
+        batch = []
+        for row_number, raw in enumerate(rows, start=1):
+            result.rows += 1
+            batch.append((row_number, raw))
+            if len(batch) >= self.batch_size:
+                self.import_batch(batch, result)
+                batch = []
+        if batch:
+            self.import_batch(batch, result)
+        result.elapsed = time.perf_counter() - start
+        return result
+
+    def import_file(self, fileobj, file_format, max_rows=None):
+        rows = READERS[file_format](fileobj)
+        if max_rows is not None:
+            # read every row first, so a file over the cap writes nothing
+            rows = list(itertools.islice(rows, max_rows + 1))
+            if len(rows) > max_rows:
+                raise ImportFormatError(
+                    f'The file has more than {max_rows:,} rows; split it, or use manage.py import_employees.'
+                )
+        return self.run(rows)
+
+    def resolve_department(self, name):
+        department = self.departments.get(name.lower())
+        if department is None and self.create_departments and not self.dry_run:
+            department = Department.objects.create(name=name)
+            self.departments[name.lower()] = department
+        return department
+
+    def validate(self, row_number, raw, result):
+        """An unsaved Employee for the row, or None after recording its errors"""
+        form = self.form.rebind(normalize_row(raw))
+        if not form.is_valid():
+            result.errors.append((row_number, {name: list(errors) for name, errors in form.errors.items()}))
+            return None
+
+        department_name = form.cleaned_data['department']
+        department = self.resolve_department(department_name)
+        if department is None and not (self.create_departments and self.dry_run):
+            result.errors.append((row_number, {'department': [f'Unknown department "{department_name}".']}))
+            return None
+
+        employee = form.save(commit=False)
+        employee.department = department
+        errors = {}
+        if employee.employee_id in self.seen_ids:
+            errors['employee_id'] = ['Duplicate Employee ID earlier in this file.']
+        if employee.email in self.seen_emails:
+            errors['email'] = ['Duplicate email earlier in this file.']
+        if errors:
+            result.errors.append((row_number, errors))
+            return None
+        self.seen_ids.add(employee.employee_id)
+        self.seen_emails.add(employee.email)
+        return employee
+
+    def import_batch(self, batch, result):
+        candidates = []
+        for row_number, raw in batch:
+            employee = self.validate(row_number, raw, result)
+            if employee is not None:
+                candidates.append((row_number, employee))
+        if not candidates:
+            return
+
+        # One query for every existing row this batch could collide with
+        existing_by_id, existing_by_email, existing_departments, existing_statuses = {}, {}, {}, {}
+        for pk, employee_id, email, department_id, status in Employee.objects.filter(
+            Q(employee_id__in=[e.employee_id for _, e in candidates]) |
+            Q(email__in=[e.email for _, e in candidates])
+        ).values_list('pk', 'employee_id', 'email', 'department_id', 'status'):
+            existing_by_id[employee_id] = pk
+            existing_by_email[email] = pk
+            existing_departments[pk] = department_id
+            existing_statuses[pk] = status
+
+        to_create, to_update = [], []
+        for row_number, employee in candidates:
+            existing_pk = existing_by_id.get(employee.employee_id)
+            email_owner = existing_by_email.get(employee.email)
+            if existing_pk and not self.update_existing:
+                result.errors.append((row_number, {'employee_id': ['Employee with this Employee ID already exists.']}))
+            elif email_owner and email_owner != existing_pk:
+                result.errors.append((row_number, {'email': ['Employee with this Email already exists.']}))
+            elif existing_pk:
+                employee.pk = existing_pk
+                to_update.append(employee)
+            else:
+                to_create.append(employee)
+
+        if self.dry_run:
+            result.created += len(to_create)
+            result.updated += len(to_update)
+            return
+
+        now = timezone.now()
+        for employee in to_update:
+            employee.updated_at = now
+        with transaction.atomic():
+            Employee.objects.bulk_create(to_create, batch_size=self.batch_size)
+            Employee.objects.bulk_update(
+                to_update, IMPORT_FIELDS + ['department', 'updated_at'], batch_size=self.batch_size
+            )
+            # bulk writes skip the model signals, so refresh derived data here
+            changed = to_create + to_update
+            rebuild_department_stats(
+                {e.department_id for e in changed} | {existing_departments[e.pk] for e in to_update}
+            )
+            log_status_changes(
+                status_change(e.pk, e.department_id, existing_statuses.get(e.pk), e.status) for e in changed
+            )
+            transaction.on_commit(invalidate_dashboard_stats)
+            transaction.on_commit(invalidate_active_recipients)
+            transaction.on_commit(invalidate_analytics)
+            transaction.on_commit(lambda: bump_fragment_version('employee'))
+            transaction.on_commit(lambda: self.reindex(changed))
+        result.created += len(to_create)
+        result.updated += len(to_update)
+
+    @staticmethod
+    def reindex(employees):
+        backend = get_search_backend()
+        for employee in employees:
+            backend.index_employee(employee)
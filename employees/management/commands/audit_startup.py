@@ -0,0 +1,126 @@
+import json
+import os
+import re
+import statistics
+import subprocess
+import sys
+from collections import defaultdict
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+# Packages a worker should only import when a feature first needs them
+LAZY_PACKAGES = ('celery', 'numpy', 'openpyxl', 'requests', 'twilio', 'urllib3')
+
+IMPORTTIME_LINE = re.compile(r'^import time:\s+(\d+) \|\s+(\d+) \| ( *)(\S+)$')
+
+# Runs in the child: import the WSGI module the way gunicorn does, then the
+# URLconf (and so every view module), which the first request would import
+BOOT_SCRIPT = """
+import time
+start = time.perf_counter()
+import {module}
+from django.urls import get_resolver
+get_resolver().url_patterns
+print(time.perf_counter() - start)
+"""
+
+
+def parse_importtime(output):
+    """{module: (self_us, cumulative_us, depth)} from ``python -X importtime`` output"""
+    modules = {}
+    for line in output.splitlines():
+        match = IMPORTTIME_LINE.match(line)
+        if match:
+            self_us, cumulative_us, indent, module = match.groups()
+            modules[module] = (int(self_us), int(cumulative_us), len(indent) // 2)
+    return modules
+
+
+class Command(BaseCommand):
+    help = (
+        'Import the WSGI application and URLconf in fresh processes under "python -X importtime" '
+        'and report where worker start-up time goes, by module and by package'
+    )
+    requires_system_checks = []
+
+    def add_arguments(self, parser):
+        parser.add_argument('--runs', type=int, default=5, help='Fresh processes to take medians over')
+        parser.add_argument('--top', type=int, default=20, help='Modules to list, by cumulative time')
+        parser.add_argument(
+            '--with-warmup', action='store_true', help='Include the template warm-up (TEMPLATE_WARMUP) in the timing'
+        )
+        parser.add_argument('--json', action='store_true', help='Print the results as JSON')
+        parser.add_argument(
+            '--check', action='store_true',
+            help=f'Fail if any of {", ".join(LAZY_PACKAGES)} is imported at start-up',
+        )
+
+    def handle(self, *args, **options):
+        module = settings.WSGI_APPLICATION.rsplit('.', 1)[0]
+        env = {**os.environ, 'TEMPLATE_WARMUP': str(options['with_warmup'])}
+        boot_times, runs = [], []
+        for _ in range(options['runs']):
+            child = subprocess.run(
+                [sys.executable, '-X', 'importtime', '-c', BOOT_SCRIPT.format(module=module)],
+                capture_output=True, text=True, env=env, cwd=settings.BASE_DIR,
+            )
+            if child.returncode:
+                raise CommandError(f'Importing {module} failed:\n{child.stderr}')
+            boot_times.append(float(child.stdout.strip().splitlines()[-1]) * 1000)
+            runs.append(parse_importtime(child.stderr))
+
+        # Medians per module over the runs (a module missing from a run counts as 0)
+        modules = {}
+        for name, (_, _, depth) in runs[0].items():
+            modules[name] = {
+                'self_ms': statistics.median(run.get(name, (0, 0, 0))[0] for run in runs) / 1000,
+                'cumulative_ms': statistics.median(run.get(name, (0, 0, 0))[1] for run in runs) / 1000,
+                'depth': depth,
+            }
+        packages = defaultdict(float)
+        for name, row in modules.items():
+            packages[name.split('.')[0]] += row['self_ms']
+        lazy_loaded = sorted(
+            package for package in LAZY_PACKAGES if any(name.split('.')[0] == package for name in modules)
+        )
+
+        results = {
+            'module': module,
+            'runs': options['runs'],
+            'boot_ms': round(statistics.median(boot_times), 1),
+            'imported_modules': len(modules),
+            'top_modules': [
+                {'module': name, 'cumulative_ms': round(row['cumulative_ms'], 2), 'self_ms': round(row['self_ms'], 2)}
+                for name, row in sorted(modules.items(), key=lambda item: -item[1]['cumulative_ms'])[:options['top']]
+            ],
+            'packages': {
+                package: round(total, 2) for package, total in sorted(packages.items(), key=lambda item: -item[1])
+            },
+            'lazy_packages_loaded': lazy_loaded,
+        }
+        if options['json']:
+            self.stdout.write(json.dumps(results, indent=2))
+        else:
+            self.report(results)
+
+        if options['check'] and lazy_loaded:
+            raise CommandError(f'Imported at start-up: {", ".join(lazy_loaded)}')
+
+    def report(self, results):
+        self.stdout.write(
+            f"import {results['module']}: {results['boot_ms']:.1f} ms, {results['imported_modules']} modules "
+            f"(medians of {results['runs']} runs)\n"
+        )
+        self.stdout.write(f"{'cumulative ms':>14}{'self ms':>10}  module")
+        for row in results['top_modules']:
+            self.stdout.write(f"{row['cumulative_ms']:>14.2f}{row['self_ms']:>10.2f}  {row['module']}")
+        self.stdout.write(f"\n{'self ms':>14}  package")
+        for package, total in list(results['packages'].items())[:15]:
+            self.stdout.write(f"{total:>14.2f}  {package}")
+        if results['lazy_packages_loaded']:
+            self.stdout.write(self.style.WARNING(
+                f"\nLoaded at start-up but only needed on first use: {', '.join(results['lazy_packages_loaded'])}"
+            ))
+        else:
+            self.stdout.write(self.style.SUCCESS('\nNo optional heavy package is imported at start-up.'))
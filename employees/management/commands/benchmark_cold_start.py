@@ -0,0 +1,148 @@
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+from django.conf import settings
+from django.core.cache import caches
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test import Client, override_settings
+
+from employees import benchmarks, urls
+from employees.warmup import warm_up
+
+# A JSON route with no template: the first request pays for the middleware
+# chain and the database connection here, not on the first page measured
+PRIMER_ROUTE = 'check_session'
+
+
+class Command(BaseCommand):
+    help = (
+        'Compare first-request and steady-state latency per route in fresh processes, '
+        'with and without the start-up template warm-up, against a seeded test database'
+    )
+    requires_system_checks = []
+
+    def add_arguments(self, parser):
+        parser.add_argument('--departments', type=int, default=20)
+        parser.add_argument('--employees', type=int, default=2000)
+        parser.add_argument('--messages', type=int, default=5000)
+        parser.add_argument('--runs', type=int, default=5, help='Fresh processes per mode')
+        parser.add_argument('--requests', type=int, default=20, help='Steady-state requests per route')
+        parser.add_argument('--routes', nargs='+', help='Only these URL names')
+        parser.add_argument('--output', help="Also write the results as JSON to this file ('-' for stdout)")
+        parser.add_argument(
+            '--keepdb', action='store_true', help='Reuse the test database (and its seeded rows) between runs'
+        )
+        # internal: one measuring process
+        parser.add_argument('--child', choices=['cold', 'warm'], help=argparse.SUPPRESS)
+        parser.add_argument('--database-name', help=argparse.SUPPRESS)
+
+    def handle(self, *args, **options):
+        if options['child']:
+            return self.child(options)
+
+        with benchmarks.test_database(keepdb=options['keepdb']) as database_name:
+            from employees.models import Employee
+            if not (options['keepdb'] and Employee.objects.exists()):
+                self.stdout.write('Seeding...')
+                benchmarks.seed(
+                    departments=options['departments'], employees=options['employees'],
+                    messages=options['messages'],
+                )
+            # the children open their own connections to the file
+            connection.close()
+            results = {'cold': [], 'warm': []}
+            for run in range(options['runs']):
+                for mode in results:
+                    self.stdout.write(f'  run {run + 1}/{options["runs"]} ({mode})')
+                    results[mode].append(self.spawn(mode, database_name, options))
+
+        summary = self.summarize(results)
+        self.report(summary)
+        if options['output'] == '-':
+            self.stdout.write(json.dumps(summary, indent=2))
+        elif options['output']:
+            with open(options['output'], 'w') as f:
+                json.dump(summary, f, indent=2)
+            self.stdout.write(f"Results written to {options['output']}")
+
+    def spawn(self, mode, database_name, options):
+        command = [
+            sys.executable, str(settings.BASE_DIR / 'manage.py'), 'benchmark_cold_start',
+            '--child', mode, '--database-name', database_name, '--requests', str(options['requests']),
+        ]
+        if options['routes']:
+            command += ['--routes', *options['routes']]
+        child = subprocess.run(command, capture_output=True, text=True, env=os.environ.copy())
+        if child.returncode:
+            raise CommandError(f'Benchmark process failed:\n{child.stderr}')
+        return json.loads(child.stdout)
+
+    def child(self, options):
+        """Runs in a fresh process: time the first and the following requests to each route"""
+        connection.settings_dict['NAME'] = options['database_name']
+        for cache in caches.all():
+            cache.clear()
+        warmup_ms = None
+        if options['child'] == 'warm':
+            start = time.perf_counter()
+            with override_settings(TEMPLATE_WARMUP=True):
+                warm_up()
+            warmup_ms = (time.perf_counter() - start) * 1000
+
+        routes = benchmarks.discover_routes(urls.urlpatterns, skip={'logout', 'message_events'})
+        if options['routes']:
+            unknown = set(options['routes']) - {name for name, _ in routes}
+            if unknown:
+                raise CommandError(f"Unknown route(s): {', '.join(sorted(unknown))}")
+            routes = [
+                (name, path) for name, path in routes if name in options['routes'] or name == PRIMER_ROUTE
+            ]
+        routes.sort(key=lambda route: route[0] != PRIMER_ROUTE)
+
+        client = Client(HTTP_HOST='localhost')
+        client.force_login(benchmarks.User.objects.get(username='benchmark'))
+        timings = {}
+        for name, path in routes:
+            samples = []
+            for _ in range(options['requests'] + 1):
+                start = time.perf_counter()
+                benchmarks.response_size(client.get(path))
+                samples.append((time.perf_counter() - start) * 1000)
+            timings[name] = {'first_ms': samples[0], 'steady_ms': statistics.median(samples[1:])}
+        self.stdout.write(json.dumps({'warmup_ms': warmup_ms, 'routes': timings}))
+
+    @staticmethod
+    def summarize(results):
+        """Medians over the runs of each mode"""
+        summary = {
+            'runs': len(results['cold']),
+            'warmup_ms': round(statistics.median(run['warmup_ms'] for run in results['warm']), 2),
+            'routes': {},
+        }
+        for name in results['cold'][0]['routes']:
+            def median(mode, field):
+                return round(statistics.median(run['routes'][name][field] for run in results[mode]), 2)
+            summary['routes'][name] = {
+                'cold_first_ms': median('cold', 'first_ms'),
+                'warm_first_ms': median('warm', 'first_ms'),
+                'steady_ms': median('cold', 'steady_ms'),
+            }
+        return summary
+
+    def report(self, summary):
+        header = f"{'route':<24}{'cold first':>12}{'warm first':>12}{'steady':>10}"
+        self.stdout.write(header)
+        self.stdout.write('-' * len(header))
+        for name, row in summary['routes'].items():
+            self.stdout.write(
+                f"{name:<24}{row['cold_first_ms']:>12.2f}{row['warm_first_ms']:>12.2f}{row['steady_ms']:>10.2f}"
+            )
+        self.stdout.write(
+            f"Times in ms, medians of {summary['runs']} runs; the start-up warm-up took {summary['warmup_ms']:.0f} ms"
+        )
@@ -0,0 +1,90 @@
+import statistics
+import time
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.test import Client, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+
+# Sessions go to a cache alias of their own (the session cache's backend
+# under another key prefix), so the benchmark never touches live sessions,
+# rate-limit windows or anything else in the real one
+BENCHMARK_CACHE = 'session_benchmark'
+
+
+class Rollback(Exception):
+    pass
+
+
+class Command(BaseCommand):
+    help = 'Compare DB queries and latency per authenticated request across session engines'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--requests', type=int, default=200, help='Requests per engine and URL')
+        parser.add_argument(
+            '--engines', nargs='+', default=list(settings.SESSION_ENGINES),
+            choices=list(settings.SESSION_ENGINES),
+        )
+        parser.add_argument(
+            '--urls', nargs='+', default=['check_session', 'dashboard'],
+            help='URL names to request while logged in'
+        )
+
+    def handle(self, *args, **options):
+        rows = []
+        try:
+            with transaction.atomic():
+                user = User.objects.create_user('__session_benchmark__')
+                for engine in options['engines']:
+                    for url_name in options['urls']:
+                        rows.append(self.measure(engine, user, url_name, options['requests']))
+                raise Rollback
+        except Rollback:
+            pass
+
+        header = f"{'engine':<16}{'url':<16}{'session q/req':>14}{'total q/req':>13}{'mean ms':>10}{'p95 ms':>9}"
+        self.stdout.write(header)
+        self.stdout.write('-' * len(header))
+        for row in rows:
+            self.stdout.write(
+                f"{row['engine']:<16}{row['url']:<16}{row['session_queries']:>14.2f}"
+                f"{row['queries']:>13.2f}{row['mean_ms']:>10.2f}{row['p95_ms']:>9.2f}"
+            )
+
+    def measure(self, engine, user, url_name, count):
+        benchmark_cache = {**settings.CACHES[settings.SESSION_CACHE_ALIAS], 'KEY_PREFIX': 'session-benchmark'}
+        with override_settings(
+            SESSION_ENGINE=settings.SESSION_ENGINES[engine],
+            CACHES={**settings.CACHES, BENCHMARK_CACHE: benchmark_cache},
+            SESSION_CACHE_ALIAS=BENCHMARK_CACHE,
+        ):
+            client = Client(HTTP_HOST='localhost')
+            client.force_login(user)
+            url = reverse(url_name)
+            client.get(url)  # warm up
+
+            timings, queries, session_queries = [], 0, 0
+            for _ in range(count):
+                with CaptureQueriesContext(connection) as captured:
+                    start = time.perf_counter()
+                    response = client.get(url)
+                    timings.append((time.perf_counter() - start) * 1000)
+                if response.status_code != 200:
+                    raise CommandError(f'{url} returned {response.status_code} with the {engine} engine.')
+                queries += len(captured)
+                session_queries += sum('django_session' in query['sql'] for query in captured)
+            client.logout()  # drops the session from the benchmark cache
+
+        timings.sort()
+        return {
+            'engine': engine,
+            'url': url_name,
+            'session_queries': session_queries / count,
+            'queries': queries / count,
+            'mean_ms': statistics.fmean(timings),
+            'p95_ms': timings[int(len(timings) * 0.95) - 1],
+        }
@@ -0,0 +1,126 @@
+import json
+import platform
+import subprocess
+
+import django
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.utils import timezone
+
+from employees import benchmarks, urls
+
+
+def git_revision():
+    try:
+        return subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True, check=True,
+            cwd=settings.BASE_DIR,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+class Command(BaseCommand):
+    help = (
+        'Seed a throwaway test database, request every employees route at a given '
+        'concurrency and record latency percentiles, queries and bytes per request as JSON'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--departments', type=int, default=20)
+        parser.add_argument('--employees', type=int, default=10000)
+        parser.add_argument('--messages', type=int, default=50000)
+        parser.add_argument('--seed', type=int, default=0, help='Random seed for the generated rows')
+        parser.add_argument('--requests', type=int, default=100, help='Requests per route')
+        parser.add_argument('--concurrency', type=int, default=4, help='Client threads per route')
+        parser.add_argument('--warmup', type=int, default=3, help='Unmeasured requests per thread')
+        parser.add_argument('--routes', nargs='+', help='Only these URL names')
+        parser.add_argument('--output', default='benchmark-results.json', help="JSON results file ('-' for stdout)")
+        parser.add_argument('--compare', help='Earlier results file to show p95 / query deltas against')
+        parser.add_argument(
+            '--keepdb', action='store_true', help='Reuse the test database (and its seeded rows) between runs'
+        )
+
+    def handle(self, *args, **options):
+        baseline = None
+        if options['compare']:
+            try:
+                with open(options['compare']) as f:
+                    baseline = json.load(f)['routes']
+            except (OSError, ValueError, KeyError) as e:
+                raise CommandError(f"Can't read {options['compare']}: {e}")
+
+        with benchmarks.test_database(keepdb=options['keepdb']):
+            results = self.run(options)
+
+        self.report(results, baseline)
+        if options['output'] == '-':
+            self.stdout.write(json.dumps(results, indent=2))
+        else:
+            with open(options['output'], 'w') as f:
+                json.dump(results, f, indent=2)
+            self.stdout.write(f"Results written to {options['output']}")
+
+    def run(self, options):
+        from employees.models import Employee
+
+        if options['keepdb'] and Employee.objects.exists():
+            user = benchmarks.User.objects.get(username='benchmark')
+        else:
+            self.stdout.write('Seeding...')
+            user = benchmarks.seed(
+                departments=options['departments'], employees=options['employees'],
+                messages=options['messages'], random_seed=options['seed'],
+            )
+
+        # logout would end the session every other route needs; the event
+        # stream waits for deliveries
+        routes = benchmarks.discover_routes(urls.urlpatterns, skip={'logout', 'message_events'})
+        if options['routes']:
+            unknown = set(options['routes']) - {name for name, _ in routes}
+            if unknown:
+                raise CommandError(f"Unknown route(s): {', '.join(sorted(unknown))}")
+            routes = [(name, path) for name, path in routes if name in options['routes']]
+
+        results = {
+            'meta': {
+                'revision': git_revision(),
+                'timestamp': timezone.now().isoformat(),
+                'python': platform.python_version(),
+                'django': django.get_version(),
+                'database': connection.vendor,
+                'departments': options['departments'],
+                'employees': Employee.objects.count(),
+                'messages': benchmarks.Message.objects.count(),
+                'requests': options['requests'],
+                'concurrency': options['concurrency'],
+            },
+            'routes': {},
+        }
+        for name, path in routes:
+            self.stdout.write(f'  {name} {path}')
+            results['routes'][name] = benchmarks.run_route(
+                path, user, requests=options['requests'],
+                concurrency=options['concurrency'], warmup=options['warmup'],
+            )
+        return results
+
+    def report(self, results, baseline):
+        header = f"{'route':<24}{'status':>8}{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}{'queries':>9}{'KB':>9}"
+        if baseline:
+            header += f"{'Δp95':>9}{'Δqueries':>10}"
+        self.stdout.write(header)
+        self.stdout.write('-' * len(header))
+        for name, row in results['routes'].items():
+            line = (
+                f"{name:<24}{','.join(map(str, row['statuses'])):>8}{row['p50_ms']:>9.2f}{row['p95_ms']:>9.2f}"
+                f"{row['p99_ms']:>9.2f}{row['queries_per_request']:>9.2f}{row['bytes_per_request'] / 1024:>9.1f}"
+            )
+            previous = (baseline or {}).get(name)
+            if previous:
+                line += (
+                    f"{row['p95_ms'] - previous['p95_ms']:>+9.2f}"
+                    f"{row['queries_per_request'] - previous['queries_per_request']:>+10.2f}"
+                )
+            self.stdout.write(line)
@@ -0,0 +1,30 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from employees.fragments import bump_fragment_version
+from employees.stats import check_department_stats, invalidate_dashboard_stats, rebuild_department_stats
+
+
+class Command(BaseCommand):
+    help = 'Compare DepartmentStats with the Employee table and report (or --fix) any drift'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--fix', action='store_true', help='Rebuild the departments that drifted')
+
+    def handle(self, *args, **options):
+        drift = check_department_stats()
+        if not drift:
+            self.stdout.write(self.style.SUCCESS('DepartmentStats matches the Employee table.'))
+            return
+
+        for department_id, field, stored, actual in drift:
+            self.stdout.write(f'department {department_id}: {field} is {stored}, should be {actual}')
+        departments = {department_id for department_id, *_ in drift}
+        if not options['fix']:
+            raise CommandError(f'{len(departments)} department(s) drifted; run with --fix to rebuild them.')
+
+        with transaction.atomic():
+            rebuild_department_stats(departments)
+            transaction.on_commit(invalidate_dashboard_stats)
+            transaction.on_commit(lambda: bump_fragment_version('employee'))
+        self.stdout.write(self.style.SUCCESS(f'Rebuilt stats for {len(departments)} department(s).'))
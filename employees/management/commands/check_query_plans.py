@@ -0,0 +1,136 @@
+import datetime
+from decimal import Decimal
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.db.models import Q
+
+from employees.models import Employee, Department, Message
+from employees.pagination import KeysetPaginator
+from employees.stats import departments_with_stats, rebuild_department_stats
+
+
+class Rollback(Exception):
+    pass
+
+
+class Command(BaseCommand):
+    help = (
+        'EXPLAIN the hot queries behind dashboard, employee_list, messaging_dashboard '
+        'and message_history, and fail if any of them needs a full table scan'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--seed', type=int, default=5000,
+            help='Employees to seed (rolled back afterwards) so the planner sees a realistic table; 0 to skip'
+        )
+        parser.add_argument('--verbose-plans', action='store_true', help='Print every plan')
+
+    def handle(self, *args, **options):
+        failures = []
+        try:
+            with transaction.atomic():
+                user, employee, department = self.seed(options['seed'])
+                for name, queryset in self.view_queries(user, employee, department):
+                    plan = queryset.explain()
+                    scans = self.full_scans(plan)
+                    if scans:
+                        failures.append(name)
+                        self.stdout.write(self.style.ERROR(f'FULL SCAN  {name}: {", ".join(scans)}'))
+                    else:
+                        self.stdout.write(self.style.SUCCESS(f'ok         {name}'))
+                    if options['verbose_plans'] or scans:
+                        self.stdout.write(plan)
+                raise Rollback
+        except Rollback:
+            pass
+
+        if failures:
+            raise CommandError(f'{len(failures)} query plan(s) fell back to a full table scan.')
+
+    def seed(self, count):
+        user = User.objects.create(username='__query_plan_check__')
+        departments = Department.objects.bulk_create(
+            Department(name=f'__plan_check_dept_{i}') for i in range(max(count // 500, 1))
+        )
+        statuses = ['active', 'active', 'active', 'inactive', 'terminated']
+        Employee.objects.bulk_create(
+            (
+                Employee(
+                    employee_id=f'__PLAN{i}', first_name=f'First{i % 997}', last_name=f'Last{i}',
+                    email=f'plan{i}@example.invalid', phone_number='+100000000',
+                    date_of_birth=datetime.date(1990, 1, 1), gender='O', address='-',
+                    department=departments[i % len(departments)], position='Plan check',
+                    salary=Decimal('1000.00'), hire_date=datetime.date(2020, 1, 1),
+                    status=statuses[i % len(statuses)],
+                )
+                for i in range(count)
+            ),
+            batch_size=1000,
+        )
+        employee = Employee.objects.order_by('id').first()
+        if employee is None:
+            raise CommandError('No employees to check against; run with --seed.')
+        if count:
+            Message.objects.bulk_create(
+                (
+                    Message(sender=user, recipient=employee, message_type='email', content='-', is_sent=True)
+                    for _ in range(count)
+                ),
+                batch_size=1000,
+            )
+            rebuild_department_stats()
+            if connection.vendor in ('postgresql', 'sqlite'):
+                with connection.cursor() as cursor:
+                    cursor.execute('ANALYZE')
+        return user, employee, employee.department
+
+    def view_queries(self, user, employee, department):
+        """The same querysets the views run, minus rendering"""
+        employees = Employee.objects.select_related('department')
+        last = Employee.objects.order_by('first_name', 'last_name', 'id').first()
+        employee_cursor = KeysetPaginator(
+            employees, ['first_name', 'last_name', 'id']
+        ).keyset_filter([last.first_name, last.last_name, last.id])
+        messages = Message.objects.filter(sender=user, recipient=employee)
+        newest = messages.order_by('-sent_at', '-id').first()
+        message_cursor = KeysetPaginator(
+            messages, ['-sent_at', '-id']
+        ).keyset_filter([newest.sent_at, newest.id]) if newest else Q()
+
+        return [
+            ('dashboard: recent employees',
+             Employee.objects.filter(status='active').order_by('-created_at')[:5]),
+            ('department_list: departments with stats',
+             departments_with_stats().order_by('name')),
+            ('employee_list: first page',
+             employees.order_by('first_name', 'last_name', 'id')[:6]),
+            ('employee_list: next page',
+             employees.filter(employee_cursor).order_by('first_name', 'last_name', 'id')[:6]),
+            ('employee_list: department filter',
+             employees.filter(department=department).order_by('first_name', 'last_name', 'id')[:6]),
+            ('employee_list: status filter',
+             employees.filter(status='inactive').order_by('first_name', 'last_name', 'id')[:6]),
+            ('messaging_dashboard: active employees',
+             Employee.objects.filter(status='active')),
+            ('messaging_dashboard: recent messages',
+             Message.objects.filter(sender=user).order_by('-sent_at')[:5]),
+            ('message_history: first page',
+             messages.order_by('-sent_at', '-id')[:21]),
+            ('message_history: next page',
+             messages.filter(message_cursor).order_by('-sent_at', '-id')[:21]),
+        ]
+
+    def full_scans(self, plan):
+        """Tables the plan reads end to end without an index"""
+        scans = []
+        for line in plan.splitlines():
+            if connection.vendor == 'sqlite':
+                # "SCAN employees_employee" vs "SCAN ... USING INDEX ..." / "SEARCH ..."
+                if 'SCAN ' in line and 'USING' not in line:
+                    scans.append(line[line.index('SCAN '):])
+            elif 'Seq Scan on' in line:
+                scans.append(line[line.index('Seq Scan on'):])
+        return scans
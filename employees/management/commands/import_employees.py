@@ -0,0 +1,44 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from employees.imports import EmployeeImporter, ImportFormatError, detect_format
+
+
+class Command(BaseCommand):
+    help = 'Bulk import employees from a CSV, JSON or JSON Lines file'
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help='File to import')
+        parser.add_argument('--format', choices=['csv', 'json', 'jsonl'], help='Defaults to the file extension')
+        parser.add_argument('--update', action='store_true', help='Update employees whose Employee ID already exists')
+        parser.add_argument('--create-departments', action='store_true', help='Create unknown departments')
+        parser.add_argument('--dry-run', action='store_true', help='Validate only; nothing is saved')
+        parser.add_argument('--batch-size', type=int, help='Rows validated and written per transaction')
+        parser.add_argument('--max-errors', type=int, default=50, help='Row errors to print (all are counted)')
+
+    def handle(self, *args, **options):
+        try:
+            file_format = options['format'] or detect_format(options['path'])
+            importer = EmployeeImporter(
+                update_existing=options['update'],
+                create_departments=options['create_departments'],
+                dry_run=options['dry_run'],
+                batch_size=options['batch_size'],
+            )
+            with open(options['path'], 'rb') as fileobj:
+                result = importer.import_file(fileobj, file_format)
+        except (OSError, ImportFormatError) as e:
+            raise CommandError(str(e))
+
+        for row_number, errors in result.errors[:options['max_errors']]:
+            for field, messages in errors.items():
+                self.stdout.write(self.style.ERROR(f'row {row_number}: {field}: {" ".join(messages)}'))
+        if result.error_count > options['max_errors']:
+            self.stdout.write(f'... and {result.error_count - options["max_errors"]} more rows with errors')
+
+        summary = (
+            f'{result.rows} rows in {result.elapsed:.2f}s ({result.rows_per_second:,.0f} rows/s): '
+            f'{result.created} created, {result.updated} updated, {result.error_count} rejected'
+        )
+        if result.dry_run:
+            summary += ' (dry run, nothing saved)'
+        self.stdout.write(self.style.SUCCESS(summary) if not result.error_count else summary)
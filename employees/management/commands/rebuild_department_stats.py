@@ -0,0 +1,16 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from employees.fragments import bump_fragment_version
+from employees.stats import invalidate_dashboard_stats, rebuild_department_stats
+
+
+class Command(BaseCommand):
+    help = 'Recompute the DepartmentStats table from the Employee table'
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            count = rebuild_department_stats()
+            transaction.on_commit(invalidate_dashboard_stats)
+            transaction.on_commit(lambda: bump_fragment_version('employee'))
+        self.stdout.write(self.style.SUCCESS(f'Rebuilt stats for {count} departments.'))
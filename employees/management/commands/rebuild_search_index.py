@@ -0,0 +1,12 @@
+from django.core.management.base import BaseCommand
+
+from employees.search import get_search_backend
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the employee search index for the configured search backend'
+
+    def handle(self, *args, **options):
+        backend = get_search_backend()
+        backend.rebuild()
+        self.stdout.write(self.style.SUCCESS(f'Rebuilt the {backend.name} search index.'))
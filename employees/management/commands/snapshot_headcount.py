@@ -0,0 +1,29 @@
+import datetime
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from employees.history import take_headcount_snapshot
+
+
+class Command(BaseCommand):
+    help = (
+        'Store today\'s headcount and payroll per department and status. '
+        'Run once a day, late in the day (cron, or the Celery beat schedule).'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--date', help='Store the current figures under this date (YYYY-MM-DD) instead of today'
+        )
+
+    def handle(self, *args, **options):
+        date = None
+        if options['date']:
+            try:
+                date = datetime.date.fromisoformat(options['date'])
+            except ValueError:
+                raise CommandError(f'Invalid --date "{options["date"]}"; expected YYYY-MM-DD.')
+        with transaction.atomic():
+            count = take_headcount_snapshot(date)
+        self.stdout.write(self.style.SUCCESS(f'Stored {count} headcount rows for {date or datetime.date.today()}.'))
@@ -0,0 +1,308 @@
+"""
+Outbound message delivery.
+
+Views only create the ``Message`` rows and call ``enqueue_message()`` or
+``enqueue_broadcast()``; a worker then talks to SMTP / Twilio and records the
+outcome on each row, so a slow provider never holds up a request. ``MESSAGE_QUEUE_BACKEND`` picks the worker:
+
+* ``thread``  - an in-process thread pool (the default, no broker needed)
+* ``celery``  - the matching task in ``employees.task`` on the Celery broker
+* ``asyncio`` - under ASGI, a task on the server's event loop per message, so
+  in-flight sends cost no threads; anything queued from sync code, or from
+  an async view under WSGI, uses the thread pool
+* ``sync``    - deliver inline, inside the request (useful when debugging)
+
+Async views queue with ``aenqueue_message()``. Its deliveries go through
+``adeliver_message()``, which sends email with aiosmtplib and WhatsApp
+messages with the transport's ``asend()``.
+
+Every result is also published to the sender's open pages through
+``employees.events``, which the messaging pages show as live status badges.
+"""
+import asyncio
+import contextvars
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+from django.core.mail import EmailMessage, get_connection
+from django.db import close_old_connections, connections, transaction
+
+from . import metrics
+from .events import publish_delivery
+from .fragments import bump_fragment_version
+from .models import Message
+from .runtime import on_server_loop
+from .transports import get_whatsapp_transport
+
+logger = logging.getLogger(__name__)
+
+SMTP_EMAIL_BACKEND = 'django.core.mail.backends.smtp.EmailBackend'
+
+
+def send_whatsapp_message(phone_number, message_content):
+    """Helper function to send whatsapp message via the shared transport"""
+    try:
+        sid = get_whatsapp_transport().send(phone_number, message_content)
+        logger.info("WhatsApp message sent successfully. SID: %s", sid)
+        return True
+    except Exception as e:
+        logger.warning("WhatsApp send error: %s", e)
+        return False
+
+
+def _send(msg_record, connection=None):
+    """Send one message; returns (is_sent, error_message)"""
+    is_sent, error = _deliver(msg_record, connection)
+    metrics.MESSAGES.inc(message_type=msg_record.message_type, result='sent' if is_sent else 'failed')
+    return is_sent, error
+
+
+def _email_message(msg_record, connection=None):
+    return EmailMessage(
+        subject=msg_record.subject,
+        body=msg_record.content,
+        from_email=getattr(settings, 'EMAIL_HOST_USER', 'noreply@example.com'),
+        to=[msg_record.recipient.email],
+        connection=connection,
+    )
+
+
+def _deliver(msg_record, connection=None):
+    recipient = msg_record.recipient
+    start = time.perf_counter()
+    provider = 'smtp'
+    try:
+        if msg_record.message_type == 'email':
+            email = _email_message(msg_record, connection)
+            if email.send(fail_silently=False) == 1:
+                return True, None
+            return False, "SMTP server did not accept the email."
+        transport = get_whatsapp_transport()
+        provider = getattr(transport, 'provider', 'whatsapp')
+        transport.send(recipient.phone_number, msg_record.content)
+        return True, None
+    except Exception as e:
+        return False, str(e)
+    finally:
+        metrics.PROVIDER_LATENCY.observe(time.perf_counter() - start, provider=provider)
+
+
+async def _asend_email(email):
+    """Send an EmailMessage from async code; returns the number sent, like ``send()``"""
+    if settings.EMAIL_BACKEND != SMTP_EMAIL_BACKEND:
+        # console, locmem, file...: local and quick, but sync only
+        return await sync_to_async(email.send, thread_sensitive=False)(fail_silently=False)
+    try:
+        import aiosmtplib
+    except ImportError:
+        raise ImproperlyConfigured("aiosmtplib not installed. Install with: pip install aiosmtplib")
+    await aiosmtplib.send(
+        email.message(),
+        sender=email.from_email,
+        recipients=email.recipients(),
+        hostname=settings.EMAIL_HOST,
+        port=int(settings.EMAIL_PORT),
+        username=settings.EMAIL_HOST_USER or None,
+        password=settings.EMAIL_HOST_PASSWORD or None,
+        use_tls=settings.EMAIL_USE_SSL,
+        start_tls=settings.EMAIL_USE_TLS,
+        timeout=settings.EMAIL_TIMEOUT,
+    )
+    return 1
+
+
+async def _asend(msg_record):
+    """``_send()`` for async code"""
+    is_sent, error = await _adeliver(msg_record)
+    metrics.MESSAGES.inc(message_type=msg_record.message_type, result='sent' if is_sent else 'failed')
+    return is_sent, error
+
+
+async def _adeliver(msg_record):
+    recipient = msg_record.recipient
+    start = time.perf_counter()
+    provider = 'smtp'
+    try:
+        if msg_record.message_type == 'email':
+            if await _asend_email(_email_message(msg_record)) == 1:
+                return True, None
+            return False, "SMTP server did not accept the email."
+        transport = get_whatsapp_transport()
+        provider = getattr(transport, 'provider', 'whatsapp')
+        if hasattr(transport, 'asend'):
+            await transport.asend(recipient.phone_number, msg_record.content)
+        else:
+            await sync_to_async(transport.send, thread_sensitive=False)(recipient.phone_number, msg_record.content)
+        return True, None
+    except Exception as e:
+        return False, str(e)
+    finally:
+        metrics.PROVIDER_LATENCY.observe(time.perf_counter() - start, provider=provider)
+
+
+def deliver_message(message_id):
+    """Send a queued message and record the result on its row"""
+    try:
+        msg_record = Message.objects.select_related('recipient').get(pk=message_id)
+    except Message.DoesNotExist:
+        return
+    if msg_record.is_sent:
+        # Already delivered (e.g. a retried Celery task)
+        return
+
+    msg_record.is_sent, msg_record.error_message = _send(msg_record)
+    _record(msg_record)
+
+
+def _record(msg_record):
+    """Save a delivery result and tell the sender's open pages about it"""
+    msg_record.save(update_fields=['is_sent', 'error_message'])
+    publish_delivery(msg_record)
+
+
+async def adeliver_message(message_id):
+    """``deliver_message()`` for async code: the send itself never blocks the event loop"""
+    try:
+        msg_record = await Message.objects.select_related('recipient').aget(pk=message_id)
+    except Message.DoesNotExist:
+        return
+    if msg_record.is_sent:
+        return
+
+    msg_record.is_sent, msg_record.error_message = await _asend(msg_record)
+    # one hop to a thread for both: a cache event broker blocks too
+    await sync_to_async(_record)(msg_record)
+
+
+def deliver_batch(message_ids):
+    """
+    Send a batch of queued messages (one broadcast chunk).
+
+    Emails share a single SMTP connection; WhatsApp messages are sent
+    concurrently, at most BROADCAST_WHATSAPP_CONCURRENCY at a time. Results
+    are written back with one bulk_update.
+    """
+    pending = list(
+        Message.objects.select_related('recipient').filter(pk__in=message_ids, is_sent=False)
+    )
+    emails = [m for m in pending if m.message_type == 'email']
+    whatsapps = [m for m in pending if m.message_type != 'email']
+
+    if emails:
+        attempted = []
+        try:
+            with get_connection() as connection:
+                for msg_record in emails:
+                    msg_record.is_sent, msg_record.error_message = _send(msg_record, connection)
+                    attempted.append(msg_record)
+        except Exception as e:
+            # Opening (or closing) the SMTP connection failed: the rest of
+            # the chunk still gets a result, so no row is left pending
+            logger.warning("SMTP connection failed for a broadcast chunk: %s", e)
+            for msg_record in emails[len(attempted):]:
+                msg_record.is_sent, msg_record.error_message = False, str(e)
+                metrics.MESSAGES.inc(message_type=msg_record.message_type, result='failed')
+
+    if whatsapps:
+        workers = getattr(settings, 'BROADCAST_WHATSAPP_CONCURRENCY', 8)
+        with ThreadPoolExecutor(max_workers=workers, thread_name_prefix='whatsapp-send') as pool:
+            for msg_record, result in zip(whatsapps, pool.map(_send, whatsapps)):
+                msg_record.is_sent, msg_record.error_message = result
+
+    Message.objects.bulk_update(pending, ['is_sent', 'error_message'])
+    bump_fragment_version('message')
+    publish_delivery(*pending)
+
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def _get_executor():
+    global _executor
+    if _executor is None:
+        with _executor_lock:
+            if _executor is None:
+                _executor = ThreadPoolExecutor(
+                    max_workers=getattr(settings, 'MESSAGE_QUEUE_WORKERS', 4),
+                    thread_name_prefix='message-queue',
+                )
+    return _executor
+
+
+def _run_in_thread(func, *args):
+    try:
+        func(*args)
+    except Exception:
+        logger.exception("Message delivery job %s%r failed", func.__name__, args)
+    finally:
+        # Worker threads are long-lived; don't leave their connections open
+        connections.close_all()
+
+
+# Running asyncio deliveries; the event loop only keeps weak references to tasks
+_tasks = set()
+
+
+async def _run_task(job, *args):
+    try:
+        await job(*args)
+    except Exception:
+        logger.exception("Message delivery job %s%r failed", job.__name__, args)
+    finally:
+        await sync_to_async(close_old_connections)()
+
+
+def _spawn(job, *args):
+    """Run the coroutine function ``job`` as a task on the running event loop"""
+    # In a fresh context, so the task doesn't run its queries on (and outlive)
+    # the sync thread of the request that queued it
+    task = asyncio.get_running_loop().create_task(_run_task(job, *args), context=contextvars.Context())
+    _tasks.add(task)
+    task.add_done_callback(_tasks.discard)
+
+
+def _submit(job, *args):
+    """Run ``job`` (deliver_message or deliver_batch) on the configured backend"""
+    backend = getattr(settings, 'MESSAGE_QUEUE_BACKEND', 'thread')
+    if backend == 'celery':
+        from employee_management.celery import app  # noqa: F401  (configures the broker)
+        from . import task
+        getattr(task, f'{job.__name__}_task').delay(*args)
+    elif backend == 'sync':
+        job(*args)
+    else:
+        _get_executor().submit(_run_in_thread, job, *args)
+
+
+def enqueue_message(msg_record):
+    """Queue a saved Message for delivery once the current transaction commits"""
+    message_id = msg_record.pk
+    transaction.on_commit(lambda: _submit(deliver_message, message_id))
+
+
+async def aenqueue_message(msg_record):
+    """
+    Queue a saved Message for delivery from an async view. Async views run in
+    autocommit mode, so the row is already committed.
+    """
+    backend = getattr(settings, 'MESSAGE_QUEUE_BACKEND', 'thread')
+    if backend == 'asyncio' and on_server_loop():
+        _spawn(adeliver_message, msg_record.pk)
+    elif backend == 'sync':
+        await adeliver_message(msg_record.pk)
+    else:
+        await sync_to_async(_submit)(deliver_message, msg_record.pk)
+
+
+def enqueue_broadcast(message_ids):
+    """Queue saved Messages for delivery in BROADCAST_BATCH_SIZE chunks"""
+    batch_size = getattr(settings, 'BROADCAST_BATCH_SIZE', 100)
+    for start in range(0, len(message_ids), batch_size):
+        batch = list(message_ids[start:start + batch_size])
+        transaction.on_commit(lambda batch=batch: _submit(deliver_batch, batch))
@@ -0,0 +1,304 @@
+"""
+In-process metrics in the Prometheus text exposition format.
+
+Counters, gauges and histograms live in plain dicts guarded by one lock, so
+recording a value is a dict update. With several worker processes (e.g.
+gunicorn), set METRICS_MULTIPROCESS_DIR: each process then writes a
+snapshot of its values to its own file in that directory (at most every
+METRICS_FLUSH_INTERVAL seconds, and on exit), and ``/metrics`` adds up the
+files from every worker. A worker that has exited keeps counting towards the
+counters and histograms, but not the gauges: gunicorn.conf.py gives each
+start a fresh directory and calls mark_process_dead() when a worker exits.
+"""
+import atexit
+import json
+import math
+import os
+import tempfile
+import threading
+import time
+
+from django.conf import settings
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+_lock = threading.Lock()
+_registry = {}
+
+
+class Metric:
+    kind = None
+
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.values = {}
+        _registry[name] = self
+
+    def _key(self, labels):
+        return tuple(str(labels[name]) for name in self.labelnames)
+
+    def reset(self):
+        self.values = {}
+
+
+class Counter(Metric):
+    kind = 'counter'
+
+    def inc(self, amount=1, **labels):
+        key = self._key(labels)
+        with _lock:
+            self.values[key] = self.values.get(key, 0) + amount
+        _maybe_flush()
+
+    @staticmethod
+    def merge(total, value):
+        return (total or 0) + value
+
+    def samples(self, values):
+        for key, value in sorted(values.items()):
+            yield self.name + '_total', dict(zip(self.labelnames, key)), value
+
+
+class Gauge(Metric):
+    kind = 'gauge'
+
+    def inc(self, amount=1, **labels):
+        key = self._key(labels)
+        with _lock:
+            self.values[key] = self.values.get(key, 0) + amount
+        _maybe_flush()
+
+    def dec(self, amount=1, **labels):
+        self.inc(-amount, **labels)
+
+    @staticmethod
+    def merge(total, value):
+        # summed over the live workers (mark_process_dead): e.g. open connections in all of them
+        return (total or 0) + value
+
+    def samples(self, values):
+        for key, value in sorted(values.items()):
+            yield self.name, dict(zip(self.labelnames, key)), value
+
+
+class Histogram(Metric):
+    kind = 'histogram'
+
+    def __init__(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(buckets)
+
+    def observe(self, value, **labels):
+        key = self._key(labels)
+        with _lock:
+            series = self.values.get(key)
+            if series is None:
+                # per-bucket (not cumulative) counts, then the sum
+                series = self.values[key] = [0] * (len(self.buckets) + 1) + [0.0]
+            for index, bound in enumerate(self.buckets):
+                if value <= bound:
+                    break
+            else:
+                index = len(self.buckets)
+            series[index] += 1
+            series[-1] += value
+        _maybe_flush()
+
+    @staticmethod
+    def merge(total, value):
+        if total is None:
+            return list(value)
+        return [a + b for a, b in zip(total, value)]
+
+    def samples(self, values):
+        for key, series in sorted(values.items()):
+            labels = dict(zip(self.labelnames, key))
+            cumulative = 0
+            for bound, count in zip(self.buckets + (math.inf,), series):
+                cumulative += count
+                le = '+Inf' if bound == math.inf else repr(bound)
+                yield self.name + '_bucket', {**labels, 'le': le}, cumulative
+            yield self.name + '_sum', labels, series[-1]
+            yield self.name + '_count', labels, cumulative
+
+
+REQUEST_LATENCY = Histogram(
+    'http_request_duration_seconds', 'Time spent handling a request, by URL name', ['view', 'method', 'status']
+)
+DB_QUERIES = Counter('db_queries', 'Database queries run while handling requests', ['view'])
+DB_TIME = Counter('db_query_seconds', 'Time spent in database queries while handling requests', ['view'])
+CACHE_LOOKUPS = Counter('cache_lookups', 'Application cache lookups', ['cache', 'result'])
+MESSAGES = Counter('messages', 'Outbound messages by type and delivery result', ['message_type', 'result'])
+PROVIDER_LATENCY = Histogram(
+    'message_provider_duration_seconds', 'Time the SMTP / Twilio call took for one message', ['provider']
+)
+
+EVENT_STREAMS = Gauge('message_event_streams', 'Open delivery status event streams')
+
+
+def cache_lookup(name, hit):
+    CACHE_LOOKUPS.inc(cache=name, result='hit' if hit else 'miss')
+
+
+# Multiprocess mode
+
+_last_flush = time.monotonic()
+_process_token = None
+_flush_lock = threading.Lock()
+
+
+def _multiprocess_dir():
+    return getattr(settings, 'METRICS_MULTIPROCESS_DIR', None)
+
+
+def _snapshot():
+    with _lock:
+        return {
+            name: [[list(key), value] for key, value in metric.values.items()]
+            for name, metric in _registry.items()
+        }
+
+
+def flush(blocking=True):
+    """Write this process's values to its file in METRICS_MULTIPROCESS_DIR"""
+    global _last_flush, _process_token
+    directory = _multiprocess_dir()
+    if not directory or not _flush_lock.acquire(blocking):
+        return
+    try:
+        _last_flush = time.monotonic()
+        if _process_token is None:
+            # pid alone could be reused by a later worker and overwrite this file
+            _process_token = f'{os.getpid()}-{time.time_ns()}'
+        os.makedirs(directory, exist_ok=True)
+        _write(directory, f'metrics-{_process_token}.json', _snapshot())
+    finally:
+        _flush_lock.release()
+
+
+def _write(directory, filename, snapshot):
+    fd, tmp_path = tempfile.mkstemp(dir=directory, suffix='.tmp')
+    with os.fdopen(fd, 'w') as f:
+        json.dump(snapshot, f)
+    os.replace(tmp_path, os.path.join(directory, filename))
+
+
+def _maybe_flush():
+    if time.monotonic() - _last_flush >= getattr(settings, 'METRICS_FLUSH_INTERVAL', 5) and _multiprocess_dir():
+        flush(blocking=False)  # another thread is already writing
+
+
+def _collect():
+    """Values per metric, summed over every worker's file (or just this process)"""
+    directory = _multiprocess_dir()
+    if not directory:
+        with _lock:
+            return {name: dict(metric.values) for name, metric in _registry.items()}
+
+    flush()
+    totals = {name: {} for name in _registry}
+    for filename in os.listdir(directory):
+        if not (filename.startswith('metrics-') and filename.endswith('.json')):
+            continue
+        try:
+            with open(os.path.join(directory, filename)) as f:
+                snapshot = json.load(f)
+        except (OSError, ValueError):
+            continue  # being replaced right now
+        for name, entries in snapshot.items():
+            metric = _registry.get(name)
+            if metric is None:
+                continue
+            for key, value in entries:
+                key = tuple(key)
+                totals[name][key] = metric.merge(totals[name].get(key), value)
+    return totals
+
+
+def mark_process_dead(pid, directory=None):
+    """
+    Drop the gauges of worker ``pid``, which has exited: they described
+    connections and streams it no longer has. Its counters and histograms stay,
+    so the totals don't go backwards.
+    """
+    directory = directory or _multiprocess_dir()
+    if not directory or not os.path.isdir(directory):
+        return
+    for filename in os.listdir(directory):
+        if not (filename.startswith(f'metrics-{pid}-') and filename.endswith('.json')):
+            continue
+        try:
+            with open(os.path.join(directory, filename)) as f:
+                snapshot = json.load(f)
+        except (OSError, ValueError):
+            continue
+        _write(directory, filename, {
+            name: entries for name, entries in snapshot.items()
+            if not isinstance(_registry.get(name), Gauge)
+        })
+
+
+def clear_multiprocess_dir(directory=None):
+    """Remove the files of an earlier run (gunicorn's on_starting)"""
+    directory = directory or _multiprocess_dir()
+    if not directory or not os.path.isdir(directory):
+        return
+    for filename in os.listdir(directory):
+        if filename.startswith('metrics-') and filename.endswith('.json') or filename.endswith('.tmp'):
+            try:
+                os.remove(os.path.join(directory, filename))
+            except FileNotFoundError:
+                pass
+
+
+def _format_labels(labels):
+    if not labels:
+        return ''
+    escaped = (
+        '{}="{}"'.format(name, str(value).replace('\\', r'\\').replace('\n', r'\n').replace('"', r'\"'))
+        for name, value in labels.items()
+    )
+    return '{' + ','.join(escaped) + '}'
+
+
+def _format_value(value):
+    if isinstance(value, float):
+        return repr(value)
+    return str(value)
+
+
+def render():
+    """All metrics in the Prometheus text format"""
+    values = _collect()
+    lines = []
+    for name, metric in _registry.items():
+        exposed_name = name + '_total' if metric.kind == 'counter' else name
+        lines.append(f'# HELP {exposed_name} {metric.documentation}')
+        lines.append(f'# TYPE {exposed_name} {metric.kind}')
+        for sample_name, labels, value in metric.samples(values.get(name, {})):
+            lines.append(f'{sample_name}{_format_labels(labels)} {_format_value(value)}')
+    return '\n'.join(lines) + '\n'
+
+
+def reset():
+    """Forget every recorded value (tests, and forked children)"""
+    global _process_token
+    with _lock:
+        for metric in _registry.values():
+            metric.reset()
+    _process_token = None
+
+
+def _after_fork():
+    global _lock, _flush_lock
+    # another thread may have held them mid-fork
+    _lock = threading.Lock()
+    _flush_lock = threading.Lock()
+    reset()
+
+
+# A forked worker starts from zero instead of re-reporting its parent's values
+os.register_at_fork(after_in_child=_after_fork)
+atexit.register(lambda: _multiprocess_dir() and flush())
@@ -1,17 +1,111 @@
 # middleware.py - Create this file in your app directory
+import contextvars
+import logging
+import re
+import time
+from collections import Counter
+from contextlib import contextmanager
+from functools import wraps
+from importlib import import_module
 
-class NoCacheMiddleware:
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
+from django.conf import settings
+from django.contrib.auth import SESSION_KEY
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connections
+from django.db.backends.signals import connection_created
+from django.http import JsonResponse
+from django.urls import reverse
+
+from . import metrics
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.http import quote_etag
+from whitenoise.middleware import WhiteNoiseMiddleware as BaseWhiteNoiseMiddleware
+
+
+class SyncAndAsyncMiddleware:
     """
-    Middleware to prevent caching of authenticated user pages
+    Base for middleware that runs in either mode. Under ASGI a single
+    sync-only middleware makes Django run everything above it, and the
+    async views below it, with a thread held for the whole request.
+    Subclasses check ``iscoroutinefunction(self)`` in ``__call__`` and hand
+    over to their ``__acall__``.
     """
+    sync_capable = True
+    async_capable = True
+
     def __init__(self, get_response):
         self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+
+class WhiteNoiseMiddleware(SyncAndAsyncMiddleware, BaseWhiteNoiseMiddleware):
+    """WhiteNoise's static file middleware, which is sync-only, made async-capable"""
+    def __init__(self, get_response):
+        BaseWhiteNoiseMiddleware.__init__(self, get_response)
+        SyncAndAsyncMiddleware.__init__(self, get_response)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        return super().__call__(request)
+
+    async def __acall__(self, request):
+        if self.autorefresh:
+            static_file = await sync_to_async(self.find_file, thread_sensitive=False)(request.path_info)
+        else:
+            static_file = self.files.get(request.path_info)
+        if static_file is not None:
+            # opens (and stats) the file
+            response = await sync_to_async(self.serve, thread_sensitive=False)(static_file, request)
+            # Django would read a sync file iterator to the end before sending
+            response.streaming_content = _read_blocks(iter(response.streaming_content))
+            return response
+        return await self.get_response(request)
 
+
+async def _read_blocks(blocks):
+    """The sync iterator ``blocks`` as an async one, each read in a worker thread"""
+    read = sync_to_async(next, thread_sensitive=False)
+    while (block := await read(blocks, None)) is not None:
+        yield block
+
+
+def allow_private_cache(view_func):
+    """
+    Let a view keep its own (private) Cache-Control instead of the blanket
+    no-store below, e.g. so ETag revalidation works for JSON endpoints.
+    """
+    @wraps(view_func)
+    def wrapped_view(*args, **kwargs):
+        response = view_func(*args, **kwargs)
+        response.allow_private_cache = True
+        return response
+    return wrapped_view
+
+
+class NoCacheMiddleware(SyncAndAsyncMiddleware):
+    """
+    Middleware to prevent caching of authenticated user pages
+    """
     def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
         response = self.get_response(request)
+        return self.add_headers(request, request.user, response)
+
+    async def __acall__(self, request):
+        response = await self.get_response(request)
+        # request.user would query the database on the event loop
+        return self.add_headers(request, await request.auser(), response)
+
+    def add_headers(self, request, user, response):
+        if getattr(response, 'allow_private_cache', False):
+            return response
         
         # Only add no-cache headers for authenticated users and non-static files
-        if (request.user.is_authenticated and 
+        if (user.is_authenticated and 
             not request.path.startswith('/static/') and 
             not request.path.startswith('/media/')):
             
@@ -19,4 +113,269 @@ class NoCacheMiddleware:
             response['Pragma'] = 'no-cache'
             response['Expires'] = '0'
             
-        return response
\ No newline at end of file
+        return response
+
+
+class SessionHeartbeatMiddleware(SyncAndAsyncMiddleware):
+    """
+    Answer the check_session heartbeat before the rest of the stack runs.
+
+    Browsers poll check_session constantly, so it skips CSRF, messages, the
+    auth user lookup and NoCacheMiddleware: it loads the session (a cache
+    hit with a cache-backed session engine) and reports whether a user is
+    logged into it. Pages themselves still do the full authentication check.
+
+    The client asks for a polling interval with ``?interval=<seconds>`` and
+    gets back the one it should use; the ETag lets repeated polls end in a
+    bodyless 304.
+    """
+    def __init__(self, get_response):
+        super().__init__(get_response)
+        self.session_engine = import_module(settings.SESSION_ENGINE)
+        self.heartbeat_path = None
+
+    def is_heartbeat(self, request):
+        if self.heartbeat_path is None:
+            self.heartbeat_path = reverse('check_session')
+        return request.path_info == self.heartbeat_path and request.method in ('GET', 'HEAD')
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        if not self.is_heartbeat(request):
+            return self.get_response(request)
+        session = self.session(request)
+        return self.heartbeat(request, session is not None and SESSION_KEY in session)
+
+    async def __acall__(self, request):
+        if not self.is_heartbeat(request):
+            return await self.get_response(request)
+        session = self.session(request)
+        return self.heartbeat(request, session is not None and await session.ahas_key(SESSION_KEY))
+
+    def session(self, request):
+        session_key = request.COOKIES.get(settings.SESSION_COOKIE_NAME)
+        return self.session_engine.SessionStore(session_key) if session_key else None
+
+    def poll_interval(self, request):
+        low = getattr(settings, 'HEARTBEAT_MIN_INTERVAL', 15)
+        high = getattr(settings, 'HEARTBEAT_MAX_INTERVAL', 300)
+        try:
+            requested = int(request.GET.get('interval', ''))
+        except ValueError:
+            requested = getattr(settings, 'HEARTBEAT_DEFAULT_INTERVAL', 60)
+        return min(max(requested, low), high)
+
+    def heartbeat(self, request, authenticated):
+        request.metrics_view = 'check_session'
+        interval = self.poll_interval(request)
+
+        etag = quote_etag(f'{int(authenticated)}-{interval}')
+        response = get_conditional_response(request, etag=etag)
+        if response is None:
+            response = JsonResponse({'authenticated': authenticated, 'poll_interval': interval})
+        response['ETag'] = etag
+        patch_cache_control(response, private=True, no_cache=True)
+        return response
+
+
+logger = logging.getLogger('employees.queries')
+
+_IN_LIST = re.compile(r'IN \((?:%s, )*%s\)')
+_WHITESPACE = re.compile(r'\s+')
+
+
+def query_fingerprint(sql):
+    """SQL with its parameters left out, so the same query run in a loop matches"""
+    return _IN_LIST.sub('IN (...)', _WHITESPACE.sub(' ', sql).strip())
+
+
+def query_budget(limit):
+    """Cap the queries one view may run (checked by QueryInstrumentationMiddleware)"""
+    def decorator(view_func):
+        view_func.query_budget = limit
+        return view_func
+    return decorator
+
+
+class QueryBudgetExceeded(Exception):
+    pass
+
+
+# The QueryStats counting the current request's queries. A context variable
+# follows the request onto the sync thread its async ORM calls (or a sync
+# view under ASGI) run on, so no per-request hop to that thread is needed.
+_active_stats = contextvars.ContextVar('employees_query_stats', default=())
+
+
+def _record_query(execute, sql, params, many, context):
+    """execute_wrapper left on every connection; feeds the active QueryStats"""
+    active = _active_stats.get()
+    if not active:
+        return execute(sql, params, many, context)
+    start = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        duration = time.perf_counter() - start
+        for stats in active:
+            stats.add(sql, duration)
+
+
+def _install_query_wrapper(sender=None, connection=None, **kwargs):
+    # first, so the push / pop of connection.execute_wrapper() never removes it
+    if _record_query not in connection.execute_wrappers:
+        connection.execute_wrappers.insert(0, _record_query)
+
+
+def install_query_wrappers():
+    """Put _record_query on this thread's connections and on every one opened later"""
+    connection_created.connect(_install_query_wrapper, dispatch_uid='employees_query_stats')
+    for connection in connections.all():
+        _install_query_wrapper(connection=connection)
+
+
+class QueryStats:
+    """Counts and times the queries run while it is active (and fingerprints them if asked)"""
+    def __init__(self, fingerprints=True):
+        self.count = 0
+        self.duration = 0.0
+        self.fingerprints = Counter() if fingerprints else None
+
+    def add(self, sql, duration):
+        self.duration += duration
+        self.count += 1
+        if self.fingerprints is not None:
+            self.fingerprints[query_fingerprint(sql)] += 1
+
+    @contextmanager
+    def active(self):
+        """Count the queries of this context (and the sync calls made from it)"""
+        token = _active_stats.set(_active_stats.get() + (self,))
+        try:
+            yield self
+        finally:
+            _active_stats.reset(token)
+
+    def repeated(self, threshold):
+        return [(sql, count) for sql, count in self.fingerprints.most_common() if count >= threshold]
+
+
+class QueryInstrumentationMiddleware(SyncAndAsyncMiddleware):
+    """
+    Opt-in (QUERY_INSTRUMENTATION) per-request query accounting.
+
+    Counts the queries each request runs and the time spent in the
+    database, flags statements repeated QUERY_REPEAT_THRESHOLD or more
+    times (the N+1 signature), adds a ``Server-Timing`` header and logs one
+    record per request to the ``employees.queries`` logger. A request over
+    its budget (``@query_budget(n)`` on the view, else QUERY_BUDGET) is
+    logged as a warning, or raises QueryBudgetExceeded when
+    QUERY_BUDGET_RAISE is set, as in tests. Streamed bodies are produced
+    after the middleware returns, so their queries aren't counted.
+    """
+    def __init__(self, get_response):
+        if not getattr(settings, 'QUERY_INSTRUMENTATION', False):
+            raise MiddlewareNotUsed
+        super().__init__(get_response)
+        install_query_wrappers()
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        request._query_budget = getattr(view_func, 'query_budget', None)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        stats = QueryStats()
+        start = time.perf_counter()
+        with stats.active():
+            response = self.get_response(request)
+        return self.record(request, response, stats, time.perf_counter() - start)
+
+    async def __acall__(self, request):
+        stats = QueryStats()
+        start = time.perf_counter()
+        with stats.active():
+            response = await self.get_response(request)
+        return self.record(request, response, stats, time.perf_counter() - start)
+
+    def record(self, request, response, stats, duration):
+        repeated = stats.repeated(getattr(settings, 'QUERY_REPEAT_THRESHOLD', 3))
+        budget = getattr(request, '_query_budget', None)
+        if budget is None:
+            budget = getattr(settings, 'QUERY_BUDGET', None)
+        over_budget = budget is not None and stats.count > budget
+        view = request.resolver_match.view_name if request.resolver_match else None
+
+        response['Server-Timing'] = ', '.join(filter(None, [
+            response.get('Server-Timing'),
+            f'db;dur={stats.duration * 1000:.1f};desc="{stats.count} queries"',
+            f'app;dur={duration * 1000:.1f}',
+        ]))
+
+        record = {
+            'method': request.method,
+            'path': request.path,
+            'view': view,
+            'status': response.status_code,
+            'queries': stats.count,
+            'db_ms': round(stats.duration * 1000, 2),
+            'duration_ms': round(duration * 1000, 2),
+            'budget': budget,
+            'repeated': [{'sql': sql, 'count': count} for sql, count in repeated],
+        }
+        level = logging.WARNING if repeated or over_budget else logging.INFO
+        logger.log(
+            level, 'view=%s status=%s queries=%d db_ms=%.1f duration_ms=%.1f repeated=%d',
+            view, response.status_code, stats.count, record['db_ms'], record['duration_ms'], len(repeated),
+            extra={'query_stats': record},
+        )
+
+        if over_budget and getattr(settings, 'QUERY_BUDGET_RAISE', False):
+            raise QueryBudgetExceeded(
+                f'{view or request.path} ran {stats.count} queries (budget {budget})'
+                + ''.join(f'\n  {count}x {sql}' for sql, count in repeated)
+            )
+        return response
+
+
+class MetricsMiddleware(SyncAndAsyncMiddleware):
+    """
+    Feeds ``/metrics``: request latency per URL name, plus the number of
+    queries and time in the database (METRICS_ENABLED, on by default).
+    """
+    METHODS = {'GET', 'HEAD', 'POST', 'PUT', 'PATCH', 'DELETE', 'OPTIONS'}
+
+    def __init__(self, get_response):
+        if not getattr(settings, 'METRICS_ENABLED', True):
+            raise MiddlewareNotUsed
+        super().__init__(get_response)
+        install_query_wrappers()
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        stats = QueryStats(fingerprints=False)
+        start = time.perf_counter()
+        with stats.active():
+            response = self.get_response(request)
+        return self.record(request, response, stats, time.perf_counter() - start)
+
+    async def __acall__(self, request):
+        stats = QueryStats(fingerprints=False)
+        start = time.perf_counter()
+        with stats.active():
+            response = await self.get_response(request)
+        return self.record(request, response, stats, time.perf_counter() - start)
+
+    def record(self, request, response, stats, duration):
+        if request.resolver_match:
+            view = request.resolver_match.view_name
+        else:
+            view = getattr(request, 'metrics_view', 'unmatched')
+        method = request.method if request.method in self.METHODS else 'other'
+        metrics.REQUEST_LATENCY.observe(duration, view=view, method=method, status=response.status_code)
+        if stats.count:
+            metrics.DB_QUERIES.inc(stats.count, view=view)
+            metrics.DB_TIME.inc(stats.duration, view=view)
+        return response
@@ -0,0 +1,82 @@
+from django.db import migrations
+from django.db.utils import OperationalError
+
+FTS_FIELDS = 'first_name, last_name, employee_id, email, position, address'
+
+SQLITE_FORWARD = [
+    f"""CREATE VIRTUAL TABLE employees_employee_fts USING fts5(
+        {FTS_FIELDS}, content='employees_employee', content_rowid='id', tokenize='unicode61'
+    )""",
+    f"""CREATE TRIGGER employees_employee_fts_ai AFTER INSERT ON employees_employee BEGIN
+        INSERT INTO employees_employee_fts(rowid, {FTS_FIELDS})
+        VALUES (new.id, new.first_name, new.last_name, new.employee_id, new.email, new.position, new.address);
+    END""",
+    f"""CREATE TRIGGER employees_employee_fts_ad AFTER DELETE ON employees_employee BEGIN
+        INSERT INTO employees_employee_fts(employees_employee_fts, rowid, {FTS_FIELDS})
+        VALUES ('delete', old.id, old.first_name, old.last_name, old.employee_id, old.email, old.position, old.address);
+    END""",
+    f"""CREATE TRIGGER employees_employee_fts_au AFTER UPDATE ON employees_employee BEGIN
+        INSERT INTO employees_employee_fts(employees_employee_fts, rowid, {FTS_FIELDS})
+        VALUES ('delete', old.id, old.first_name, old.last_name, old.employee_id, old.email, old.position, old.address);
+        INSERT INTO employees_employee_fts(rowid, {FTS_FIELDS})
+        VALUES (new.id, new.first_name, new.last_name, new.employee_id, new.email, new.position, new.address);
+    END""",
+    "INSERT INTO employees_employee_fts(employees_employee_fts) VALUES ('rebuild')",
+]
+
+SQLITE_BACKWARD = [
+    "DROP TRIGGER IF EXISTS employees_employee_fts_ai",
+    "DROP TRIGGER IF EXISTS employees_employee_fts_ad",
+    "DROP TRIGGER IF EXISTS employees_employee_fts_au",
+    "DROP TABLE IF EXISTS employees_employee_fts",
+]
+
+POSTGRES_FORWARD = [
+    """CREATE INDEX IF NOT EXISTS employees_employee_search_idx ON employees_employee USING GIN (
+        to_tsvector('simple', coalesce(first_name, '') || ' ' || coalesce(last_name, '') || ' ' ||
+        coalesce(employee_id, '') || ' ' || coalesce(email, '') || ' ' ||
+        coalesce(position, '') || ' ' || coalesce(address, ''))
+    )""",
+]
+
+POSTGRES_BACKWARD = [
+    "DROP INDEX IF EXISTS employees_employee_search_idx",
+]
+
+
+def create_search_index(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    if vendor == 'sqlite':
+        try:
+            schema_editor.execute(SQLITE_FORWARD[0])
+        except OperationalError:
+            # SQLite built without FTS5; search falls back to the in-memory index
+            return
+        for statement in SQLITE_FORWARD[1:]:
+            schema_editor.execute(statement)
+    elif vendor == 'postgresql':
+        for statement in POSTGRES_FORWARD:
+            schema_editor.execute(statement)
+
+
+def drop_search_index(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    if vendor == 'sqlite':
+        statements = SQLITE_BACKWARD
+    elif vendor == 'postgresql':
+        statements = POSTGRES_BACKWARD
+    else:
+        statements = []
+    for statement in statements:
+        schema_editor.execute(statement)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('employees', '0002_alter_message_options_alter_message_message_type_and_more'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_search_index, drop_search_index),
+    ]
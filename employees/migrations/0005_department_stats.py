@@ -0,0 +1,55 @@
+# Generated by Django 5.2.18 on 2026-10-18 17:55
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import Count, Max, Q, Sum
+
+
+def populate_department_stats(apps, schema_editor):
+    Department = apps.get_model('employees', 'Department')
+    DepartmentStats = apps.get_model('employees', 'DepartmentStats')
+    Employee = apps.get_model('employees', 'Employee')
+    actual = {
+        row['department_id']: row
+        for row in Employee.objects.values('department_id').annotate(
+            headcount=Count('id'),
+            active_headcount=Count('id', filter=Q(status='active')),
+            total_salary=Sum('salary'),
+            last_hire_date=Max('hire_date'),
+        ).order_by()
+    }
+    DepartmentStats.objects.bulk_create(
+        DepartmentStats(
+            department_id=department_id,
+            headcount=actual.get(department_id, {}).get('headcount', 0),
+            active_headcount=actual.get(department_id, {}).get('active_headcount', 0),
+            total_salary=actual.get(department_id, {}).get('total_salary') or 0,
+            last_hire_date=actual.get(department_id, {}).get('last_hire_date'),
+        )
+        for department_id in Department.objects.values_list('pk', flat=True)
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('employees', '0004_query_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DepartmentStats',
+            fields=[
+                ('department', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='stats', serialize=False, to='employees.department')),
+                ('headcount', models.PositiveIntegerField(default=0)),
+                ('active_headcount', models.PositiveIntegerField(default=0)),
+                ('total_salary', models.DecimalField(decimal_places=2, default=0, max_digits=16)),
+                ('last_hire_date', models.DateField(blank=True, null=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'verbose_name_plural': 'department stats',
+            },
+        ),
+        migrations.RunPython(populate_department_stats, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,64 @@
+# Generated by Django 5.2.18 on 2026-10-18 18:03
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.db import migrations, models
+
+
+def log_current_statuses(apps, schema_editor):
+    # A baseline entry per existing employee, dated when they were added
+    Employee = apps.get_model('employees', 'Employee')
+    EmployeeStatusChange = apps.get_model('employees', 'EmployeeStatusChange')
+    EmployeeStatusChange.objects.bulk_create(
+        (
+            EmployeeStatusChange(
+                employee_id=pk, department_id=department_id, new_status=status, changed_at=created_at
+            )
+            for pk, department_id, status, created_at in Employee.objects.values_list(
+                'pk', 'department_id', 'status', 'created_at'
+            ).iterator()
+        ),
+        batch_size=1000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('employees', '0005_department_stats'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='EmployeeStatusChange',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('old_status', models.CharField(blank=True, choices=[('active', 'Active'), ('inactive', 'Inactive'), ('terminated', 'Terminated')], max_length=20)),
+                ('new_status', models.CharField(blank=True, choices=[('active', 'Active'), ('inactive', 'Inactive'), ('terminated', 'Terminated')], max_length=20)),
+                ('changed_at', models.DateTimeField(default=django.utils.timezone.now)),
+                ('department', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='employees.department')),
+                ('employee', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='status_changes', to='employees.employee')),
+            ],
+            options={
+                'ordering': ['-changed_at'],
+                'indexes': [models.Index(fields=['employee', 'changed_at'], name='status_change_employee_idx'), models.Index(fields=['changed_at'], name='status_change_date_idx')],
+            },
+        ),
+        migrations.CreateModel(
+            name='HeadcountSnapshot',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField()),
+                ('status', models.CharField(choices=[('active', 'Active'), ('inactive', 'Inactive'), ('terminated', 'Terminated')], max_length=20)),
+                ('headcount', models.PositiveIntegerField(default=0)),
+                ('total_salary', models.DecimalField(decimal_places=2, default=0, max_digits=16)),
+                ('department', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='headcount_snapshots', to='employees.department')),
+            ],
+            options={
+                'ordering': ['date'],
+                'indexes': [models.Index(fields=['status', 'date'], name='headcount_snapshot_status_idx')],
+                'constraints': [models.UniqueConstraint(fields=('department', 'status', 'date'), name='headcount_snapshot_unique')],
+            },
+        ),
+        migrations.RunPython(log_current_statuses, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,19 @@
+# Generated by Django 5.2.18 on 2026-10-18 18:53
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('employees', '0006_headcount_history'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='headcountsnapshot',
+            name='department',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='headcount_snapshots', to='employees.department'),
+        ),
+    ]
@@ -2,6 +2,7 @@ from django.db import models
 from django.urls import reverse
 from django.core.validators import RegexValidator
 from django.contrib.auth.models import User
+from django.utils import timezone
 from employees.models import User
 
 # Create your models here.
@@ -64,6 +65,97 @@ class Employee(models.Model):
     
     class Meta:
         ordering = ['first_name', 'last_name']
+        indexes = [
+            # employee_list keyset pagination (with and without a status filter)
+            models.Index(fields=['first_name', 'last_name', 'id'], name='employee_name_order_idx'),
+            models.Index(fields=['status', 'first_name', 'last_name'], name='employee_status_name_idx'),
+            models.Index(fields=['department', 'first_name', 'last_name'], name='employee_dept_name_idx'),
+            # dashboard "recent employees"
+            models.Index(fields=['status', '-created_at'], name='employee_status_created_idx'),
+        ]
+
+
+class DepartmentStats(models.Model):
+    """
+    Per-department counters, so pages that show headcounts read one row per
+    department instead of counting the Employee table. Kept current inside
+    each Employee write's transaction (see employees.signals) and rebuilt
+    with ``manage.py rebuild_department_stats``.
+    """
+    department = models.OneToOneField(
+        Department, on_delete=models.CASCADE, primary_key=True, related_name='stats'
+    )
+    headcount = models.PositiveIntegerField(default=0)
+    active_headcount = models.PositiveIntegerField(default=0)
+    total_salary = models.DecimalField(max_digits=16, decimal_places=2, default=0)
+    last_hire_date = models.DateField(blank=True, null=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        verbose_name_plural = 'department stats'
+
+    def __str__(self):
+        return f"{self.department_id}: {self.headcount} employees"
+
+    @property
+    def avg_salary(self):
+        return self.total_salary / self.headcount if self.headcount else 0
+
+
+class EmployeeStatusChange(models.Model):
+    """
+    One row per hire, status change or removal, since Employee only holds
+    the current status. old_status is blank for a new employee and
+    new_status is blank for a deleted one.
+    """
+    employee = models.ForeignKey(
+        Employee, on_delete=models.SET_NULL, null=True, blank=True, related_name='status_changes'
+    )
+    department = models.ForeignKey(Department, on_delete=models.SET_NULL, null=True, blank=True, related_name='+')
+    old_status = models.CharField(max_length=20, choices=Employee.STATUS_CHOICES, blank=True)
+    new_status = models.CharField(max_length=20, choices=Employee.STATUS_CHOICES, blank=True)
+    changed_at = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        ordering = ['-changed_at']
+        indexes = [
+            models.Index(fields=['employee', 'changed_at'], name='status_change_employee_idx'),
+            models.Index(fields=['changed_at'], name='status_change_date_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.employee_id}: {self.old_status or '-'} -> {self.new_status or '-'}"
+
+
+class HeadcountSnapshot(models.Model):
+    """
+    Employees and payroll per department and status at the end of one day,
+    written by ``manage.py snapshot_headcount``. Every department / status
+    pair gets a row (zeros included), so a missing row means no snapshot.
+    Deleting a department keeps its rows (with no department), so the
+    company-wide totals of past days don't change.
+    """
+    date = models.DateField()
+    department = models.ForeignKey(
+        Department, on_delete=models.SET_NULL, null=True, blank=True, related_name='headcount_snapshots'
+    )
+    status = models.CharField(max_length=20, choices=Employee.STATUS_CHOICES)
+    headcount = models.PositiveIntegerField(default=0)
+    total_salary = models.DecimalField(max_digits=16, decimal_places=2, default=0)
+
+    class Meta:
+        ordering = ['date']
+        constraints = [
+            # also the index for one department's series over a date range
+            models.UniqueConstraint(fields=['department', 'status', 'date'], name='headcount_snapshot_unique'),
+        ]
+        indexes = [
+            # company-wide series over a date range
+            models.Index(fields=['status', 'date'], name='headcount_snapshot_status_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.date} {self.department_id} {self.status}: {self.headcount}"
 
 
 class Message(models.Model):
@@ -81,5 +173,23 @@ class Message(models.Model):
     error_message = models.TextField(blank=True, null=True)
     sent_at = models.DateTimeField(auto_now_add=True)
 
+    class Meta:
+        indexes = [
+            # messaging_dashboard recent messages
+            models.Index(fields=['sender', '-sent_at'], name='message_sender_sent_idx'),
+            # message_history keyset pagination
+            models.Index(fields=['sender', 'recipient', '-sent_at', '-id'], name='message_history_idx'),
+        ]
+
     def __str__(self):
-        return f"{self.message_type} to {self.recipient} ({'Sent' if self.is_sent else 'Failed'})"
+        return f"{self.message_type} to {self.recipient} ({self.get_delivery_status_display()})"
+
+    @property
+    def delivery_status(self):
+        """'sent', 'failed', or 'pending' while the queue hasn't got to it yet"""
+        if self.is_sent:
+            return 'sent'
+        return 'failed' if self.error_message else 'pending'
+
+    def get_delivery_status_display(self):
+        return self.delivery_status.title()
@@ -0,0 +1,187 @@
+"""
+Keyset (cursor) pagination.
+
+Instead of ``OFFSET n`` and a ``COUNT(*)`` per request, each page is fetched
+with a ``WHERE (ordering columns) > (last row seen)`` filter, so deep pages
+cost the same as the first one. Pages are addressed by opaque, signed
+next/previous tokens rather than page numbers.
+"""
+import hashlib
+
+from asgiref.sync import sync_to_async
+from django.core import signing
+from django.core.cache import cache
+from django.core.exceptions import EmptyResultSet, ValidationError
+from django.db import connection
+from django.db.models import Q
+
+CURSOR_SALT = 'employees.pagination'
+
+
+class KeysetPage:
+    def __init__(self, object_list, next_cursor, previous_cursor, count=None):
+        self.object_list = object_list
+        self.next_cursor = next_cursor
+        self.previous_cursor = previous_cursor
+        self.count = count
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def __len__(self):
+        return len(self.object_list)
+
+    @property
+    def has_next(self):
+        return self.next_cursor is not None
+
+    @property
+    def has_previous(self):
+        return self.previous_cursor is not None
+
+    @property
+    def has_other_pages(self):
+        return self.has_next or self.has_previous
+
+
+class KeysetPaginator:
+    """
+    Paginate ``queryset`` by the fields in ``ordering`` (``'-field'`` for
+    descending). The last field must be unique, e.g. ``'id'``, so every row
+    has a distinct position.
+
+    ``count`` is ``None`` (no count at all), ``'approximate'`` (a planner
+    estimate or a short-lived cached count) or ``'exact'``.
+    """
+
+    def __init__(self, queryset, ordering, per_page=25, count=None, count_timeout=60):
+        self.queryset = queryset.order_by(*ordering)
+        self.ordering = [(field.lstrip('-'), field.startswith('-')) for field in ordering]
+        self.per_page = per_page
+        self.count_mode = count
+        self.count_timeout = count_timeout
+        model = queryset.model
+        self._fields = {name: model._meta.get_field(name) for name, _ in self.ordering}
+
+    # Cursor tokens
+
+    def _encode(self, obj, direction):
+        values = []
+        for name, _ in self.ordering:
+            value = self._fields[name].value_from_object(obj)
+            values.append(value.isoformat() if hasattr(value, 'isoformat') else value)
+        return signing.dumps({'d': direction, 'v': values}, salt=CURSOR_SALT, compress=True)
+
+    def _decode(self, cursor):
+        try:
+            payload = signing.loads(cursor, salt=CURSOR_SALT)
+            direction, raw_values = payload['d'], payload['v']
+            if direction not in ('next', 'prev') or len(raw_values) != len(self.ordering):
+                return None
+            values = [
+                self._fields[name].to_python(value)
+                for (name, _), value in zip(self.ordering, raw_values)
+            ]
+        except (signing.BadSignature, ValidationError, KeyError, TypeError, ValueError):
+            return None
+        return direction, values
+
+    # Querying
+
+    def keyset_filter(self, values, reverse=False):
+        """Q for rows strictly after ``values`` in ordering (before, if reverse)"""
+        condition = Q()
+        for position, (name, descending) in enumerate(self.ordering):
+            lookup = 'lt' if descending != reverse else 'gt'
+            term = Q(**{f'{name}__{lookup}': values[position]})
+            for earlier, (earlier_name, _) in enumerate(self.ordering[:position]):
+                term &= Q(**{earlier_name: values[earlier]})
+            condition |= term
+        # Redundant bound on the leading column so the planner can turn the OR
+        # chain into a range scan on the ordering index
+        name, descending = self.ordering[0]
+        lookup = 'lte' if descending != reverse else 'gte'
+        return Q(**{f'{name}__{lookup}': values[0]}) & condition
+
+    def _reversed_ordering(self):
+        return [name if descending else f'-{name}' for name, descending in self.ordering]
+
+    def _page_queryset(self, cursor):
+        """(queryset for the page plus one row, direction, whether a cursor was given)"""
+        decoded = self._decode(cursor) if cursor else None
+        queryset = self.queryset
+        direction = 'next'
+        if decoded is not None:
+            direction, values = decoded
+            if direction == 'next':
+                queryset = queryset.filter(self.keyset_filter(values, reverse=False))
+            else:
+                queryset = queryset.filter(self.keyset_filter(values, reverse=True)).order_by(
+                    *self._reversed_ordering()
+                )
+        return queryset[:self.per_page + 1], direction, decoded is not None
+
+    def _page(self, rows, direction, has_cursor, count):
+        has_more = len(rows) > self.per_page
+        rows = rows[:self.per_page]
+        if direction == 'prev':
+            rows.reverse()
+
+        next_cursor = previous_cursor = None
+        if rows:
+            if direction == 'next':
+                if has_more:
+                    next_cursor = self._encode(rows[-1], 'next')
+                if has_cursor:
+                    previous_cursor = self._encode(rows[0], 'prev')
+            else:
+                next_cursor = self._encode(rows[-1], 'next')
+                if has_more:
+                    previous_cursor = self._encode(rows[0], 'prev')
+
+        return KeysetPage(rows, next_cursor, previous_cursor, count)
+
+    def get_page(self, cursor=None):
+        queryset, direction, has_cursor = self._page_queryset(cursor)
+        return self._page(list(queryset), direction, has_cursor, self.count())
+
+    async def aget_page(self, cursor=None):
+        queryset, direction, has_cursor = self._page_queryset(cursor)
+        rows = [row async for row in queryset]
+        return self._page(rows, direction, has_cursor, await self.acount())
+
+    # Counting
+
+    def count(self):
+        if self.count_mode == 'exact':
+            return self.queryset.count()
+        if self.count_mode == 'approximate':
+            return self._approximate_count()
+        return None
+
+    async def acount(self):
+        if self.count_mode == 'exact':
+            return await self.queryset.acount()
+        if self.count_mode == 'approximate':
+            return await sync_to_async(self._approximate_count)()
+        return None
+
+    def _approximate_count(self):
+        queryset = self.queryset.order_by()
+        if connection.vendor == 'postgresql' and not queryset.query.where:
+            # Unfiltered table: the planner's row estimate is free
+            with connection.cursor() as cursor:
+                cursor.execute(
+                    'SELECT reltuples::bigint FROM pg_class WHERE relname = %s',
+                    [queryset.model._meta.db_table]
+                )
+                row = cursor.fetchone()
+            if row and row[0] >= 0:
+                return row[0]
+        try:
+            sql, params = queryset.query.sql_with_params()
+        except EmptyResultSet:
+            # e.g. .none() or an empty id__in: nothing can match
+            return 0
+        digest = hashlib.md5(f'{sql}{params}'.encode(), usedforsecurity=False).hexdigest()
+        return cache.get_or_set(f'employees:approx_count:{digest}', queryset.count, self.count_timeout)
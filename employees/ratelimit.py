@@ -0,0 +1,130 @@
+"""
+Per-user message rate limiting (settings.MESSAGE_RATE_LIMIT per
+MESSAGE_RATE_LIMIT_WINDOW seconds).
+
+Uses a sliding-window counter: two fixed-window counters in the cache, with
+the previous window weighted by how much of it still overlaps the sliding
+window. Each check is a get_many plus an incr, however many messages the user
+has sent. If the shared cache is unavailable, counts fall back to a
+per-process in-memory cache.
+"""
+import logging
+import math
+import time
+from dataclasses import dataclass
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.cache import caches, InvalidCacheBackendError
+from django.core.cache.backends.locmem import LocMemCache
+
+logger = logging.getLogger(__name__)
+
+_local_cache = LocMemCache('employees-ratelimit', {'OPTIONS': {'MAX_ENTRIES': 10000}})
+
+
+@dataclass
+class RateLimitResult:
+    allowed: bool
+    used: int
+    limit: int
+    retry_after: int  # seconds until enough of the window has slid by
+
+    @property
+    def remaining(self):
+        return max(self.limit - self.used, 0)
+
+
+class SlidingWindowRateLimiter:
+    def __init__(self, scope, limit, window, cache_alias='default'):
+        self.scope = scope
+        self.limit = limit
+        self.window = window
+        self.cache_alias = cache_alias
+
+    def _cache(self):
+        try:
+            return caches[self.cache_alias]
+        except InvalidCacheBackendError:
+            return _local_cache
+
+    def _keys(self, identity, now):
+        current = int(now // self.window)
+        base = f'ratelimit:{self.scope}:{identity}'
+        return f'{base}:{current}', f'{base}:{current - 1}'
+
+    def _estimate(self, current_count, previous_count, now):
+        overlap = 1 - (now % self.window) / self.window
+        return previous_count * overlap + current_count
+
+    def _retry_after(self, current_count, previous_count, cost, now):
+        """Seconds until ``cost`` more messages would fit"""
+        elapsed = now % self.window
+        if previous_count:
+            # The previous window's weight drops linearly as the window slides
+            excess = previous_count * (1 - elapsed / self.window) + current_count + cost - self.limit
+            wait = excess * self.window / previous_count
+            if wait <= self.window - elapsed:
+                return max(math.ceil(wait), 1)
+        return max(math.ceil(self.window - elapsed), 1)
+
+    def _counts(self, cache, identity, now):
+        current_key, previous_key = self._keys(identity, now)
+        counts = cache.get_many([current_key, previous_key])
+        return counts.get(current_key, 0), counts.get(previous_key, 0)
+
+    def usage(self, identity, now=None):
+        """Current usage without consuming anything"""
+        now = time.time() if now is None else now
+        try:
+            current_count, previous_count = self._counts(self._cache(), identity, now)
+        except Exception:
+            logger.warning("Rate limit cache unavailable; using in-process counts", exc_info=True)
+            current_count, previous_count = self._counts(_local_cache, identity, now)
+        used = math.ceil(self._estimate(current_count, previous_count, now))
+        retry_after = self._retry_after(current_count, previous_count, 1, now) if used >= self.limit else 0
+        return RateLimitResult(used < self.limit, used, self.limit, retry_after)
+
+    def hit(self, identity, cost=1, now=None):
+        """Consume ``cost`` messages if they fit in the window"""
+        now = time.time() if now is None else now
+        try:
+            return self._hit(self._cache(), identity, cost, now)
+        except Exception:
+            logger.warning("Rate limit cache unavailable; using in-process counts", exc_info=True)
+            return self._hit(_local_cache, identity, cost, now)
+
+    # Django's cache backends do their I/O synchronously (the a* methods wrap
+    # them in a thread), so async callers take one hop to the request's sync
+    # thread per check rather than one per cache call
+
+    async def ausage(self, identity, now=None):
+        return await sync_to_async(self.usage)(identity, now)
+
+    async def ahit(self, identity, cost=1, now=None):
+        return await sync_to_async(self.hit)(identity, cost, now)
+
+    def _hit(self, cache, identity, cost, now):
+        current_key, previous_key = self._keys(identity, now)
+        # Increment first so concurrent requests can't both squeeze through
+        cache.add(current_key, 0, timeout=self.window * 2)
+        current_count = cache.incr(current_key, cost)
+        previous_count = cache.get(previous_key, 0)
+        used = self._estimate(current_count, previous_count, now)
+        if used > self.limit:
+            cache.decr(current_key, cost)
+            current_count -= cost
+            return RateLimitResult(
+                False, math.ceil(used - cost), self.limit,
+                self._retry_after(current_count, previous_count, cost, now)
+            )
+        return RateLimitResult(True, math.ceil(used), self.limit, 0)
+
+
+def message_rate_limiter():
+    return SlidingWindowRateLimiter(
+        scope='messages',
+        limit=getattr(settings, 'MESSAGE_RATE_LIMIT', 100),
+        window=getattr(settings, 'MESSAGE_RATE_LIMIT_WINDOW', 3600),
+        cache_alias=getattr(settings, 'MESSAGE_RATE_LIMIT_CACHE', 'default'),
+    )
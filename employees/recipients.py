@@ -0,0 +1,90 @@
+"""
+Active employees that messages can be sent to.
+
+``active_recipients()`` is the full list, fetched with one joined query and
+dropped from the cache whenever an Employee or Department changes.
+``autocomplete_recipients()`` is the prefix search behind the recipient
+picker, cached for a few seconds per query.
+"""
+import hashlib
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.cache import cache
+
+from .metrics import cache_lookup
+from .models import Employee
+from .search import get_search_backend
+
+ACTIVE_RECIPIENTS_KEY = 'employees:active_recipients'
+
+RECIPIENT_FIELDS = ('id', 'first_name', 'last_name', 'email', 'phone_number', 'position', 'department__name')
+
+
+def _as_recipients(employees):
+    recipients = []
+    for row in employees.values_list(*RECIPIENT_FIELDS):
+        recipient = dict(zip(RECIPIENT_FIELDS, row))
+        recipient['department'] = recipient.pop('department__name')
+        recipients.append(recipient)
+    return recipients
+
+
+def _load_active_recipients():
+    return _as_recipients(Employee.objects.filter(status='active'))
+
+
+def active_recipients(whatsapp=False):
+    """Active employees as dicts, ordered by name; ``whatsapp`` keeps those with a phone number"""
+    recipients = cache.get(ACTIVE_RECIPIENTS_KEY)
+    cache_lookup('active_recipients', recipients is not None)
+    if recipients is None:
+        recipients = _load_active_recipients()
+        cache.set(ACTIVE_RECIPIENTS_KEY, recipients, getattr(settings, 'ACTIVE_RECIPIENTS_TTL', 600))
+    return _for_channel(recipients, whatsapp)
+
+
+async def aactive_recipients(whatsapp=False):
+    """``active_recipients()`` for async views"""
+    recipients = await cache.aget(ACTIVE_RECIPIENTS_KEY)
+    cache_lookup('active_recipients', recipients is not None)
+    if recipients is None:
+        recipients = await sync_to_async(_load_active_recipients)()
+        await cache.aset(ACTIVE_RECIPIENTS_KEY, recipients, getattr(settings, 'ACTIVE_RECIPIENTS_TTL', 600))
+    return _for_channel(recipients, whatsapp)
+
+
+def _for_channel(recipients, whatsapp):
+    if whatsapp:
+        return [recipient for recipient in recipients if recipient['phone_number']]
+    return recipients
+
+
+def autocomplete_recipients(query, limit=10, whatsapp=False):
+    """Active employees matching ``query`` by prefix, ordered by name"""
+    query = ' '.join(query.lower().split())
+    digest = hashlib.md5(query.encode(), usedforsecurity=False).hexdigest()
+    key = f'employees:autocomplete:{int(whatsapp)}:{limit}:{digest}'
+    recipients = cache.get(key)
+    cache_lookup('recipient_autocomplete', recipients is not None)
+    if recipients is None:
+        employees = Employee.objects.filter(status='active')
+        if whatsapp:
+            employees = employees.exclude(phone_number='')
+        if query:
+            employees = get_search_backend().filter(employees, query)
+        recipients = _as_recipients(employees.order_by('first_name', 'last_name', 'id')[:limit])
+        cache.set(key, recipients, getattr(settings, 'RECIPIENT_AUTOCOMPLETE_TTL', 30))
+    return recipients
+
+
+def get_active_recipient(pk, whatsapp=False):
+    """Single-row lookup used to validate a submitted recipient"""
+    employees = Employee.objects.select_related('department').filter(pk=pk, status='active')
+    if whatsapp:
+        employees = employees.exclude(phone_number='')
+    return employees.first()
+
+
+def invalidate_active_recipients():
+    cache.delete(ACTIVE_RECIPIENTS_KEY)
@@ -0,0 +1,60 @@
+"""
+Which event loop belongs to the ASGI server.
+
+Django runs async views under WSGI too, each on a throwaway event loop
+that asgiref closes as soon as the view returns, cancelling whatever is
+still scheduled on it. Delivery tasks and pooled aiohttp sessions only
+belong on a loop that outlives the request: the one the ASGI server runs.
+``employee_management.asgi`` wraps the application with
+``serve_asgi()``, which records that loop and runs the shutdown callbacks
+registered with ``call_on_shutdown()`` when the server stops (ASGI
+lifespan).
+"""
+import asyncio
+import logging
+import weakref
+
+logger = logging.getLogger(__name__)
+
+# server loop -> coroutine functions to await at shutdown
+_server_loops = weakref.WeakKeyDictionary()
+
+
+def on_server_loop():
+    """True when running on the ASGI server's event loop"""
+    try:
+        return asyncio.get_running_loop() in _server_loops
+    except RuntimeError:
+        return False
+
+
+def call_on_shutdown(callback):
+    """Await ``callback()`` when the server stops; only valid on the server loop"""
+    _server_loops[asyncio.get_running_loop()].append(callback)
+
+
+async def _shutdown(loop):
+    for callback in reversed(_server_loops.get(loop, [])):
+        try:
+            await callback()
+        except Exception:
+            logger.exception("Shutdown callback %r failed", callback)
+    _server_loops.pop(loop, None)
+
+
+def serve_asgi(application):
+    """Wrap the Django ASGI ``application``: record the server loop and handle lifespan"""
+    async def app(scope, receive, send):
+        loop = asyncio.get_running_loop()
+        _server_loops.setdefault(loop, [])
+        if scope['type'] != 'lifespan':
+            return await application(scope, receive, send)
+        while True:
+            message = await receive()
+            if message['type'] == 'lifespan.startup':
+                await send({'type': 'lifespan.startup.complete'})
+            elif message['type'] == 'lifespan.shutdown':
+                await _shutdown(loop)
+                await send({'type': 'lifespan.shutdown.complete'})
+                return
+    return app
@@ -0,0 +1,309 @@
+"""
+Employee search backends.
+
+``employee_list`` (and anything else that searches employees) goes through
+``get_search_backend()``, which picks one of:
+
+* ``sqlite``   - an FTS5 table kept in sync by triggers (migration 0003)
+* ``postgres`` - a GIN index over a ``to_tsvector`` expression (migration 0003)
+* ``memory``   - a per-process inverted index kept in sync from model signals
+
+Set ``EMPLOYEE_SEARCH_BACKEND`` to force one; the default ``auto`` uses the
+database's own full-text index when it exists and falls back to ``memory``.
+"""
+import bisect
+import json
+import re
+import threading
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connection
+from django.db.models.expressions import RawSQL
+
+from .models import Employee
+
+# Searchable fields and their ranking weights
+SEARCH_FIELDS = {
+    'first_name': 10.0,
+    'last_name': 10.0,
+    'employee_id': 8.0,
+    'email': 4.0,
+    'position': 2.0,
+    'address': 1.0,
+}
+
+FTS_TABLE = 'employees_employee_fts'
+
+# Must match the expression the GIN index in migration 0003 was built on
+PG_DOCUMENT = (
+    "to_tsvector('simple', coalesce(first_name, '') || ' ' || coalesce(last_name, '') || ' ' || "
+    "coalesce(employee_id, '') || ' ' || coalesce(email, '') || ' ' || "
+    "coalesce(position, '') || ' ' || coalesce(address, ''))"
+)
+
+TOKEN_RE = re.compile(r'[^\W_]+')
+
+# Longer id lists go to the database as one JSON / array parameter rather
+# than a placeholder each (SQLite limits the placeholders in a statement)
+ID_LIST_MAX_PARAMS = 500
+
+
+def tokenize(text):
+    return TOKEN_RE.findall((text or '').lower())
+
+
+def id_list(ids):
+    """A value for ``id__in`` matching ``ids``, however many there are"""
+    if len(ids) <= ID_LIST_MAX_PARAMS:
+        return ids
+    if connection.vendor == 'sqlite':
+        return RawSQL('SELECT value FROM json_each(%s)', [json.dumps(ids)])
+    if connection.vendor == 'postgresql':
+        return RawSQL('SELECT unnest(%s::bigint[])', [ids])
+    return ids
+
+
+class SQLiteFTSBackend:
+    """Prefix search over the FTS5 table, ranked with bm25()"""
+    name = 'sqlite'
+
+    def _match(self, query):
+        tokens = tokenize(query)
+        return ' AND '.join(f'"{token}"*' for token in tokens) if tokens else None
+
+    def filter(self, queryset, query):
+        match = self._match(query)
+        if match is None:
+            return queryset
+        return queryset.filter(id__in=RawSQL(
+            f'SELECT rowid FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH %s', [match]
+        ))
+
+    def search(self, query, limit=20):
+        match = self._match(query)
+        if match is None:
+            return []
+        weights = ', '.join(str(weight) for weight in SEARCH_FIELDS.values())
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f'SELECT rowid FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH %s '
+                f'ORDER BY bm25({FTS_TABLE}, {weights}) LIMIT %s',
+                [match, limit]
+            )
+            return [row[0] for row in cursor.fetchall()]
+
+    # Triggers keep the FTS table in sync, even for bulk writes
+    def index_employee(self, employee):
+        pass
+
+    def remove_employee(self, employee_id):
+        pass
+
+    def rebuild(self):
+        with connection.cursor() as cursor:
+            cursor.execute(f"INSERT INTO {FTS_TABLE}({FTS_TABLE}) VALUES ('rebuild')")
+
+
+class PostgresSearchBackend:
+    """Prefix tsquery over the indexed to_tsvector expression, ranked with ts_rank()"""
+    name = 'postgres'
+
+    def _tsquery(self, query):
+        tokens = tokenize(query)
+        return ' & '.join(f'{token}:*' for token in tokens) if tokens else None
+
+    def filter(self, queryset, query):
+        tsquery = self._tsquery(query)
+        if tsquery is None:
+            return queryset
+        return queryset.filter(id__in=RawSQL(
+            f"SELECT id FROM {Employee._meta.db_table} "
+            f"WHERE {PG_DOCUMENT} @@ to_tsquery('simple', %s)", [tsquery]
+        ))
+
+    def search(self, query, limit=20):
+        tsquery = self._tsquery(query)
+        if tsquery is None:
+            return []
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f"SELECT id FROM {Employee._meta.db_table} "
+                f"WHERE {PG_DOCUMENT} @@ to_tsquery('simple', %s) "
+                f"ORDER BY ts_rank({PG_DOCUMENT}, to_tsquery('simple', %s)) DESC LIMIT %s",
+                [tsquery, tsquery, limit]
+            )
+            return [row[0] for row in cursor.fetchall()]
+
+    # The index is on the table itself, so there is nothing to sync
+    def index_employee(self, employee):
+        pass
+
+    def remove_employee(self, employee_id):
+        pass
+
+    def rebuild(self):
+        with connection.cursor() as cursor:
+            cursor.execute('REINDEX INDEX employees_employee_search_idx')
+
+
+class InMemorySearchBackend:
+    """
+    Inverted index held in process memory.
+
+    Writes are applied locally and bump a shared version number in the cache,
+    so other worker processes notice they are stale and reload on their next
+    search.
+    """
+    name = 'memory'
+    VERSION_KEY = 'employees:search_version'
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._postings = {}      # token -> {employee_id: weight}
+        self._documents = {}     # employee_id -> {token: weight}
+        self._tokens = []        # sorted postings keys, for prefix lookups
+        self._version = None
+        self._loaded = False
+
+    @staticmethod
+    def _document(values):
+        document = {}
+        for field, weight in SEARCH_FIELDS.items():
+            for token in tokenize(values[field]):
+                document[token] = document.get(token, 0) + weight
+        return document
+
+    def _add(self, employee_id, document):
+        self._documents[employee_id] = document
+        for token, weight in document.items():
+            if token not in self._postings:
+                self._postings[token] = {}
+                bisect.insort(self._tokens, token)
+            self._postings[token][employee_id] = weight
+
+    def _remove(self, employee_id):
+        for token in self._documents.pop(employee_id, {}):
+            postings = self._postings.get(token)
+            if postings is None:
+                continue
+            postings.pop(employee_id, None)
+            if not postings:
+                del self._postings[token]
+                del self._tokens[bisect.bisect_left(self._tokens, token)]
+
+    def _shared_version(self):
+        return cache.get_or_set(self.VERSION_KEY, 0, None)
+
+    def _bump_version(self):
+        try:
+            version = cache.incr(self.VERSION_KEY)
+        except ValueError:
+            cache.set(self.VERSION_KEY, 1, None)
+            version = 1
+        # Somebody else wrote in between: reload next time instead of guessing
+        if self._version is None or version != self._version + 1:
+            self._loaded = False
+        self._version = version
+
+    def _load(self):
+        version = self._shared_version()
+        if self._loaded and version == self._version:
+            return
+        self._postings, self._documents, self._tokens = {}, {}, []
+        for values in Employee.objects.values('id', *SEARCH_FIELDS).iterator(chunk_size=2000):
+            document = self._document(values)
+            for token, weight in document.items():
+                self._postings.setdefault(token, {})[values['id']] = weight
+            self._documents[values['id']] = document
+        self._tokens = sorted(self._postings)
+        self._version = version
+        self._loaded = True
+
+    def _scores(self, query):
+        tokens = tokenize(query)
+        if not tokens:
+            return None
+        with self._lock:
+            self._load()
+            scores = None
+            for token in tokens:
+                matches = {}
+                index = bisect.bisect_left(self._tokens, token)
+                while index < len(self._tokens) and self._tokens[index].startswith(token):
+                    candidate = self._tokens[index]
+                    index += 1
+                    for employee_id, weight in self._postings[candidate].items():
+                        matches[employee_id] = matches.get(employee_id, 0) + weight
+                if scores is None:
+                    scores = matches
+                else:
+                    scores = {
+                        employee_id: score + matches[employee_id]
+                        for employee_id, score in scores.items() if employee_id in matches
+                    }
+                if not scores:
+                    break
+            return scores
+
+    def filter(self, queryset, query):
+        scores = self._scores(query)
+        if scores is None:
+            return queryset
+        if not scores:
+            return queryset.none()
+        return queryset.filter(id__in=id_list(list(scores)))
+
+    def search(self, query, limit=20):
+        scores = self._scores(query) or {}
+        return sorted(scores, key=lambda employee_id: -scores[employee_id])[:limit]
+
+    def index_employee(self, employee):
+        values = {field: getattr(employee, field) for field in SEARCH_FIELDS}
+        with self._lock:
+            if self._loaded:
+                self._remove(employee.pk)
+                self._add(employee.pk, self._document(values))
+            self._bump_version()
+
+    def remove_employee(self, employee_id):
+        with self._lock:
+            if self._loaded:
+                self._remove(employee_id)
+            self._bump_version()
+
+    def rebuild(self):
+        with self._lock:
+            self._loaded = False
+            self._load()
+
+
+BACKENDS = {
+    'sqlite': SQLiteFTSBackend,
+    'postgres': PostgresSearchBackend,
+    'memory': InMemorySearchBackend,
+}
+
+_backend = None
+_backend_lock = threading.Lock()
+
+
+def _detect_backend():
+    if connection.vendor == 'sqlite' and FTS_TABLE in connection.introspection.table_names():
+        return 'sqlite'
+    if connection.vendor == 'postgresql':
+        return 'postgres'
+    return 'memory'
+
+
+def get_search_backend():
+    """Return the process-wide search backend, choosing it on first use"""
+    global _backend
+    if _backend is None:
+        with _backend_lock:
+            if _backend is None:
+                name = getattr(settings, 'EMPLOYEE_SEARCH_BACKEND', 'auto')
+                if name == 'auto':
+                    name = _detect_backend()
+                _backend = BACKENDS[name]()
+    return _backend
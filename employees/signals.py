@@ -0,0 +1,81 @@
+from django.db import transaction
+from django.db.models.signals import pre_save, post_save, post_delete
+from django.dispatch import receiver
+
+from .models import Employee, Department, Message
+from . import history, stats
+from .analytics import invalidate_analytics
+from .fragments import bump_fragment_version
+from .recipients import invalidate_active_recipients
+from .search import get_search_backend
+
+STATS_FIELDS = ('status', 'salary', 'department_id', 'hire_date')
+
+
+def _stats_row(employee):
+    return {field: getattr(employee, field) for field in STATS_FIELDS}
+
+
+@receiver(pre_save, sender=Employee)
+def remember_previous_employee(sender, instance, **kwargs):
+    """Keep the stored row around so post_save can work out what changed"""
+    instance._previous_row = None
+    if instance.pk:
+        instance._previous_row = Employee.objects.filter(pk=instance.pk).values(*STATS_FIELDS).first()
+
+
+@receiver(post_save, sender=Employee)
+def employee_saved(sender, instance, created, **kwargs):
+    old_row = None if created else getattr(instance, '_previous_row', None)
+    new_row = _stats_row(instance)
+    stats.employee_changed(old_row, new_row)
+    change = history.status_change(instance.pk, instance.department_id, old_row and old_row['status'], instance.status)
+    if change is not None:
+        change.save()
+    transaction.on_commit(stats.invalidate_dashboard_stats)
+    transaction.on_commit(lambda: get_search_backend().index_employee(instance))
+    transaction.on_commit(invalidate_active_recipients)
+    transaction.on_commit(invalidate_analytics)
+    transaction.on_commit(lambda: bump_fragment_version('employee'))
+
+
+@receiver(post_delete, sender=Employee)
+def employee_deleted(sender, instance, origin=None, **kwargs):
+    old_row = _stats_row(instance)
+    employee_id = instance.pk
+    deleting_department = isinstance(origin, Department)
+    if not deleting_department:
+        # (a deleted department takes its stats row with it)
+        stats.employee_changed(old_row, None)
+    history.status_change(
+        None, None if deleting_department else instance.department_id, instance.status, None
+    ).save()
+    transaction.on_commit(stats.invalidate_dashboard_stats)
+    transaction.on_commit(lambda: get_search_backend().remove_employee(employee_id))
+    transaction.on_commit(invalidate_active_recipients)
+    transaction.on_commit(invalidate_analytics)
+    transaction.on_commit(lambda: bump_fragment_version('employee'))
+
+
+@receiver(post_save, sender=Department)
+def department_saved(sender, instance, created, **kwargs):
+    if created:
+        stats.department_created(instance)
+    transaction.on_commit(stats.invalidate_dashboard_stats)
+    transaction.on_commit(invalidate_active_recipients)
+    transaction.on_commit(invalidate_analytics)
+    transaction.on_commit(lambda: bump_fragment_version('department'))
+
+
+@receiver(post_delete, sender=Department)
+def department_deleted(sender, instance, **kwargs):
+    transaction.on_commit(stats.invalidate_dashboard_stats)
+    transaction.on_commit(invalidate_active_recipients)
+    transaction.on_commit(invalidate_analytics)
+    transaction.on_commit(lambda: bump_fragment_version('department'))
+
+
+@receiver(post_save, sender=Message)
+@receiver(post_delete, sender=Message)
+def message_changed(sender, **kwargs):
+    transaction.on_commit(lambda: bump_fragment_version('message'))
@@ -0,0 +1,196 @@
+from decimal import Decimal
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Case, Count, DateField, F, Max, Q, Subquery, Sum, Value, When
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+from .models import Employee, Department, DepartmentStats
+from .metrics import cache_lookup
+
+DASHBOARD_STATS_KEY = 'employees:dashboard_stats'
+
+STATS_FIELDS = ('headcount', 'active_headcount', 'total_salary', 'last_hire_date')
+
+
+def _stats_timeout():
+    return getattr(settings, 'DASHBOARD_STATS_TTL', 300)
+
+
+def departments_with_stats():
+    """Departments annotated from DepartmentStats (one join on the primary key)"""
+    return Department.objects.annotate(
+        employee_count=Coalesce(F('stats__headcount'), 0),
+        active_count=Coalesce(F('stats__active_headcount'), 0),
+        salary_total=Coalesce(F('stats__total_salary'), Value(Decimal('0'))),
+        last_hire_date=F('stats__last_hire_date'),
+    )
+
+
+def compute_dashboard_stats():
+    """Dashboard counters, summed from the DepartmentStats rows"""
+    departments = {}
+    total = active = 0
+    salary_total = Decimal('0')
+    for dept in departments_with_stats().values('id', 'name', 'employee_count', 'active_count', 'salary_total'):
+        departments[dept['id']] = {'name': dept['name'], 'employee_count': dept['employee_count']}
+        total += dept['employee_count']
+        active += dept['active_count']
+        salary_total += dept['salary_total']
+    return {
+        'total_employees': total,
+        'active_employees': active,
+        'salary_total': salary_total,
+        'departments': departments,
+    }
+
+
+def get_dashboard_stats():
+    """Return the cached dashboard counters, recomputing them on a cache miss"""
+    stats = cache.get(DASHBOARD_STATS_KEY)
+    cache_lookup('dashboard_stats', stats is not None)
+    if stats is None:
+        stats = compute_dashboard_stats()
+        cache.set(DASHBOARD_STATS_KEY, stats, _stats_timeout())
+    return _dashboard_summary(stats)
+
+
+async def aget_dashboard_stats():
+    """``get_dashboard_stats()`` for async views"""
+    stats = await cache.aget(DASHBOARD_STATS_KEY)
+    cache_lookup('dashboard_stats', stats is not None)
+    if stats is None:
+        stats = await sync_to_async(compute_dashboard_stats)()
+        await cache.aset(DASHBOARD_STATS_KEY, stats, _stats_timeout())
+    return _dashboard_summary(stats)
+
+
+def _dashboard_summary(stats):
+    total = stats['total_employees']
+    avg_salary = stats['salary_total'] / total if total else 0
+    dept_stats = sorted(
+        stats['departments'].values(),
+        key=lambda dept: (-dept['employee_count'], dept['name'])
+    )[:5]
+    return {
+        'total_employees': total,
+        'active_employees': stats['active_employees'],
+        'total_departments': len(stats['departments']),
+        'avg_salary': avg_salary,
+        'dept_stats': dept_stats,
+    }
+
+
+def invalidate_dashboard_stats():
+    cache.delete(DASHBOARD_STATS_KEY)
+
+
+def _actual_stats(department_ids=None):
+    """{department_id: counters} aggregated from the Employee table"""
+    employees = Employee.objects.all()
+    if department_ids is not None:
+        employees = employees.filter(department_id__in=department_ids)
+    return {
+        row['department_id']: row
+        for row in employees.values('department_id').annotate(
+            headcount=Count('id'),
+            active_headcount=Count('id', filter=Q(status='active')),
+            total_salary=Sum('salary'),
+            last_hire_date=Max('hire_date'),
+        ).order_by()
+    }
+
+
+def rebuild_department_stats(department_ids=None):
+    """Recompute DepartmentStats from the Employee table (all departments, or just these)"""
+    departments = Department.objects.all()
+    if department_ids is not None:
+        departments = departments.filter(pk__in=department_ids)
+    actual = _actual_stats(department_ids)
+    rows = []
+    for department_id in departments.values_list('pk', flat=True):
+        row = actual.get(department_id, {})
+        rows.append(DepartmentStats(
+            department_id=department_id,
+            headcount=row.get('headcount', 0),
+            active_headcount=row.get('active_headcount', 0),
+            total_salary=row.get('total_salary') or 0,
+            last_hire_date=row.get('last_hire_date'),
+        ))
+    DepartmentStats.objects.bulk_create(
+        rows, update_conflicts=True, unique_fields=['department'],
+        update_fields=list(STATS_FIELDS) + ['updated_at'],
+    )
+    return len(rows)
+
+
+def check_department_stats():
+    """(department_id, field, stored, actual) for every counter that has drifted"""
+    actual = _actual_stats()
+    stored = {stats.pk: stats for stats in DepartmentStats.objects.all()}
+    drift = []
+    for department_id in Department.objects.values_list('pk', flat=True):
+        row = stored.get(department_id)
+        expected = actual.get(department_id, {})
+        for field in STATS_FIELDS:
+            want = expected.get(field) or (None if field == 'last_hire_date' else 0)
+            have = getattr(row, field) if row is not None else None
+            if have != want:
+                drift.append((department_id, field, have, want))
+    return drift
+
+
+def _apply_employee(row, sign):
+    """
+    Add (sign=1) or remove (sign=-1) one employee row from its department's
+    counters with a single UPDATE; returns False if there is no row to update.
+    """
+    department_id = row['department_id']
+    changes = {
+        'updated_at': timezone.now(),
+        'headcount': F('headcount') + sign,
+        'total_salary': F('total_salary') + sign * Decimal(row['salary'] or 0),
+    }
+    if row['status'] == 'active':
+        changes['active_headcount'] = F('active_headcount') + sign
+    hire_date = row['hire_date']
+    if sign > 0 and hire_date:
+        changes['last_hire_date'] = Case(
+            When(Q(last_hire_date__isnull=True) | Q(last_hire_date__lt=hire_date), then=Value(hire_date, output_field=DateField())),
+            default=F('last_hire_date'),
+        )
+    stats = DepartmentStats.objects.filter(pk=department_id)
+    if not stats.update(**changes):
+        return False
+    if sign < 0 and hire_date:
+        # The latest hire may have just left; take the max again only then
+        stats.filter(last_hire_date__lte=hire_date).update(last_hire_date=Subquery(
+            Employee.objects.filter(department_id=department_id).order_by().values('department_id').annotate(
+                latest=Max('hire_date')
+            ).values('latest')
+        ))
+    return True
+
+
+def employee_changed(old_row, new_row):
+    """
+    Record an employee insert (old_row=None), update, or delete (new_row=None)
+    in DepartmentStats. Runs inside the write's transaction, so the counters
+    commit or roll back with it.
+    """
+    if old_row == new_row:
+        return
+    missing = set()
+    if old_row is not None and not _apply_employee(old_row, -1):
+        missing.add(old_row['department_id'])
+    if new_row is not None and new_row['department_id'] not in missing and not _apply_employee(new_row, 1):
+        missing.add(new_row['department_id'])
+    if missing:
+        # No stats row yet; the Employee table already reflects this write
+        rebuild_department_stats(missing)
+
+
+def department_created(department):
+    DepartmentStats.objects.get_or_create(department=department)
@@ -4,4 +4,19 @@ from django.core.mail import EmailMessage
 @shared_task
 def send_email_task(subject, message, recipient_list):
     email = EmailMessage(subject, message, to=recipient_list)
-    email.send()
\ No newline at end of file
+    email.send()
+
+@shared_task
+def deliver_message_task(message_id):
+    from .messaging import deliver_message
+    deliver_message(message_id)
+
+@shared_task
+def deliver_batch_task(message_ids):
+    from .messaging import deliver_batch
+    deliver_batch(message_ids)
+
+@shared_task
+def snapshot_headcount_task():
+    from .history import take_headcount_snapshot
+    take_headcount_snapshot()
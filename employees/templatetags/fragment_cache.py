@@ -0,0 +1,74 @@
+"""
+``{% versioned_cache %}``: cache a template block until the models it shows change.
+
+    {% load fragment_cache %}
+    {% versioned_cache "department_cards" "department employee" %}
+        ...
+    {% endversioned_cache %}
+
+The first argument names the fragment and the second lists the models
+it depends on (see employees.fragments). Any further arguments are
+variables the output also varies on, e.g. ``request.user.pk``. A
+trailing ``timeout=<seconds>`` overrides FRAGMENT_CACHE_TTL.
+"""
+from django import template
+from django.conf import settings
+from django.core.cache import cache
+from django.core.cache.utils import make_template_fragment_key
+
+from employees.fragments import FRAGMENT_MODELS, fragment_versions
+from employees.metrics import cache_lookup
+
+register = template.Library()
+
+
+class VersionedCacheNode(template.Node):
+    def __init__(self, nodelist, fragment_name, models, vary_on, timeout):
+        self.nodelist = nodelist
+        self.fragment_name = fragment_name
+        self.models = models
+        self.vary_on = vary_on
+        self.timeout = timeout
+
+    def render(self, context):
+        if self.timeout is None:
+            timeout = getattr(settings, 'FRAGMENT_CACHE_TTL', 600)
+        else:
+            timeout = self.timeout.resolve(context)
+        key = make_template_fragment_key(
+            self.fragment_name,
+            fragment_versions(self.models) + [var.resolve(context) for var in self.vary_on],
+        )
+        content = cache.get(key)
+        cache_lookup('template_fragment', content is not None)
+        if content is None:
+            content = self.nodelist.render(context)
+            cache.set(key, content, timeout)
+        return content
+
+
+@register.tag('versioned_cache')
+def do_versioned_cache(parser, token):
+    bits = token.split_contents()
+    if len(bits) < 3:
+        raise template.TemplateSyntaxError(
+            f"'{bits[0]}' takes a fragment name and a list of models, e.g. "
+            f"{{% {bits[0]} \"department_cards\" \"department employee\" %}}"
+        )
+    nodelist = parser.parse(('endversioned_cache',))
+    parser.delete_first_token()
+
+    timeout = None
+    if bits[-1].startswith('timeout='):
+        timeout = parser.compile_filter(bits.pop()[len('timeout='):])
+    fragment_name, models = (bit.strip('"\'') for bit in bits[1:3])
+    unknown = set(models.split()) - set(FRAGMENT_MODELS)
+    if unknown:
+        raise template.TemplateSyntaxError(
+            f"'{bits[0]}' got unknown model(s) {', '.join(sorted(unknown))}; "
+            f"expected some of {', '.join(FRAGMENT_MODELS)}"
+        )
+    return VersionedCacheNode(
+        nodelist, fragment_name, models.split(),
+        [parser.compile_filter(bit) for bit in bits[3:]], timeout,
+    )
@@ -1,3 +1,767 @@
-from django.test import TestCase
+import csv
+import datetime
+import io
+import json
+import os
+import tempfile
+import zipfile
 
-# Create your tests here.
+from asgiref.sync import async_to_sync
+
+from django.contrib.auth.models import User
+from django.core import signing
+from django.core import mail
+from django.core.cache import cache
+from django.core.mail.backends.locmem import EmailBackend as LocMemEmailBackend
+from django.core.exceptions import ImproperlyConfigured
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import CommandError, call_command
+from django.db import transaction
+from django.test import RequestFactory, TestCase, override_settings
+from django.urls import reverse
+
+from .events import CacheEventBroker, LocalEventBroker, event_stream, get_event_broker, publish_delivery
+from .exports import accepts_gzip
+from . import metrics
+from .imports import EmployeeImporter, ImportFormatError, normalize_row, read_json
+from .messaging import deliver_batch
+from .models import Department, DepartmentStats, Employee, Message
+from .pagination import CURSOR_SALT, KeysetPaginator
+from .ratelimit import SlidingWindowRateLimiter
+from .search import InMemorySearchBackend
+from .stats import check_department_stats, get_dashboard_stats
+
+
+def make_employee(department, number, **fields):
+    values = {
+        'employee_id': f'EMP{number:04d}',
+        'first_name': f'First{number:04d}',
+        'last_name': f'Last{number:04d}',
+        'email': f'employee{number}@example.com',
+        'phone_number': '+15550000000',
+        'date_of_birth': datetime.date(1990, 1, 1),
+        'gender': 'O',
+        'address': 'Somewhere',
+        'department': department,
+        'position': 'Engineer',
+        'salary': 1000,
+        'hire_date': datetime.date(2020, 1, 1),
+    }
+    values.update(fields)
+    return Employee.objects.create(**values)
+
+
+class KeysetPaginatorTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.department = Department.objects.create(name='Engineering')
+        # pairs of equal first names, so the id tie-breaker matters
+        cls.employees = [
+            make_employee(cls.department, number, first_name=f'Name{number // 2}')
+            for number in range(7)
+        ]
+
+    def setUp(self):
+        cache.clear()
+
+    def paginator(self, queryset=None, **kwargs):
+        queryset = Employee.objects.all() if queryset is None else queryset
+        return KeysetPaginator(queryset, ordering=['first_name', 'id'], per_page=3, **kwargs)
+
+    def test_pages_forward_and_back(self):
+        paginator = self.paginator()
+        first = paginator.get_page()
+        second = paginator.get_page(first.next_cursor)
+        third = paginator.get_page(second.next_cursor)
+        self.assertEqual(
+            [e.pk for page in (first, second, third) for e in page],
+            [e.pk for e in self.employees],
+        )
+        self.assertFalse(first.has_previous)
+        self.assertFalse(third.has_next)
+        self.assertEqual(list(paginator.get_page(third.previous_cursor)), list(second))
+        self.assertEqual(list(paginator.get_page(second.previous_cursor)), list(first))
+
+    def test_descending_ordering(self):
+        paginator = KeysetPaginator(Employee.objects.all(), ordering=['-first_name', '-id'], per_page=4)
+        first = paginator.get_page()
+        second = paginator.get_page(first.next_cursor)
+        self.assertEqual([e.pk for e in [*first, *second]], [e.pk for e in reversed(self.employees)])
+
+    def test_tampered_cursor_starts_over(self):
+        paginator = self.paginator()
+        cursor = paginator.get_page().next_cursor
+        for tampered in (cursor[:-2] + 'xx', 'not-a-cursor', cursor.upper()):
+            page = paginator.get_page(tampered)
+            self.assertEqual([e.pk for e in page], [e.pk for e in self.employees[:3]])
+            self.assertFalse(page.has_previous)
+
+    def test_cursor_for_other_ordering_starts_over(self):
+        cursor = signing.dumps({'d': 'next', 'v': ['Name1']}, salt=CURSOR_SALT, compress=True)
+        page = self.paginator().get_page(cursor)
+        self.assertEqual([e.pk for e in page], [e.pk for e in self.employees[:3]])
+
+    def test_empty_cursor_is_the_first_page(self):
+        paginator = self.paginator()
+        self.assertEqual(list(paginator.get_page('')), list(paginator.get_page()))
+
+    def test_empty_queryset(self):
+        for count in ('exact', 'approximate'):
+            page = self.paginator(Employee.objects.none(), count=count).get_page()
+            self.assertEqual(list(page), [])
+            self.assertEqual(page.count, 0)
+            self.assertFalse(page.has_other_pages)
+
+    def test_search_without_hits(self):
+        backend = InMemorySearchBackend()
+        queryset = backend.filter(Employee.objects.all(), 'nobody-matches-this')
+        page = self.paginator(queryset, count='approximate').get_page()
+        self.assertEqual(list(page), [])
+        self.assertEqual(page.count, 0)
+
+    def test_search_hits_are_paginated(self):
+        backend = InMemorySearchBackend()
+        queryset = backend.filter(Employee.objects.all(), 'name1')
+        page = self.paginator(queryset, count='exact').get_page()
+        self.assertEqual([e.pk for e in page], [e.pk for e in self.employees[2:4]])
+        self.assertEqual(page.count, 2)
+
+    def test_employee_list_view(self):
+        self.client.force_login(User.objects.create_user('viewer', password='x'))
+        url = reverse('employee_list')
+        response = self.client.get(url, {'search': 'nobody-matches-this'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(list(response.context['page_obj']), [])
+
+        response = self.client.get(url, {'cursor': 'tampered'})
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.context['page_obj'].has_next)
+
+
+class SlidingWindowRateLimiterTests(TestCase):
+    # 10 messages per 100 seconds; windows start at multiples of 100
+    def setUp(self):
+        cache.clear()
+        self.limiter = SlidingWindowRateLimiter('test', limit=10, window=100)
+
+    def fill(self, now, count=10):
+        for _ in range(count):
+            self.assertTrue(self.limiter.hit('user', now=now).allowed)
+
+    def test_limit_is_inclusive(self):
+        self.fill(now=0)
+        result = self.limiter.hit('user', now=0)
+        self.assertFalse(result.allowed)
+        self.assertEqual(result.used, 10)
+        self.assertEqual(result.remaining, 0)
+        self.assertEqual(result.retry_after, 100)
+
+    def test_rejected_hit_is_not_counted(self):
+        self.fill(now=0, count=9)
+        self.assertFalse(self.limiter.hit('user', cost=2, now=1).allowed)
+        self.assertTrue(self.limiter.hit('user', now=1).allowed)
+        self.assertEqual(self.limiter.usage('user', now=1).used, 10)
+
+    def test_last_instant_of_a_window(self):
+        self.fill(now=0)
+        self.assertFalse(self.limiter.hit('user', now=99.999).allowed)
+
+    def test_previous_window_counts_in_full_at_the_boundary(self):
+        self.fill(now=99)
+        result = self.limiter.hit('user', now=100)
+        self.assertFalse(result.allowed)
+        # one tenth of the previous window (one message) has to slide by
+        self.assertEqual(result.retry_after, 10)
+        self.assertFalse(self.limiter.hit('user', now=109).allowed)
+        self.assertTrue(self.limiter.hit('user', now=110).allowed)
+        self.assertFalse(self.limiter.hit('user', now=110).allowed)
+
+    def test_previous_window_weight_slides(self):
+        self.fill(now=50)
+        # halfway through the next window half of it still counts
+        self.fill(now=150, count=5)
+        self.assertFalse(self.limiter.hit('user', now=150).allowed)
+
+    def test_windows_older_than_the_previous_one_are_forgotten(self):
+        self.fill(now=0)
+        self.assertEqual(self.limiter.usage('user', now=200).used, 0)
+        self.fill(now=200)
+
+    def test_usage_does_not_consume(self):
+        self.fill(now=0, count=4)
+        for _ in range(3):
+            usage = self.limiter.usage('user', now=0)
+        self.assertEqual((usage.used, usage.allowed, usage.retry_after), (4, True, 0))
+        self.assertEqual(self.limiter.usage('user', now=0).remaining, 6)
+
+    def test_usage_at_the_limit(self):
+        self.fill(now=0)
+        usage = self.limiter.usage('user', now=30)
+        self.assertFalse(usage.allowed)
+        self.assertEqual(usage.retry_after, 70)
+
+    def test_batch_larger_than_the_limit(self):
+        result = self.limiter.hit('user', cost=11, now=0)
+        self.assertFalse(result.allowed)
+        self.assertEqual(self.limiter.usage('user', now=0).used, 0)
+
+    def test_identities_and_scopes_are_separate(self):
+        self.fill(now=0)
+        self.assertTrue(self.limiter.hit('other', now=0).allowed)
+        self.assertTrue(SlidingWindowRateLimiter('other', limit=10, window=100).hit('user', now=0).allowed)
+
+
+IMPORT_HEADER = (
+    'Employee ID,First Name,Last Name,Email,Phone Number,Date of Birth,Gender,Address,'
+    'Department,Position,Salary,Hire Date,Status\n'
+)
+
+
+def import_row(number, department='Engineering', **fields):
+    values = {
+        'employee_id': f'IMP{number:04d}', 'first_name': 'Ada', 'last_name': f'Row{number}',
+        'email': f'import{number}@example.com', 'phone_number': '+15550000000',
+        'date_of_birth': '1990-01-01', 'gender': 'F', 'address': 'Somewhere',
+        'department': department, 'position': 'Engineer', 'salary': '1000', 'hire_date': '2020-01-01',
+        'status': 'active',
+    }
+    values.update(fields)
+    return ','.join(values.values()) + '\n'
+
+
+class EmployeeImporterTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.department = Department.objects.create(name='Engineering')
+
+    def run_import(self, *rows, **options):
+        options.setdefault('batch_size', 2)
+        return EmployeeImporter(**options).import_file(io.BytesIO((IMPORT_HEADER + ''.join(rows)).encode()), 'csv')
+
+    def test_creates_rows(self):
+        result = self.run_import(import_row(1), import_row(2), import_row(3))
+        self.assertEqual((result.rows, result.created, result.updated, result.errors), (3, 3, 0, []))
+        employee = Employee.objects.get(employee_id='IMP0002')
+        self.assertEqual((employee.last_name, employee.department), ('Row2', self.department))
+
+    def test_bad_rows_are_reported_and_the_rest_imported(self):
+        result = self.run_import(
+            import_row(1),
+            import_row(2, email='not-an-email'),
+            import_row(3, salary='lots'),
+            import_row(4, department='Nowhere'),
+            import_row(5),
+        )
+        self.assertEqual((result.rows, result.created, result.error_count), (5, 2, 3))
+        self.assertEqual([row for row, _ in result.errors], [2, 3, 4])
+        self.assertIn('email', result.errors[0][1])
+        self.assertIn('salary', result.errors[1][1])
+        self.assertEqual(result.errors[2][1], {'department': ['Unknown department "Nowhere".']})
+        self.assertEqual(
+            sorted(Employee.objects.values_list('employee_id', flat=True)), ['IMP0001', 'IMP0005']
+        )
+
+    def test_duplicates_within_the_file(self):
+        result = self.run_import(
+            import_row(1), import_row(1, email='other@example.com'), import_row(2, email='import1@example.com'),
+        )
+        self.assertEqual(result.created, 1)
+        self.assertEqual(result.errors, [
+            (2, {'employee_id': ['Duplicate Employee ID earlier in this file.']}),
+            (3, {'email': ['Duplicate email earlier in this file.']}),
+        ])
+
+    def test_existing_employees(self):
+        self.run_import(import_row(1), import_row(2))
+        result = self.run_import(import_row(1, last_name='Changed'), import_row(3, email='import2@example.com'))
+        self.assertEqual(result.created, 0)
+        self.assertEqual(result.errors, [
+            (1, {'employee_id': ['Employee with this Employee ID already exists.']}),
+            (2, {'email': ['Employee with this Email already exists.']}),
+        ])
+
+        result = self.run_import(import_row(1, last_name='Changed'), update_existing=True)
+        self.assertEqual((result.created, result.updated, result.errors), (0, 1, []))
+        self.assertEqual(Employee.objects.get(employee_id='IMP0001').last_name, 'Changed')
+
+    def test_create_departments(self):
+        result = self.run_import(import_row(1, department='Research'), create_departments=True)
+        self.assertEqual(result.created, 1)
+        self.assertEqual(Employee.objects.get().department.name, 'Research')
+
+    def test_dry_run_saves_nothing(self):
+        result = self.run_import(
+            import_row(1), import_row(2, department='Research'), import_row(3, gender='X'),
+            dry_run=True, create_departments=True,
+        )
+        self.assertEqual((result.created, result.error_count), (2, 1))
+        self.assertFalse(Employee.objects.exists())
+        self.assertFalse(Department.objects.filter(name='Research').exists())
+
+    def test_json_array_and_lines(self):
+        record = '{"employee_id": "IMP%04d", "email": "import%d@example.com", "department": "Engineering"}'
+        first, second = record % (1, 1), record % (2, 2)
+        for document in (f'[{first}, {second}]', f'{first}\n{second}\n'):
+            rows = list(read_json(io.BytesIO(document.encode()), read_size=7))
+            self.assertEqual([row['employee_id'] for row in rows], ['IMP0001', 'IMP0002'])
+
+    def test_unreadable_json(self):
+        for document in ('[{"a": 1}, {"a": ', '[1, 2]', '{"a": 1} nonsense'):
+            with self.assertRaises(ImportFormatError):
+                list(read_json(io.BytesIO(document.encode())))
+
+    def test_import_view_shows_the_summary(self):
+        self.client.force_login(User.objects.create_user('importer', password='x'))
+        upload = SimpleUploadedFile(
+            'employees.csv', (IMPORT_HEADER + import_row(1) + import_row(2, email='bad')).encode()
+        )
+        response = self.client.post(reverse('employee_import'), {'file': upload})
+        self.assertEqual(response.status_code, 200)
+        result = response.context['result']
+        self.assertEqual((result.rows, result.created, result.error_count), (2, 1, 1))
+        self.assertEqual([row for row, _ in response.context['row_errors']], [2])
+        self.assertContains(response, '1 rejected')
+
+    @override_settings(EMPLOYEE_IMPORT_MAX_ROWS=2)
+    def test_import_view_row_cap(self):
+        self.client.force_login(User.objects.create_user('importer', password='x'))
+        url = reverse('employee_import')
+        upload = SimpleUploadedFile('employees.csv', (IMPORT_HEADER + import_row(1) + import_row(2)).encode())
+        self.assertEqual(self.client.post(url, {'file': upload}).context['result'].created, 2)
+
+        rows = import_row(3) + import_row(4) + import_row(5)
+        response = self.client.post(url, {'file': SimpleUploadedFile('more.csv', (IMPORT_HEADER + rows).encode())})
+        self.assertFormError(
+            response.context['form'], 'file',
+            'The file has more than 2 rows; split it, or use manage.py import_employees.',
+        )
+        # nothing from a file over the cap is written, not even its first batch
+        self.assertEqual(Employee.objects.count(), 2)
+
+    def test_unreadable_files(self):
+        for content, file_format, message in [
+            (IMPORT_HEADER.encode() + 'Zoë,x\n'.encode('latin-1'), 'csv', 'The file is not UTF-8 text.'),
+            # cut off inside a character, at the very end of the file
+            (IMPORT_HEADER.encode() + 'Zoë'.encode('latin-1'), 'csv', 'The file is not UTF-8 text.'),
+            (b'[{"name": "Zo\xeb"}]', 'json', 'The file is not UTF-8 text.'),
+            ((IMPORT_HEADER + 'x' * (csv.field_size_limit() + 1)).encode(), 'csv', 'Invalid CSV: '),
+        ]:
+            with self.subTest(message=message), self.assertRaisesMessage(ImportFormatError, message):
+                EmployeeImporter().import_file(io.BytesIO(content), file_format)
+
+    def test_import_command_reports_unreadable_files(self):
+        path = self.enterContext(tempfile.TemporaryDirectory()) + '/employees.csv'
+        with open(path, 'wb') as fileobj:
+            fileobj.write(IMPORT_HEADER.encode() + 'Zoë'.encode('latin-1'))
+        with self.assertRaisesMessage(CommandError, 'The file is not UTF-8 text.'):
+            call_command('import_employees', path, stdout=io.StringIO())
+
+    def test_import_view_reports_oversized_fields(self):
+        self.client.force_login(User.objects.create_user('importer', password='x'))
+        content = (IMPORT_HEADER + 'x' * (csv.field_size_limit() + 1)).encode()
+        response = self.client.post(reverse('employee_import'), {'file': SimpleUploadedFile('big.csv', content)})
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('Invalid CSV: ', str(response.context['form'].errors['file']))
+
+    def test_import_view_rejects_unknown_file_types(self):
+        self.client.force_login(User.objects.create_user('importer', password='x'))
+        upload = SimpleUploadedFile('employees.txt', b'anything')
+        response = self.client.post(reverse('employee_import'), {'file': upload})
+        self.assertFormError(response.context['form'], 'file', 'Unsupported file type; use .csv, .json or .jsonl.')
+        self.assertFalse(Employee.objects.exists())
+
+
+class DepartmentStatsTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.engineering = Department.objects.create(name='Engineering')
+        cls.sales = Department.objects.create(name='Sales')
+
+    def setUp(self):
+        cache.clear()
+
+    def assertStats(self, department, headcount, active, salary, last_hire):
+        stats = DepartmentStats.objects.get(department=department)
+        self.assertEqual(
+            (stats.headcount, stats.active_headcount, stats.total_salary, stats.last_hire_date),
+            (headcount, active, salary, last_hire),
+        )
+        self.assertEqual(check_department_stats(), [])
+
+    def test_new_department_starts_at_zero(self):
+        self.assertStats(self.engineering, 0, 0, 0, None)
+
+    def test_create(self):
+        make_employee(self.engineering, 1, salary=1000, hire_date=datetime.date(2020, 1, 1))
+        make_employee(self.engineering, 2, salary=500, status='inactive', hire_date=datetime.date(2021, 1, 1))
+        self.assertStats(self.engineering, 2, 1, 1500, datetime.date(2021, 1, 1))
+        self.assertStats(self.sales, 0, 0, 0, None)
+
+    def test_update(self):
+        employee = make_employee(self.engineering, 1, salary=1000)
+        employee.salary = 1200
+        employee.status = 'terminated'
+        employee.hire_date = datetime.date(2022, 5, 1)
+        employee.save()
+        self.assertStats(self.engineering, 1, 0, 1200, datetime.date(2022, 5, 1))
+
+    def test_delete(self):
+        first = make_employee(self.engineering, 1, salary=1000, hire_date=datetime.date(2020, 1, 1))
+        latest = make_employee(self.engineering, 2, salary=500, hire_date=datetime.date(2021, 1, 1))
+        latest.delete()
+        self.assertStats(self.engineering, 1, 1, 1000, datetime.date(2020, 1, 1))
+        first.delete()
+        self.assertStats(self.engineering, 0, 0, 0, None)
+
+    def test_move_between_departments(self):
+        employee = make_employee(self.engineering, 1, salary=1000, hire_date=datetime.date(2020, 1, 1))
+        make_employee(self.sales, 2, salary=300, hire_date=datetime.date(2019, 1, 1))
+        employee.department = self.sales
+        employee.save()
+        self.assertStats(self.engineering, 0, 0, 0, None)
+        self.assertStats(self.sales, 2, 2, 1300, datetime.date(2020, 1, 1))
+
+    def test_queryset_delete(self):
+        make_employee(self.engineering, 1, salary=1000)
+        make_employee(self.engineering, 2, salary=1000)
+        Employee.objects.filter(employee_id='EMP0001').delete()
+        self.assertStats(self.engineering, 1, 1, 1000, datetime.date(2020, 1, 1))
+
+    def test_rolled_back_write(self):
+        make_employee(self.engineering, 1, salary=1000)
+        with self.assertRaises(RuntimeError), transaction.atomic():
+            make_employee(self.engineering, 2, salary=1000)
+            raise RuntimeError
+        self.assertStats(self.engineering, 1, 1, 1000, datetime.date(2020, 1, 1))
+
+    def test_missing_stats_row_is_rebuilt(self):
+        make_employee(self.engineering, 1, salary=1000)
+        DepartmentStats.objects.filter(department=self.engineering).delete()
+        make_employee(self.engineering, 2, salary=500)
+        self.assertStats(self.engineering, 2, 2, 1500, datetime.date(2020, 1, 1))
+
+    def test_deleting_a_department(self):
+        make_employee(self.engineering, 1)
+        self.engineering.delete()
+        self.assertFalse(DepartmentStats.objects.filter(department_id=self.engineering.pk).exists())
+        self.assertEqual(check_department_stats(), [])
+
+    def test_bulk_import(self):
+        EmployeeImporter(update_existing=True).run([
+            {'employee_id': 'IMP1', 'first_name': 'A', 'last_name': 'B', 'email': 'imp1@example.com',
+             'phone_number': '+15550000000', 'date_of_birth': '1990-01-01', 'gender': 'F', 'address': 'X',
+             'department': 'Sales', 'position': 'Rep', 'salary': '700', 'hire_date': '2023-01-01'},
+        ])
+        self.assertStats(self.sales, 1, 1, 700, datetime.date(2023, 1, 1))
+
+    def test_dashboard_totals(self):
+        make_employee(self.engineering, 1, salary=1000)
+        make_employee(self.sales, 2, salary=500, status='inactive')
+        stats = get_dashboard_stats()
+        self.assertEqual((stats['total_employees'], stats['active_employees'], stats['avg_salary']), (2, 1, 750))
+        # the cached totals are dropped once the write commits
+        with self.captureOnCommitCallbacks(execute=True):
+            make_employee(self.sales, 3, salary=600)
+        self.assertEqual(get_dashboard_stats()['total_employees'], 3)
+
+
+class FlakyEventBroker(LocalEventBroker):
+    """Fails to publish the first event"""
+
+    def __init__(self):
+        super().__init__()
+        self.failed = False
+
+    def publish(self, user_id, event):
+        if not self.failed:
+            self.failed = True
+            raise ConnectionError('broker down')
+        super().publish(user_id, event)
+
+
+class EventBrokerTests(TestCase):
+    # each broker class gets the same publish / subscribe / replay checks
+    broker_class = LocalEventBroker
+
+    def setUp(self):
+        cache.clear()
+        self.broker = self.broker_class()
+
+    def publish(self, *statuses, user_id=1):
+        for status in statuses:
+            self.broker.publish(user_id, {'status': status})
+
+    async def test_publish_reaches_subscribers(self):
+        subscription = self.broker.subscribe(1)
+        other_user = self.broker.subscribe(2)
+        self.publish('sent')
+        self.assertEqual(await subscription.get(1), [(1, {'status': 'sent'})])
+        self.assertEqual(await other_user.get(0), [])
+        subscription.close()
+        other_user.close()
+
+    async def test_get_times_out(self):
+        subscription = self.broker.subscribe(1)
+        self.assertEqual(await subscription.get(0.01), [])
+        subscription.close()
+
+    async def test_new_subscription_replays_the_backlog(self):
+        self.publish('sent', 'failed')
+        subscription = self.broker.subscribe(1)
+        self.assertEqual(await subscription.get(0), [(1, {'status': 'sent'}), (2, {'status': 'failed'})])
+        subscription.close()
+
+    async def test_replay_after_last_event_id(self):
+        self.publish('a', 'b', 'c')
+        subscription = self.broker.subscribe(1, last_event_id=1)
+        self.assertEqual(await subscription.get(0), [(2, {'status': 'b'}), (3, {'status': 'c'})])
+        self.publish('d')
+        self.assertEqual(await subscription.get(1), [(4, {'status': 'd'})])
+        subscription.close()
+
+        subscription = self.broker.subscribe(1, last_event_id=4)
+        self.assertEqual(await subscription.get(0), [])
+        subscription.close()
+
+    @override_settings(MESSAGE_EVENTS_BACKLOG=-1)
+    async def test_expired_events_are_not_replayed(self):
+        self.publish('old')
+        subscription = self.broker.subscribe(1)
+        self.assertEqual(await subscription.get(0), [])
+        subscription.close()
+
+
+@override_settings(MESSAGE_EVENTS_POLL_INTERVAL=0.01)
+class CacheEventBrokerTests(EventBrokerTests):
+    broker_class = CacheEventBroker
+
+
+class DeliveryEventsTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user('sender', password='x')
+        cls.employee = make_employee(Department.objects.create(name='Engineering'), 1)
+
+    def setUp(self):
+        cache.clear()
+
+    def message(self, **fields):
+        return Message.objects.create(
+            sender=self.user, recipient=self.employee, message_type='email', content='Hi', **fields
+        )
+
+    async def collect(self, last_event_id=None):
+        return ''.join([chunk async for chunk in event_stream(self.user.pk, last_event_id, once=True)])
+
+    @override_settings(MESSAGE_EVENTS_BROKER='employees.events.LocalEventBroker')
+    async def test_event_stream(self):
+        get_event_broker().publish(self.user.pk, {'id': 7, 'status': 'sent'})
+        get_event_broker().publish(self.user.pk, {'id': 8, 'status': 'failed'})
+        body = await self.collect()
+        self.assertTrue(body.startswith('retry: 3000\n\n'))
+        self.assertIn('id: 1\nevent: status\ndata: {"id": 7, "status": "sent"}\n\n', body)
+        self.assertIn('id: 2\n', body)
+        body = await self.collect(last_event_id=2)
+        self.assertEqual(body, 'retry: 3000\n\n: keepalive\n\n')
+
+    @override_settings(MESSAGE_EVENTS_BROKER='employees.events.LocalEventBroker')
+    def test_view_replays_after_last_event_id(self):
+        sent, failed = self.message(is_sent=True), self.message(error_message='SMTP down')
+        publish_delivery(sent, failed)
+        self.client.force_login(self.user)
+        response = self.client.get(reverse('message_events'), headers={'Last-Event-ID': '1'})
+        self.assertEqual(response['Content-Type'], 'text/event-stream')
+        body = response.content.decode()
+        self.assertNotIn(f'"id": {sent.pk},', body)
+        self.assertIn(f'"id": {failed.pk}, "recipient": {self.employee.pk}, "message_type": "email", '
+                      f'"status": "failed", "error": "SMTP down"', body)
+
+    @override_settings(MESSAGE_EVENTS_BROKER='employees.tests.FlakyEventBroker')
+    def test_publish_delivery_carries_on_after_a_failure(self):
+        first, second = self.message(is_sent=True), self.message(is_sent=True)
+        with self.assertLogs('employees.events', 'WARNING'):
+            publish_delivery(first, second)
+        body = async_to_sync(self.collect)()
+        self.assertNotIn(f'"id": {first.pk},', body)
+        self.assertIn(f'"id": {second.pk},', body)
+
+    @override_settings(MESSAGE_EVENTS_BROKER='employees.events.LocalEventBroker', WEB_CONCURRENCY=2)
+    def test_local_broker_refused_with_several_workers(self):
+        with self.assertRaises(ImproperlyConfigured):
+            get_event_broker()
+
+
+class RefusingEmailBackend(LocMemEmailBackend):
+    """An SMTP server that refuses the connection"""
+
+    def open(self):
+        raise ConnectionRefusedError('Connection refused')
+
+
+@override_settings(MESSAGE_EVENTS_BROKER='employees.events.LocalEventBroker')
+class DeliverBatchTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user('sender', password='x')
+        cls.employee = make_employee(Department.objects.create(name='Engineering'), 1)
+
+    def setUp(self):
+        cache.clear()
+        self.messages = [
+            Message.objects.create(
+                sender=self.user, recipient=self.employee, message_type='email', subject='Hi', content='Hi'
+            )
+            for _ in range(2)
+        ]
+
+    async def collect(self):
+        return ''.join([chunk async for chunk in event_stream(self.user.pk, once=True)])
+
+    def test_sends_the_chunk(self):
+        deliver_batch([m.pk for m in self.messages])
+        self.assertEqual(len(mail.outbox), 2)
+        self.assertEqual(Message.objects.filter(is_sent=True).count(), 2)
+
+    @override_settings(EMAIL_BACKEND='employees.tests.RefusingEmailBackend')
+    def test_connection_failure_marks_the_chunk_failed(self):
+        with self.assertLogs('employees.messaging', 'WARNING'):
+            deliver_batch([m.pk for m in self.messages])
+        self.assertEqual(
+            list(Message.objects.values_list('is_sent', 'error_message')),
+            [(False, 'Connection refused')] * 2,
+        )
+        # and the sender's pages hear about both
+        body = async_to_sync(self.collect)()
+        self.assertEqual(body.count('"status": "failed"'), 2)
+
+
+class ExportTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        department = Department.objects.create(name='=HYPERLINK("http://example.com")')
+        cls.employee = make_employee(department, 1, first_name='@SUM(A1)', position='-2+3', salary=-5)
+        cls.user = User.objects.create_user('exporter', password='x')
+
+    def setUp(self):
+        self.client.force_login(self.user)
+
+    def export(self, export_format):
+        response = self.client.get(reverse('employee_export'), {'format': export_format})
+        return b''.join(response.streaming_content)
+
+    def test_csv_formulas_are_quoted(self):
+        header, row = csv.reader(io.StringIO(self.export('csv').decode()))
+        values = dict(zip(header, row))
+        self.assertEqual(values['First Name'], "'@SUM(A1)")
+        self.assertEqual(values['Phone Number'], "'+15550000000")
+        self.assertEqual(values['Department'], '\'=HYPERLINK("http://example.com")')
+        self.assertEqual(values['Position'], "'-2+3")
+        # numbers are not text, so they stay as they are
+        self.assertEqual(values['Salary'], '-5.00')
+
+    def test_xlsx_keeps_raw_text(self):
+        # inline strings are never evaluated, so there is nothing to quote
+        with zipfile.ZipFile(io.BytesIO(self.export('xlsx'))) as archive:
+            sheet = archive.read('xl/worksheets/sheet1.xml').decode()
+        self.assertIn('<t xml:space="preserve">@SUM(A1)</t>', sheet)
+        self.assertIn('<t xml:space="preserve">+15550000000</t>', sheet)
+        self.assertIn('<t xml:space="preserve">-2+3</t>', sheet)
+        self.assertIn('<c><v>-5.00</v></c>', sheet)
+
+    def test_json_is_unchanged(self):
+        self.assertIn(b'"First Name": "@SUM(A1)"', self.export('json'))
+
+    def test_importer_drops_the_quoting(self):
+        header, row = csv.reader(io.StringIO(self.export('csv').decode()))
+        values = normalize_row(dict(zip(header, row)))
+        self.assertEqual(
+            (values['first_name'], values['phone_number'], values['position']),
+            ('@SUM(A1)', '+15550000000', '-2+3'),
+        )
+        self.assertEqual(normalize_row({'address': "'quoted'"})['address'], "'quoted'")
+
+    def test_accepts_gzip(self):
+        factory = RequestFactory()
+        for header, accepted in [
+            ('', False),
+            ('gzip', True),
+            ('deflate, GZIP', True),
+            ('gzip;q=0', False),
+            ('gzip; q=0.0, deflate', False),
+            ('gzip;q=0.5', True),
+            ('*', True),
+            ('*;q=0', False),
+            ('*, gzip;q=0', False),
+            ('*;q=0, gzip', True),
+            ('gzip;q=nonsense', False),
+            ('x-gzip-like', False),
+        ]:
+            with self.subTest(header=header):
+                request = factory.get('/', headers={'Accept-Encoding': header})
+                self.assertIs(accepts_gzip(request), accepted)
+
+    def test_gzip_refused_with_q0(self):
+        url = reverse('employee_export')
+        response = self.client.get(url, {'format': 'csv'}, headers={'Accept-Encoding': 'gzip;q=0'})
+        self.assertNotIn('Content-Encoding', response)
+        response = self.client.get(url, {'format': 'csv'}, headers={'Accept-Encoding': 'gzip'})
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+
+
+@override_settings(QUERY_INSTRUMENTATION=True)
+class QueryInstrumentationTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user('viewer', password='x')
+        make_employee(Department.objects.create(name='Engineering'), 1)
+
+    def queries(self, response):
+        return int(response['Server-Timing'].split('desc="')[1].split()[0])
+
+    def test_sync_view(self):
+        self.client.force_login(self.user)
+        self.assertGreater(self.queries(self.client.get(reverse('employee_export'))), 0)
+
+    async def test_async_view_queries_run_on_the_sync_thread(self):
+        await self.async_client.aforce_login(self.user)
+        response = await self.async_client.get(reverse('employee_list'))
+        # the page's queries run in a worker thread, and are still counted
+        self.assertGreaterEqual(self.queries(response), 2)
+
+
+class MultiprocessMetricsTests(TestCase):
+    def setUp(self):
+        metrics.reset()
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.directory = directory.name
+        settings_override = override_settings(METRICS_MULTIPROCESS_DIR=self.directory)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+        # a worker that has exited, with one open stream when it last wrote
+        with open(os.path.join(self.directory, 'metrics-999999-1.json'), 'w') as f:
+            json.dump({'message_event_streams': [[[], 1]], 'messages': [[['email', 'sent'], 3]]}, f)
+
+    def test_dead_worker_keeps_counters_but_not_gauges(self):
+        self.assertIn('message_event_streams 1\n', metrics.render())
+        metrics.mark_process_dead(999999)
+        output = metrics.render()
+        self.assertNotIn('message_event_streams 1', output)
+        self.assertIn('messages_total{message_type="email",result="sent"} 3\n', output)
+
+    def test_clear_multiprocess_dir(self):
+        metrics.clear_multiprocess_dir()
+        self.assertEqual(os.listdir(self.directory), [])
+
+
+class BenchmarkSessionsTests(TestCase):
+    @override_settings(ALLOWED_HOSTS=['localhost'])
+    def test_leaves_the_real_cache_alone(self):
+        cache.set('employees:test:sentinel', 'kept')
+        out = io.StringIO()
+        call_command(
+            'benchmark_sessions', requests=2, engines=['cache', 'cached_db'], urls=['check_session'], stdout=out,
+        )
+        self.assertIn('cached_db', out.getvalue())
+        self.assertEqual(cache.get('employees:test:sentinel'), 'kept')
+        self.assertFalse(User.objects.filter(username='__session_benchmark__').exists())
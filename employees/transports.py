@@ -0,0 +1,207 @@
+"""
+WhatsApp transports.
+
+``get_whatsapp_transport()`` returns one process-wide transport, built on
+first use from ``settings.WHATSAPP_TRANSPORT`` (a dotted path, like
+EMAIL_BACKEND). The Twilio transport keeps a pooled keep-alive HTTP session,
+so repeated sends reuse TLS connections instead of handshaking every time.
+
+Transports may also offer ``asend()``, the same send as a coroutine, which
+the async delivery path (``employees.messaging.adeliver_message``) awaits
+instead of tying up a thread for the length of the HTTP call.
+"""
+import functools
+import threading
+import weakref
+
+from asgiref.sync import sync_to_async
+
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+from django.core.signals import setting_changed
+from django.dispatch import receiver
+from django.utils.module_loading import import_string
+
+from .runtime import call_on_shutdown, on_server_loop
+
+
+def whatsapp_address(phone_number):
+    # Format phone number - ensure it starts with +
+    if not phone_number.startswith('+'):
+        phone_number = '+' + phone_number
+    return f'whatsapp:{phone_number}'
+
+
+@functools.cache
+def _async_http_client_class():
+    from twilio.http.async_http_client import AsyncTwilioHttpClient
+
+    class TimeoutAsyncTwilioHttpClient(AsyncTwilioHttpClient):
+        """
+        AsyncTwilioHttpClient always passes its (usually None) per-request
+        timeout to aiohttp, which overrides the session's timeout with none
+        at all; fall back to the client's own
+        """
+
+        async def request(self, method, url, *args, timeout=None, **kwargs):
+            return await super().request(method, url, *args, timeout=timeout or self.timeout, **kwargs)
+
+    return TimeoutAsyncTwilioHttpClient
+
+
+class TwilioWhatsAppTransport:
+    """
+    Sends through a ``twilio.rest.Client`` per thread, all on one pooled
+    ``requests.Session``.
+
+    Only connection failures and 429/503 responses are retried (with
+    exponential backoff), since those are the cases where Twilio has not
+    accepted the message; retrying anything else could send it twice.
+    """
+    provider = 'twilio'
+
+    def __init__(self):
+        try:
+            import twilio.rest  # noqa: F401
+        except ImportError:
+            raise ImproperlyConfigured("Twilio library not installed. Install with: pip install twilio")
+        from requests import Session
+        from requests.adapters import HTTPAdapter
+        from urllib3.util.retry import Retry
+
+        account_sid = getattr(settings, 'TWILIO_ACCOUNT_SID', None)
+        auth_token = getattr(settings, 'TWILIO_AUTH_TOKEN', None)
+        self.from_number = getattr(settings, 'TWILIO_WHATSAPP_NUMBER', None)
+        if not all([account_sid, auth_token, self.from_number]):
+            raise ImproperlyConfigured("Twilio credentials not configured in settings")
+
+        retries = getattr(settings, 'WHATSAPP_MAX_RETRIES', 3)
+        self.session = Session()
+        self.session.mount('https://', HTTPAdapter(
+            pool_maxsize=getattr(settings, 'WHATSAPP_POOL_SIZE', 16),
+            max_retries=Retry(
+                total=retries, connect=retries, read=0, status=retries,
+                status_forcelist=(429, 503),
+                allowed_methods=None,
+                backoff_factor=getattr(settings, 'WHATSAPP_RETRY_BACKOFF', 0.5),
+                respect_retry_after_header=True,
+                raise_on_status=False,
+            ),
+        ))
+        self.timeout = getattr(settings, 'WHATSAPP_TIMEOUT', 10)
+        self.account_sid, self.auth_token = account_sid, auth_token
+        self._local = threading.local()
+        # aiohttp sessions belong to the event loop that created them
+        self._async_clients = weakref.WeakKeyDictionary()
+
+    @property
+    def client(self):
+        """This thread's Twilio client, on the shared pooled session"""
+        client = getattr(self._local, 'client', None)
+        if client is None:
+            from twilio.http.http_client import TwilioHttpClient
+            from twilio.rest import Client
+
+            # TwilioHttpClient.request() returns the response through an
+            # instance attribute, so concurrent sends (deliver_batch) must not
+            # share one; they share its session, and so the connection pool
+            http_client = TwilioHttpClient(pool_connections=False, timeout=self.timeout)
+            http_client.session = self.session
+            client = self._local.client = Client(self.account_sid, self.auth_token, http_client=http_client)
+        return client
+
+    def _async_client(self):
+        """The Twilio client for the server's event loop, on an aiohttp session with the same pool and retry rules"""
+        import asyncio
+
+        import aiohttp
+        from aiohttp_retry import ExponentialRetry, RetryClient
+        from twilio.rest import Client
+
+        loop = asyncio.get_running_loop()
+        client = self._async_clients.get(loop)
+        if client is None:
+            retries = getattr(settings, 'WHATSAPP_MAX_RETRIES', 3)
+            http_client = _async_http_client_class()(pool_connections=False, timeout=self.timeout)
+            http_client.session = RetryClient(
+                client_session=aiohttp.ClientSession(
+                    connector=aiohttp.TCPConnector(limit=getattr(settings, 'WHATSAPP_POOL_SIZE', 16)),
+                    timeout=aiohttp.ClientTimeout(total=self.timeout),
+                ),
+                retry_options=ExponentialRetry(
+                    attempts=retries + 1,
+                    start_timeout=getattr(settings, 'WHATSAPP_RETRY_BACKOFF', 0.5),
+                    statuses={429, 503},
+                    exceptions={aiohttp.ClientConnectorError},
+                    retry_all_server_errors=False,
+                ),
+            )
+            call_on_shutdown(http_client.session.close)
+            client = Client(self.account_sid, self.auth_token, http_client=http_client)
+            self._async_clients[loop] = client
+        return client
+
+    def send(self, phone_number, body):
+        """Send a message and return its provider id; raises on failure"""
+        message = self.client.messages.create(
+            body=body,
+            from_=f'whatsapp:{self.from_number}',
+            to=whatsapp_address(phone_number),
+        )
+        return message.sid
+
+    async def asend(self, phone_number, body):
+        """``send()`` on the running event loop"""
+        if not on_server_loop():
+            # A throwaway loop (async view under WSGI): an aiohttp session
+            # here would never be reused or closed, so use the pooled one
+            return await sync_to_async(self.send, thread_sensitive=False)(phone_number, body)
+        message = await self._async_client().messages.create_async(
+            body=body,
+            from_=f'whatsapp:{self.from_number}',
+            to=whatsapp_address(phone_number),
+        )
+        return message.sid
+
+
+class FakeWhatsAppTransport:
+    """Keeps sent messages in ``outbox`` instead of calling Twilio (tests, local dev)"""
+    provider = 'fake'
+
+    def __init__(self):
+        self.outbox = []
+        self._lock = threading.Lock()
+
+    def send(self, phone_number, body):
+        with self._lock:
+            self.outbox.append({'to': whatsapp_address(phone_number), 'body': body})
+            return f'FAKE{len(self.outbox):08d}'
+
+    async def asend(self, phone_number, body):
+        return self.send(phone_number, body)
+
+
+_transport = None
+_transport_lock = threading.Lock()
+
+
+def get_whatsapp_transport():
+    global _transport
+    if _transport is None:
+        with _transport_lock:
+            if _transport is None:
+                path = getattr(settings, 'WHATSAPP_TRANSPORT', 'employees.transports.TwilioWhatsAppTransport')
+                _transport = import_string(path)()
+    return _transport
+
+
+def reset_whatsapp_transport():
+    global _transport
+    with _transport_lock:
+        _transport = None
+
+
+@receiver(setting_changed)
+def _reset_on_setting_change(sender, setting, **kwargs):
+    if setting.startswith('WHATSAPP_') or setting.startswith('TWILIO_'):
+        reset_whatsapp_transport()
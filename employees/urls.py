@@ -7,6 +7,9 @@ urlpatterns = [
     path('register/', views.user_register, name='register'),
     path('logout/', views.user_logout, name='logout'),
 
+    # Prometheus metrics
+    path('metrics', views.metrics_view, name='metrics'),
+
     # Session check URL
     path('check-session/', views.check_session, name='check_session'),
     
@@ -15,6 +18,8 @@ urlpatterns = [
 
     # Employee URLS
     path('employees/', views.employee_list, name='employee_list'),
+    path('employees/import/', views.employee_import, name='employee_import'),
+    path('employees/export/', views.employee_export, name='employee_export'),
     path('employees/<int:pk>/', views.employee_detail, name='employee_detail'),
     path('employees/add/', views.employee_create, name='employee_create'),
     path('employees/<int:pk>/edit/', views.employee_update, name='employee_update'),
@@ -25,11 +30,22 @@ urlpatterns = [
     path('departments/add/', views.department_create, name='department_create'),
     path('departments/<int:pk>/edit/', views.department_update, name='department_update'),
 
+    # Recipient picker API
+    path('api/recipients/', views.recipient_autocomplete, name='recipient_autocomplete'),
+
+    # Analytics API (JSON for charts)
+    path('api/analytics/', views.analytics_api, name='analytics_api'),
+    path('api/headcount/', views.headcount_api, name='headcount_api'),
+
     # Messaging Urls
     path('messaging/', views.messaging_dashboard, name='messaging_dashboard'),
     path('messaging/send-email/', views.send_email, name='send_email'), 
     path('messaging/send-email/<int:employee_id>/', views.send_email, name='send_email_to'), 
     path('messaging/send-whatsapp/', views.send_whatsapp, name='send_whatsapp'),
     path('messaging/send-whatsapp/<int:employee_id>/', views.send_whatsapp, name='send_whatsapp_to'),
+    path('messaging/usage/', views.message_usage, name='message_usage'),
+    path('messaging/broadcast/', views.broadcast_message, name='broadcast_message'),
+    path('messaging/events/', views.message_events, name='message_events'),
+    path('messaging/export/', views.message_export, name='message_export'),
     path('messaging/history/<int:employee_id>/', views.message_history, name='message_history'),
 ]
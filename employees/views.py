@@ -1,21 +1,51 @@
-from django.shortcuts import render, get_object_or_404, redirect
+from django.shortcuts import render, get_object_or_404, aget_object_or_404, redirect
+from django.db import transaction
 from django.contrib import messages
-from django.db.models import Count, Avg
-from django.http import JsonResponse, HttpResponse
-from django.core.paginator import Paginator
+from django.http import JsonResponse, HttpResponse, StreamingHttpResponse
+from django.core.handlers.asgi import ASGIRequest
 from .models import Employee, Department, Message
-from .forms import EmployeeForm, DepartmentForm, EmailMessageForm, WhatsAppMessageForm
+from .forms import EmployeeForm, DepartmentForm, EmailMessageForm, WhatsAppMessageForm, BroadcastMessageForm, EmployeeImportForm
+from .stats import aget_dashboard_stats, departments_with_stats
+from .analytics import employee_analytics
+from .fragments import bump_fragment_version
+from .history import MAX_SERIES_DAYS, STATUSES, headcount_series
+from .filters import filter_employees
+from .pagination import KeysetPaginator
+from .exports import EMPLOYEE_COLUMNS, MESSAGE_COLUMNS, EXPORT_FORMATS, export_response
+from .imports import EmployeeImporter, ImportFormatError, detect_format
+from .ratelimit import message_rate_limiter
+from .recipients import aactive_recipients, autocomplete_recipients
+from .middleware import allow_private_cache, query_budget
+from . import metrics
+from .events import event_stream
+from .messaging import aenqueue_message, enqueue_broadcast
 from django.contrib.auth import authenticate, login, logout
 from django.contrib.auth.decorators import login_required
 from django.contrib.auth.forms import UserCreationForm, AuthenticationForm
-from django.core.mail import send_mail
 from django.conf import settings
 from django.views.decorators.csrf import csrf_exempt
 from django.views.decorators.cache import never_cache
 from django.utils.decorators import method_decorator
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.http import quote_etag
+from django.utils.crypto import constant_time_compare
+from asgiref.sync import sync_to_async
 
+import datetime
+import hashlib
 import json
-import requests
+
+
+async def arender(request, template_name, context=None, status=None):
+    """
+    render() for async views. Templates read request.user, and evaluate the
+    querysets inside {% versioned_cache %} blocks on a cache miss, so the
+    render runs on the request's sync thread.
+    """
+    # request.auser() (used by login_required) and request.user cache the
+    # user separately; give the template the one already loaded
+    request.user = await request.auser()
+    return await sync_to_async(render)(request, template_name, context, status=status)
 
 
 @never_cache
@@ -78,79 +108,89 @@ def user_logout(request):
 # Create your views here.
 @never_cache
 @login_required
-def dashboard(request):
+@query_budget(6)
+async def dashboard(request):
     """Main dashboard view"""
-    total_employees = Employee.objects.count()
-    active_employees = Employee.objects.filter(status='active').count()
-    total_departments = Department.objects.count()
-    avg_salary = Employee.objects.aggregate(avg_salary=Avg('salary'))['avg_salary'] or 0
-
-    # employee count department wise
-    dept_stats = Department.objects.annotate(
-        employee_count=Count('employees')
-    ). order_by('-employee_count')[:5]
+    # Counters come from the cache and are kept current by signals
+    stats = await aget_dashboard_stats()
 
     # Recent employee
-    recent_employees = Employee.objects.filter(status='active').order_by('-created_at')[:5]
+    recent_employees = Employee.objects.select_related('department').filter(
+        status='active'
+    ).order_by('-created_at')[:5]
 
     context = {
-        'total_employees': total_employees,
-        'active_employees': active_employees,
-        'total_departments': total_departments,
-        'avg_salary': round(avg_salary, 2),
-        'dept_stats': dept_stats,
+        'total_employees': stats['total_employees'],
+        'active_employees': stats['active_employees'],
+        'total_departments': stats['total_departments'],
+        'avg_salary': round(stats['avg_salary'], 2),
+        'dept_stats': stats['dept_stats'],
         'recent_employees': recent_employees,
-        'user': request.user,
+        'user': await request.auser(),
     }
 
-    return render(request, 'employees/dashboard.html', context)
+    return await arender(request, 'employees/dashboard.html', context)
 
 @never_cache
 @login_required
-def employee_list(request):
+@query_budget(6)
+async def employee_list(request):
     """List all employees with search and filter"""
-    employees = Employee.objects.select_related('department').all()
-
-    # Search
+    # search, department and status filters (the search backend may query
+    # while building its filter)
+    employees = await sync_to_async(filter_employees)(Employee.objects.select_related('department'), request.GET)
     search_query = request.GET.get('search')
-    if search_query:
-        employees = employees.filter(first_name__icontains=search_query) | employees.filter(last_name__icontains=search_query) |employees.filter(employee_id__icontains=search_query) #|employees.filter(address__icontains=search_query)#
-
-    # Filter department
     dept_filter = request.GET.get('department')
-    if dept_filter:
-        employees = employees.filter(department_id=dept_filter)
-
-    # filter by status
     status_filter = request.GET.get('status')
-    if status_filter:
-        employees = employees.filter(status=status_filter)
-    
-    # pagination
-    paginator = Paginator(employees, 5)
-    page_number = request.GET.get('page')
-    page_obj = paginator.get_page(page_number)
+
+    # keyset pagination on the model ordering, with id as the tie-breaker
+    paginator = KeysetPaginator(
+        employees,
+        ordering=['first_name', 'last_name', 'id'],
+        per_page=settings.EMPLOYEE_LIST_PAGE_SIZE,
+        count=settings.PAGINATION_COUNT_MODE,
+    )
+    page_obj = await paginator.aget_page(request.GET.get('cursor'))
+
+    # filters to carry over into the next/previous links
+    filter_params = request.GET.copy()
+    filter_params.pop('cursor', None)
 
     departments = Department.objects.all()
 
     context = {
         'page_obj': page_obj,
+        'filter_query': filter_params.urlencode(),
         'departments': departments,
         'search_query': search_query,
         'dept_filter': dept_filter,
         'status_filter': status_filter,
     }
-    return render(request, 'employees/employee_list.html', context)
+    return await arender(request, 'employees/employee_list.html', context)
+
+@never_cache
+@login_required
+def employee_export(request):
+    """Stream the filtered employee list as CSV, JSON or XLSX"""
+    export_format = request.GET.get('format', 'csv')
+    if export_format not in EXPORT_FORMATS:
+        return HttpResponse(status=400)
+    employees = filter_employees(Employee.objects.all(), request.GET)
+    return export_response(
+        request, employees.order_by('first_name', 'last_name', 'id'),
+        EMPLOYEE_COLUMNS, 'employees', export_format
+    )
 
 @never_cache
 @login_required
-def employee_detail(request, pk):
+async def employee_detail(request, pk):
     """Employee Details"""
-    employee = get_object_or_404(Employee, pk=pk)
-    return render(request, 'employees/employee_detail.html', {'employee':employee})
+    employee = await aget_object_or_404(Employee.objects.select_related('department'), pk=pk)
+    return await arender(request, 'employees/employee_detail.html', {'employee':employee})
 
 @never_cache
 @login_required
+@transaction.atomic
 def employee_create(request):
     """Create new employee"""
     if request.method == 'POST':
@@ -169,6 +209,43 @@ def employee_create(request):
 
 @never_cache
 @login_required
+def employee_import(request):
+    """Bulk import employees from an uploaded CSV / JSON file"""
+    result = None
+    if request.method == 'POST':
+        form = EmployeeImportForm(request.POST, request.FILES)
+        if form.is_valid():
+            upload = form.cleaned_data['file']
+            try:
+                importer = EmployeeImporter(
+                    update_existing=form.cleaned_data['update_existing'],
+                    create_departments=form.cleaned_data['create_departments'],
+                    dry_run=form.cleaned_data['dry_run'],
+                )
+                result = importer.import_file(
+                    upload, detect_format(upload.name), max_rows=settings.EMPLOYEE_IMPORT_MAX_ROWS
+                )
+            except ImportFormatError as e:
+                form.add_error('file', str(e))
+            else:
+                if result.created or result.updated:
+                    verb = 'would be' if result.dry_run else 'were'
+                    messages.success(
+                        request, f'{result.created} employees {verb} created and {result.updated} updated.'
+                    )
+    else:
+        form = EmployeeImportForm()
+
+    return render(request, 'employees/employee_import.html', {
+        'form': form,
+        'result': result,
+        'row_errors': result.errors[:settings.EMPLOYEE_IMPORT_ERRORS_SHOWN] if result else [],
+        'max_rows': f'{settings.EMPLOYEE_IMPORT_MAX_ROWS:,}',
+    })
+
+@never_cache
+@login_required
+@transaction.atomic
 def employee_update(request, pk):
     """ Upadate Employee"""
     employee = get_object_or_404(Employee, pk=pk)
@@ -189,6 +266,7 @@ def employee_update(request, pk):
 
 @never_cache
 @login_required
+@transaction.atomic
 def employee_delete(request, pk):
     """ Delete employee"""
     employee = get_object_or_404(Employee, pk=pk)
@@ -200,13 +278,12 @@ def employee_delete(request, pk):
 
 @never_cache
 @login_required
-def department_list(request):
+async def department_list(request):
     """List all Department"""
-    departments = Department.objects.annotate(
-        employee_count = Count('employees')
-    ).order_by('name')
+    # headcounts come from DepartmentStats, not a COUNT over every employee
+    departments = departments_with_stats().order_by('name')
 
-    return render(request, 'employees/department_list.html', {'departments': departments})
+    return await arender(request, 'employees/department_list.html', {'departments': departments})
 
 @never_cache
 @login_required
@@ -247,49 +324,69 @@ def department_update(request,pk):
 
 @never_cache
 @login_required
-def messaging_dashboard(request):
-    employees = Employee.objects.filter(status='active')
+@query_budget(4)
+async def messaging_dashboard(request):
+    user = await request.auser()
+    # first few recipients; the search box loads the rest on demand
+    employees = (await aactive_recipients())[:settings.MESSAGING_DASHBOARD_RECIPIENTS]
     # last 5 messages, newest first
-    recent_messages = Message.objects.filter(sender=request.user).order_by('-sent_at')[:5]
+    recent_messages = Message.objects.select_related('recipient').filter(
+        sender=user
+    ).order_by('-sent_at')[:5]
 
     context = {
         'employees': employees,
         'recent_messages': recent_messages,
+        'rate_limit': await message_rate_limiter().ausage(user.pk),
     }
-    return render(request, 'messaging/messaging_dashboard.html', context)
+    return await arender(request, 'messaging/messaging_dashboard.html', context)
 
-try:
-    from twilio.rest import Client
-    TWILIO_AVAILABLE = True
-except ImportError:
-    TWILIO_AVAILABLE = False
+def rate_limited(request, rate_limit):
+    """429 page for a user who has used up their message allowance"""
+    response = render(request, 'messaging/rate_limited.html', {'rate_limit': rate_limit}, status=429)
+    response['Retry-After'] = str(rate_limit.retry_after)
+    return response
 
 @never_cache
 @login_required
-def send_email(request, employee_id=None):
+async def message_usage(request):
+    """Current user's message rate-limit usage"""
+    user = await request.auser()
+    usage = await message_rate_limiter().ausage(user.pk)
+    return JsonResponse({
+        'used': usage.used,
+        'limit': usage.limit,
+        'remaining': usage.remaining,
+        'retry_after': usage.retry_after,
+    })
+
+@never_cache
+@login_required
+async def send_email(request, employee_id=None):
     """Send email to employee with improved error handling"""
     try:
         employee = None
         if employee_id:
-            employee = get_object_or_404(Employee, id=employee_id)
+            employee = await aget_object_or_404(Employee, id=employee_id)
         
         if request.method == 'POST':
             form = EmailMessageForm(request.POST)
-            if form.is_valid():
-                recipient_id = form.cleaned_data['recipient']
+            # cleaning the recipient looks the employee up
+            if await sync_to_async(form.is_valid)():
+                # the form has already looked the employee up
+                recipient = form.cleaned_data['recipient']
                 subject = form.cleaned_data['subject']
                 content = form.cleaned_data['content']
 
-                try:
-                    recipient = Employee.objects.get(id=recipient_id)
-                except Employee.DoesNotExist:
-                    messages.error(request, 'Selected employee not found.')
-                    return redirect('messaging_dashboard')
+                user = await request.auser()
+                rate_limit = await message_rate_limiter().ahit(user.pk)
+                if not rate_limit.allowed:
+                    return await sync_to_async(rate_limited)(request, rate_limit)
 
                 # Create message record
                 try:
-                    msg_record = Message.objects.create(
-                        sender=request.user,
+                    msg_record = await Message.objects.acreate(
+                        sender=user,
                         recipient=recipient,
                         message_type='email',
                         subject=subject,
@@ -300,29 +397,10 @@ def send_email(request, employee_id=None):
                     messages.error(request, f'Error creating message record: {str(e)}')
                     return redirect('messaging_dashboard')
 
-                # Try to send email
-                try:
-                    result = send_mail(
-                        subject=subject,
-                        message=content,
-                        from_email=getattr(settings, 'EMAIL_HOST_USER', 'noreply@example.com'),
-                        recipient_list=[recipient.email],
-                        fail_silently=False,
-                    )
-
-                    if result == 1:
-                        msg_record.is_sent = True
-                        messages.success(request, f'Email sent successfully to {recipient.full_name}!')
-                    else:
-                        msg_record.error_message = "SMTP server did not accept the email."
-                        messages.error(request, f"Failed to send email to {recipient.full_name}.")
-                    msg_record.save()
+                # Hand the message to the delivery queue
+                await aenqueue_message(msg_record)
+                messages.success(request, f'Email to {recipient.full_name} queued for delivery.')
 
-                except Exception as e:
-                    msg_record.error_message = str(e)
-                    msg_record.save()
-                    messages.error(request, f'Failed to send email: {str(e)}')
-                
                 return redirect('messaging_dashboard')
             else:
                 messages.error(request, 'Please correct the form errors.')
@@ -336,7 +414,7 @@ def send_email(request, employee_id=None):
             'form': form,
             'selected_employee': employee
         }
-        return render(request, 'messaging/send_email.html', context)
+        return await arender(request, 'messaging/send_email.html', context)
         
     except Exception as e:
         messages.error(request, f'An unexpected error occurred: {str(e)}')
@@ -345,123 +423,249 @@ def send_email(request, employee_id=None):
 
 @never_cache
 @login_required
-def send_whatsapp(request, employee_id=None):
+async def send_whatsapp(request, employee_id=None):
     """Send Whatsapp message to employee"""
     employee = None
     if employee_id:
-        employee = get_object_or_404(Employee, id=employee_id)
+        employee = await aget_object_or_404(Employee, id=employee_id)
 
     if request.method == 'POST':
         form = WhatsAppMessageForm(request.POST)
-        if form.is_valid():
-            recipient_id = form.cleaned_data['recipient']
+        # cleaning the recipient looks the employee up
+        if await sync_to_async(form.is_valid)():
+            recipient = form.cleaned_data['recipient']
             content = form.cleaned_data['content']
 
-            recipient = get_object_or_404(Employee, id=recipient_id)
-
             if not recipient.phone_number:
                 messages.error(request, f'{recipient.full_name} does not have a WhatsApp number configured.')
                 return redirect('messaging_dashboard')
             
+            user = await request.auser()
+            rate_limit = await message_rate_limiter().ahit(user.pk)
+            if not rate_limit.allowed:
+                return await sync_to_async(rate_limited)(request, rate_limit)
+
             # Create message Record
-            msg_record = Message.objects.create(
-                sender=request.user,
+            msg_record = await Message.objects.acreate(
+                sender=user,
                 recipient=recipient,
                 message_type='whatsapp',
                 content=content
             )
 
-            try:
-                # Send WhatsApp message using Twilio.
-                success = send_whatsapp_message(recipient.phone_number, content)
-
-                if success:
-                    msg_record.is_sent = True
-                    msg_record.save()
-                    messages.success(request, f'WhatsApp message sent successfully to {recipient.full_name}!')
-                else:
-                    raise Exception("Failed to send WhatsApp message")
-                
-            except Exception as e:
-                msg_record.error_message = str(e)
-                msg_record.save()
-                messages.error(request, f'Failed to send WhatsApp message: {str(e)}')
-            
+            # Hand the message to the delivery queue
+            await aenqueue_message(msg_record)
+            messages.success(request, f'WhatsApp message to {recipient.full_name} queued for delivery.')
+
             return redirect('messaging_dashboard')
     else:
         initial_data = {'recipient': employee.id} if employee else {}
-        form = WhatsAppMessageForm(initial_data)
+        form = WhatsAppMessageForm(initial=initial_data)
 
-    employees = Employee.objects.filter(status='active', phone_number__isnull=False)
-    return render(request, 'messaging/send_whatsapp.html', {
+    return await arender(request, 'messaging/send_whatsapp.html', {
         'form' : form,
-        'employees' : employees,
         'selected_employee' : employee
     })
 
-def send_whatsapp_message(phone_number, message_content):
-    """Helper function to send whatsapp message via twilio"""
-    if not TWILIO_AVAILABLE:
-        print("Twilio library not installed. Install with: pip install twilio")
-        return False
-
-
-    try:
-        # Get Twilio credentials from settings
-        account_sid = getattr(settings, 'TWILIO_ACCOUNT_SID', None)
-        auth_token = getattr(settings, 'TWILIO_AUTH_TOKEN', None)
-        twilio_whatsapp_number = getattr(settings, 'TWILIO_WHATSAPP_NUMBER', None)
-
-        if not all([account_sid, auth_token, twilio_whatsapp_number]):
-            print("Twilio credentials not configured in settings")
-            return False
-
-        client = Client(account_sid, auth_token)
-
-        # Format phone number - ensure it starts with +
-        if not phone_number.startswith('+'):
-            phone_number = '+' + phone_number
-
-        message = client.messages.create(
-            body=message_content,
-            from_=f'whatsapp:{twilio_whatsapp_number}',
-            to=f'whatsapp:{phone_number}'
-        )
+@never_cache
+@login_required
+def broadcast_message(request):
+    """Send one message to every employee matching a filter"""
+    recipient_count = None
+    if request.method == 'POST':
+        form = BroadcastMessageForm(request.POST)
+        if form.is_valid():
+            data = form.cleaned_data
+            recipients = filter_employees(Employee.objects.all(), data)
+            if data['message_type'] == 'whatsapp':
+                recipients = recipients.exclude(phone_number='')
+
+            # Every recipient counts against the sender's hourly limit
+            recipient_count = recipients.count()
+            if recipient_count:
+                rate_limit = message_rate_limiter().hit(request.user.pk, cost=recipient_count)
+                if not rate_limit.allowed:
+                    return rate_limited(request, rate_limit)
+
+            # One INSERT per batch instead of one per recipient
+            msg_records = Message.objects.bulk_create(
+                (
+                    Message(
+                        sender=request.user,
+                        recipient_id=recipient_id,
+                        message_type=data['message_type'],
+                        subject=data['subject'] or None,
+                        content=data['content'],
+                    )
+                    for recipient_id in recipients.values_list('id', flat=True).iterator(chunk_size=2000)
+                ),
+                batch_size=1000,
+            )
+            if not msg_records:
+                messages.error(request, 'No employees match that filter.')
+            else:
+                # bulk_create skips the model signals
+                bump_fragment_version('message')
+                enqueue_broadcast([msg_record.pk for msg_record in msg_records])
+                messages.success(request, f'Broadcast queued for {len(msg_records)} employees.')
+                return redirect('messaging_dashboard')
+        else:
+            messages.error(request, 'Please correct the form errors.')
+    else:
+        # Pre-fill from employee_list's filters ("message these employees")
+        initial = {'status': 'active'}
+        initial.update({key: request.GET[key] for key in ('department', 'status', 'search') if key in request.GET})
+        form = BroadcastMessageForm(initial=initial)
+        recipient_count = filter_employees(Employee.objects.all(), initial).count()
 
-        print(f"WhatsApp message sent successfully. SID: {message.sid}")
-        return True
-        
-    except Exception as e:
-        print(f"WhatsApp send error: {e}")
-        return False
+    return render(request, 'messaging/send_broadcast.html', {
+        'form': form,
+        'recipient_count': recipient_count,
+    })
 
 @never_cache
 @login_required
-def message_history(request, employee_id):
+@query_budget(5)
+async def message_history(request, employee_id):
     """View message history for specific employee"""
 
-    employee = get_object_or_404(Employee, id=employee_id)
+    employee = await aget_object_or_404(Employee, id=employee_id)
     messages_sent = Message.objects.filter(
-        sender=request.user,
+        sender=await request.auser(),
         recipient=employee
-    ).order_by('-sent_at')  # newest first
+    )
+
+    # newest first
+    paginator = KeysetPaginator(
+        messages_sent,
+        ordering=['-sent_at', '-id'],
+        per_page=settings.MESSAGE_HISTORY_PAGE_SIZE,
+        count=settings.PAGINATION_COUNT_MODE,
+    )
+    page_obj = await paginator.aget_page(request.GET.get('cursor'))
 
     context = {
         'employee': employee,
-        'message_list': messages_sent,
+        'message_list': page_obj,
+        'page_obj': page_obj,
     }
-    return render(request, 'messaging/message_history.html', context)
+    return await arender(request, 'messaging/message_history.html', context)
+
+@never_cache
+@login_required
+def message_export(request):
+    """Stream the messages the current user has sent as CSV, JSON or XLSX"""
+    export_format = request.GET.get('format', 'csv')
+    if export_format not in EXPORT_FORMATS:
+        return HttpResponse(status=400)
+    messages_sent = Message.objects.filter(sender=request.user)
+    employee_id = request.GET.get('employee')
+    if employee_id:
+        messages_sent = messages_sent.filter(recipient_id=employee_id)
+    return export_response(
+        request, messages_sent.order_by('-sent_at', '-id'),
+        MESSAGE_COLUMNS, 'messages', export_format
+    )
+
+@never_cache
+@login_required
+async def message_events(request):
+    """Delivery status of the current user's messages, as Server-Sent Events"""
+    user = await request.auser()
+    try:
+        last_event_id = int(request.headers['Last-Event-ID'])
+    except (KeyError, ValueError):
+        last_event_id = None
+    if isinstance(request, ASGIRequest):
+        response = StreamingHttpResponse(event_stream(user.pk, last_event_id), content_type='text/event-stream')
+    else:
+        # Under WSGI a stream (or any wait) would hold a worker: answer at once
+        # with what is there and let EventSource reconnect after ``retry``
+        stream = event_stream(user.pk, last_event_id, once=True)
+        response = HttpResponse(''.join([chunk async for chunk in stream]), content_type='text/event-stream')
+    response['X-Accel-Buffering'] = 'no'
+    return response
 
 @never_cache
 @login_required
-def send_mail_view(request):
+async def send_mail_view(request):
     """Alternative send email view"""
-    return send_email(request)
+    return await send_email(request)
+
+
+@allow_private_cache
+@login_required
+def recipient_autocomplete(request):
+    """JSON prefix search over active employees for the recipient picker"""
+    query = request.GET.get('q', '')
+    try:
+        limit = min(max(int(request.GET.get('limit', 10)), 1), 50)
+    except ValueError:
+        limit = 10
+    whatsapp = request.GET.get('channel') == 'whatsapp'
+
+    body = json.dumps({'results': autocomplete_recipients(query, limit, whatsapp)})
+    etag = quote_etag(hashlib.md5(body.encode(), usedforsecurity=False).hexdigest())
+
+    # The browser may keep a private copy but must revalidate it every time
+    response = get_conditional_response(request, etag=etag)
+    if response is None:
+        response = HttpResponse(body, content_type='application/json')
+    response['ETag'] = etag
+    patch_cache_control(response, private=True, no_cache=True)
+    return response
+
+
+@never_cache
+@login_required
+def analytics_api(request):
+    """Salary, tenure and age statistics for the filtered employees, as JSON"""
+    return JsonResponse(employee_analytics(request.GET))
 
 
 @never_cache
-def check_session(request):
+@login_required
+def headcount_api(request):
+    """Daily headcount and payroll between ?start= and ?end= (default: the last year), as JSON"""
+    try:
+        end = datetime.date.fromisoformat(request.GET['end']) if request.GET.get('end') else datetime.date.today()
+        start = (
+            datetime.date.fromisoformat(request.GET['start']) if request.GET.get('start')
+            else end - datetime.timedelta(days=364)
+        )
+        department = int(request.GET['department']) if request.GET.get('department') else None
+    except ValueError:
+        return JsonResponse({'error': 'start and end must be YYYY-MM-DD dates and department an id'}, status=400)
+    if not 0 <= (end - start).days < MAX_SERIES_DAYS:
+        return JsonResponse({'error': f'start must be before end and at most {MAX_SERIES_DAYS} days apart'}, status=400)
+    status = request.GET.get('status', 'active')
+    if status not in STATUSES:
+        return JsonResponse({'error': f'status must be one of {", ".join(STATUSES)}'}, status=400)
+    return JsonResponse({
+        'start': start.isoformat(),
+        'end': end.isoformat(),
+        'department': department,
+        'status': status,
+        'series': headcount_series(start, end, department, status),
+    })
+
+
+@never_cache
+async def check_session(request):
     """Check if user session is still valid"""
+    user = await request.auser()
     return JsonResponse({
-        'authenticated': request.user.is_authenticated
-    })
\ No newline at end of file
+        'authenticated': user.is_authenticated
+    })
+
+@never_cache
+def metrics_view(request):
+    """Prometheus scrape endpoint"""
+    token = getattr(settings, 'METRICS_TOKEN', None)
+    if token:
+        authorized = constant_time_compare(request.headers.get('Authorization', ''), f'Bearer {token}')
+    else:
+        authorized = request.user.is_authenticated and request.user.is_staff
+    if not authorized:
+        return HttpResponse(status=403)
+    return HttpResponse(metrics.render(), content_type='text/plain; version=0.0.4; charset=utf-8')
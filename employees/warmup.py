@@ -0,0 +1,60 @@
+"""
+Worker start-up warm-up.
+
+``warm_up()`` runs from wsgi.py / asgi.py once the application is built.
+It compiles every template under employees/templates (and the project
+DIRS) into the cached template loader, so the first request a worker
+serves doesn't pay for parsing base.html and the page templates. With
+``gunicorn --preload`` it runs once in the master and the workers inherit
+the compiled templates.
+"""
+import logging
+import os
+import time
+
+from django.apps import apps
+from django.conf import settings
+from django.template import TemplateDoesNotExist, TemplateSyntaxError, engines
+from django.urls import get_resolver
+
+logger = logging.getLogger(__name__)
+
+TEMPLATE_SUFFIXES = ('.html', '.txt')
+
+
+def template_names(directory):
+    """Template names (paths relative to ``directory``, with '/') found under it"""
+    for root, _dirs, files in os.walk(directory):
+        for filename in sorted(files):
+            if filename.endswith(TEMPLATE_SUFFIXES):
+                path = os.path.relpath(os.path.join(root, filename), directory)
+                yield path.replace(os.sep, '/')
+
+
+def warm_templates():
+    """Compile the app's and the project's templates; returns how many were loaded"""
+    app_directory = os.path.join(apps.get_app_config('employees').path, 'templates')
+    count = 0
+    for engine in engines.all():
+        for directory in [app_directory, *map(str, engine.dirs)]:
+            for name in template_names(directory):
+                try:
+                    engine.get_template(name)
+                except (TemplateDoesNotExist, TemplateSyntaxError) as e:
+                    logger.warning("Template warm-up skipped %s: %s", name, e)
+                else:
+                    count += 1
+    return count
+
+
+def warm_up():
+    """Warm the template cache and the URL resolver, unless TEMPLATE_WARMUP is off"""
+    if not getattr(settings, 'TEMPLATE_WARMUP', True):
+        return
+    start = time.perf_counter()
+    count = warm_templates()
+    # import the URLconf (and with it the views) and build the {% url %} lookup
+    resolver = get_resolver()
+    resolver.url_patterns
+    resolver.reverse_dict
+    logger.info("Warmed %d templates in %.0f ms", count, (time.perf_counter() - start) * 1000)
@@ -0,0 +1,38 @@
+"""
+gunicorn settings; gunicorn reads this file from the working directory, so
+``gunicorn`` alone starts the app.
+
+The workers are uvicorn's, serving the ASGI application: the async views,
+the ``asyncio`` message queue and the live delivery status stream
+(messaging/events/) only run as intended under ASGI. Under a sync WSGI
+worker the async views still work, one request per worker at a time.
+"""
+import os
+import tempfile
+
+wsgi_app = 'employee_management.asgi:application'
+worker_class = 'uvicorn_worker.UvicornWorker'
+# exported, so the settings (MESSAGE_EVENTS_BROKER) see the worker count too
+workers = int(os.environ.setdefault('WEB_CONCURRENCY', '2'))
+bind = os.environ.get('GUNICORN_BIND', '0.0.0.0:8000')
+# seconds; EMPLOYEE_IMPORT_MAX_ROWS keeps the import page's uploads well inside it
+timeout = int(os.environ.get('GUNICORN_TIMEOUT', 30))
+# Compile the templates once in the master (TEMPLATE_WARMUP); the workers inherit them
+preload_app = True
+
+if workers > 1:
+    # /metrics adds up every worker's values (employees.metrics); a fresh
+    # directory per start unless one is configured
+    os.environ.setdefault('METRICS_MULTIPROCESS_DIR', tempfile.mkdtemp(prefix='ems-metrics-'))
+
+
+def on_starting(server):
+    # A configured directory may hold the files of the previous run
+    from employees import metrics
+    metrics.clear_multiprocess_dir(os.environ.get('METRICS_MULTIPROCESS_DIR'))
+
+
+def child_exit(server, worker):
+    # Its open connections and streams are gone; keep its counters
+    from employees import metrics
+    metrics.mark_process_dead(worker.pid, os.environ.get('METRICS_MULTIPROCESS_DIR'))
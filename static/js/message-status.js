@@ -0,0 +1,48 @@
+// Live delivery status: while any message on the page is still pending,
+// listen to the message event stream and update its badge when the worker
+// reports it sent or failed.
+
+(function () {
+    var url = document.currentScript.dataset.eventsUrl;
+    var BADGES = {
+        sent: ['bg-success', 'Sent'],
+        failed: ['bg-danger', 'Failed'],
+        pending: ['bg-secondary', 'Pending']
+    };
+
+    function pending() {
+        return document.querySelectorAll('.message-status[data-status="pending"]');
+    }
+
+    function update(cell, event) {
+        var badge = document.createElement('span');
+        badge.className = 'badge ' + BADGES[event.status][0];
+        badge.textContent = BADGES[event.status][1];
+        cell.innerHTML = '';
+        cell.appendChild(badge);
+        if (event.status === 'failed' && event.error && cell.hasAttribute('data-show-error')) {
+            var error = document.createElement('small');
+            error.className = 'text-muted';
+            error.textContent = event.error;
+            cell.appendChild(document.createElement('br'));
+            cell.appendChild(error);
+        }
+        cell.dataset.status = event.status;
+    }
+
+    if (!url || !window.EventSource || !pending().length) {
+        return;
+    }
+
+    var source = new EventSource(url);
+    source.addEventListener('status', function (e) {
+        var event = JSON.parse(e.data);
+        document.querySelectorAll('.message-status[data-message-id="' + event.id + '"]').forEach(function (cell) {
+            update(cell, event);
+        });
+        if (!pending().length) {
+            // nothing left to wait for: free the connection
+            source.close();
+        }
+    });
+})();
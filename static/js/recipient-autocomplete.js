@@ -0,0 +1,57 @@
+// Recipient picker: searches the recipient API as you type and stores the
+// chosen employee's id in the hidden input next to the search box.
+
+(function () {
+    function debounce(fn, wait) {
+        var timer;
+        return function () {
+            var args = arguments;
+            clearTimeout(timer);
+            timer = setTimeout(function () { fn.apply(null, args); }, wait);
+        };
+    }
+
+    function search(url, channel, query) {
+        var params = new URLSearchParams({ q: query, channel: channel, limit: 10 });
+        return fetch(url + '?' + params.toString(), { credentials: 'same-origin' })
+            .then(function (response) { return response.json(); })
+            .then(function (data) { return data.results; });
+    }
+
+    function label(employee, channel) {
+        var detail = channel === 'whatsapp' ? employee.phone_number : employee.department;
+        return employee.first_name + ' ' + employee.last_name + ' - ' + detail;
+    }
+
+    function initPicker(container) {
+        var hidden = container.querySelector('input[type=hidden]');
+        var input = container.querySelector('input[type=text]');
+        var suggestions = container.querySelector('.recipient-suggestions');
+        var channel = container.dataset.channel;
+
+        var update = debounce(function () {
+            search(container.dataset.url, channel, input.value).then(function (results) {
+                suggestions.innerHTML = '';
+                results.forEach(function (employee) {
+                    var item = document.createElement('button');
+                    item.type = 'button';
+                    item.className = 'list-group-item list-group-item-action';
+                    item.textContent = label(employee, channel);
+                    item.addEventListener('click', function () {
+                        hidden.value = employee.id;
+                        input.value = employee.first_name + ' ' + employee.last_name;
+                        suggestions.innerHTML = '';
+                    });
+                    suggestions.appendChild(item);
+                });
+            });
+        }, 200);
+
+        input.addEventListener('input', function () {
+            hidden.value = '';
+            update();
+        });
+    }
+
+    document.querySelectorAll('.recipient-autocomplete').forEach(initPicker);
+})();